@@ -74,6 +74,151 @@ def pick_prob_column(df: pd.DataFrame) -> str:
     )
 
 
+def map_preinstall(val):
+    if not isinstance(val, str) or not val.strip():
+        return "No"
+    text = val.strip()
+    if text == "YES":
+        return "Yes (F1_hook_preinstall)"
+    if text.startswith("YES (with potential pkg/script manipulation"):
+        return (
+            "Yes (F1_hook_preinstall) with potential package/script manipulation "
+            "(D2_pkg_json_write, D2_scripts_field_touch)"
+        )
+    # Fallback: keep some information rather than dropping it
+    return text
+
+
+def prepare_results(df_res_raw: pd.DataFrame) -> pd.DataFrame:
+    """
+    Rows of a batch result table that have a probability, with the
+    __RISK_LEVEL__, __FORCED_PRE__ and __prob_numeric__ helper columns.
+    """
+    if "PACKAGE_NAME" not in df_res_raw.columns:
+        raise ValueError("results CSV must contain PACKAGE_NAME column")
+
+    # ---- Risk + Forced Risk High (Preinstall) helper cols ----
+    if "RISK_LEVEL" in df_res_raw.columns:
+        df_res_raw["__RISK_LEVEL__"] = df_res_raw["RISK_LEVEL"].astype(str)
+    else:
+        df_res_raw["__RISK_LEVEL__"] = ""
+
+    if "PREINSTALL" in df_res_raw.columns:
+        df_res_raw["__FORCED_PRE__"] = df_res_raw["PREINSTALL"].apply(map_preinstall)
+    else:
+        df_res_raw["__FORCED_PRE__"] = "No"
+
+    prob_col = pick_prob_column(df_res_raw)
+
+    # Convert to numeric and drop non-numeric rows (e.g., RISK_BANDS)
+    df_res = df_res_raw.copy()
+    df_res["__prob_numeric__"] = pd.to_numeric(
+        df_res[prob_col], errors="coerce"
+    )
+    df_res = df_res.dropna(subset=["__prob_numeric__"])
+    df_res["__prob_numeric__"] = df_res["__prob_numeric__"].astype(float)
+    print(f"[+] Using probability column: {prob_col}")
+    print(f"[+] Packages with valid probabilities: {len(df_res)}")
+    return df_res
+
+
+def load_model(model_dir: str):
+    """(w, b, mean, std) of the quadratic model; mean/std flattened."""
+    w = load_npy(os.path.join(model_dir, "theta_weights.npy"))
+    b = load_npy(os.path.join(model_dir, "theta_bias.npy"))
+    mean = load_npy(os.path.join(model_dir, "norm_mean.npy"))
+    std = load_npy(os.path.join(model_dir, "norm_std.npy"))
+
+    # Flatten mean / std in case they are (1, d)
+    mean = np.asarray(mean).reshape(-1)
+    std = np.asarray(std).reshape(-1)
+    return w, b, mean, std
+
+
+def split_weights(w, n_features: int):
+    """(w_lin, w_quad) of a quadratic model over n_features base features."""
+    if w.shape[0] != 2 * n_features:
+        raise ValueError(
+            f"Feature count mismatch: model has {w.shape[0]} weights "
+            f"for 2*d, but feature CSV has {n_features} columns."
+        )
+
+    w_lin = w[:n_features]
+    w_quad = w[n_features:]
+    print(
+        f"[+] Detected quadratic model: {n_features} base features, "
+        f"{w.shape[0]} weights (linear + quadratic)."
+    )
+    return w_lin, w_quad
+
+
+def contributions(df_res, df_feat, w_lin, w_quad, mean, std, top_k: int) -> pd.DataFrame:
+    """
+    Top-k feature contributions per package: df_res from prepare_results(),
+    df_feat the feature table indexed by PACKAGE_NAME.
+    """
+    feature_names = list(df_feat.columns)
+    rows_out = []
+
+    # ----- Per-package contributions -----
+    for _, r in df_res.iterrows():
+        pkg = str(r["PACKAGE_NAME"])
+        prob = float(r["__prob_numeric__"])
+        if pkg not in df_feat.index:
+            # No feature row for this package -> skip
+            continue
+
+        x = df_feat.loc[pkg].to_numpy(dtype=float)
+
+        # Normalize as during training
+        x_norm = (x - mean) / (std + 1e-12)
+        x_sq = x_norm ** 2
+
+        raw_lin = w_lin * x_norm       # per-feature linear contribution
+        raw_quad = w_quad * x_sq       # per-feature quadratic contribution
+        raw_total = raw_lin + raw_quad
+
+        abs_total = np.abs(raw_total)
+        sum_abs = abs_total.sum()
+        if sum_abs == 0:
+            shares = np.zeros_like(raw_total)
+        else:
+            shares = abs_total / sum_abs
+
+        severities = shares * prob  # share * overall probability
+
+        # Sort features by absolute combined contribution (descending)
+        order = np.argsort(-abs_total)
+
+        # ---- Risk + Forced Risk High (Preinstall) before score ----
+        row_out = {
+            "PACKAGE_NAME": pkg,
+            "Risk": r["__RISK_LEVEL__"],
+            "Forced Risk High (Preinstall)": r["__FORCED_PRE__"],
+            "PROB_MALICIOUS": round(prob, 5),
+        }
+
+        for rank in range(top_k):
+            if rank < len(order):
+                i = int(order[rank])
+                fname = feature_names[i]
+                cell = (
+                    f"{fname}; "
+                    f"lin={raw_lin[i]:.5f}; "
+                    f"quad={raw_quad[i]:.5f}; "
+                    f"raw={raw_total[i]:.5f}; "
+                    f"share={shares[i]*100:.2f}%; "
+                    f"severity={severities[i]*100:.2f}% (=share*prob)"
+                )
+            else:
+                cell = ""
+            row_out[f"FEATURE_{rank+1}"] = cell
+
+        rows_out.append(row_out)
+
+    return pd.DataFrame(rows_out)
+
+
 # ----------------- main ----------------- #
 def main():
     parser = argparse.ArgumentParser(
@@ -189,47 +334,7 @@ def main():
 
     # ----- Load results CSV -----
     print("[+] Loading results CSV...")
-    df_res_raw = pd.read_csv(results_csv)
-    if "PACKAGE_NAME" not in df_res_raw.columns:
-        raise ValueError("results CSV must contain PACKAGE_NAME column")
-
-    # ---- NEW: extract Risk + Forced Risk High (Preinstall) helper cols ----
-    if "RISK_LEVEL" in df_res_raw.columns:
-        df_res_raw["__RISK_LEVEL__"] = df_res_raw["RISK_LEVEL"].astype(str)
-    else:
-        df_res_raw["__RISK_LEVEL__"] = ""
-
-    def map_preinstall(val):
-        if not isinstance(val, str) or not val.strip():
-            return "No"
-        text = val.strip()
-        if text == "YES":
-            return "Yes (F1_hook_preinstall)"
-        if text.startswith("YES (with potential pkg/script manipulation"):
-            return (
-                "Yes (F1_hook_preinstall) with potential package/script manipulation "
-                "(D2_pkg_json_write, D2_scripts_field_touch)"
-            )
-        # Fallback: keep some information rather than dropping it
-        return text
-
-    if "PREINSTALL" in df_res_raw.columns:
-        df_res_raw["__FORCED_PRE__"] = df_res_raw["PREINSTALL"].apply(map_preinstall)
-    else:
-        df_res_raw["__FORCED_PRE__"] = "No"
-    # -----------------------------------------------------------------------
-
-    prob_col = pick_prob_column(df_res_raw)
-
-    # Convert to numeric and drop non-numeric rows (e.g., RISK_BANDS)
-    df_res = df_res_raw.copy()
-    df_res["__prob_numeric__"] = pd.to_numeric(
-        df_res[prob_col], errors="coerce"
-    )
-    df_res = df_res.dropna(subset=["__prob_numeric__"])
-    df_res["__prob_numeric__"] = df_res["__prob_numeric__"].astype(float)
-    print(f"[+] Using probability column: {prob_col}")
-    print(f"[+] Packages with valid probabilities: {len(df_res)}")
+    df_res = prepare_results(pd.read_csv(results_csv))
 
     # ----- Load feature CSV -----
     print("[+] Loading ML features CSV...")
@@ -237,94 +342,15 @@ def main():
     if "PACKAGE_NAME" not in df_feat.columns:
         raise ValueError("features CSV must have a 'PACKAGE_NAME' column")
     df_feat = df_feat.set_index("PACKAGE_NAME")
-    feature_names = list(df_feat.columns)
-    n_features = len(feature_names)
+    n_features = len(df_feat.columns)
     print(f"[+] Found {n_features} base features")
 
     # ----- Load model -----
     print(f"[+] Loading model from: {args.model_dir}")
-    w = load_npy(os.path.join(args.model_dir, "theta_weights.npy"))
-    b = load_npy(os.path.join(args.model_dir, "theta_bias.npy"))
-    mean = load_npy(os.path.join(args.model_dir, "norm_mean.npy"))
-    std = load_npy(os.path.join(args.model_dir, "norm_std.npy"))
-
-    # Flatten mean / std in case they are (1, d)
-    mean = np.asarray(mean).reshape(-1)
-    std = np.asarray(std).reshape(-1)
-
-    if w.shape[0] != 2 * n_features:
-        raise ValueError(
-            f"Feature count mismatch: model has {w.shape[0]} weights "
-            f"for 2*d, but feature CSV has {n_features} columns."
-        )
-
-    w_lin = w[:n_features]
-    w_quad = w[n_features:]
-    print(
-        f"[+] Detected quadratic model: {n_features} base features, "
-        f"{w.shape[0]} weights (linear + quadratic)."
-    )
-
-    rows_out = []
-
-    # ----- Per-package contributions -----
-    for _, r in df_res.iterrows():
-        pkg = str(r["PACKAGE_NAME"])
-        prob = float(r["__prob_numeric__"])
-        if pkg not in df_feat.index:
-            # No feature row for this package -> skip
-            continue
-
-        x = df_feat.loc[pkg].to_numpy(dtype=float)
-
-        # Normalize as during training
-        x_norm = (x - mean) / (std + 1e-12)
-        x_sq = x_norm ** 2
-
-        raw_lin = w_lin * x_norm       # per-feature linear contribution
-        raw_quad = w_quad * x_sq       # per-feature quadratic contribution
-        raw_total = raw_lin + raw_quad
-
-        abs_total = np.abs(raw_total)
-        sum_abs = abs_total.sum()
-        if sum_abs == 0:
-            shares = np.zeros_like(raw_total)
-        else:
-            shares = abs_total / sum_abs
-
-        severities = shares * prob  # share * overall probability
-
-        # Sort features by absolute combined contribution (descending)
-        order = np.argsort(-abs_total)
-
-        # ---- NEW: include Risk + Forced Risk High (Preinstall) before score ----
-        row_out = {
-            "PACKAGE_NAME": pkg,
-            "Risk": r["__RISK_LEVEL__"],
-            "Forced Risk High (Preinstall)": r["__FORCED_PRE__"],
-            "PROB_MALICIOUS": round(prob, 5),
-        }
-        # ------------------------------------------------------------------------
-
-        for rank in range(args.top_k):
-            if rank < len(order):
-                i = int(order[rank])
-                fname = feature_names[i]
-                cell = (
-                    f"{fname}; "
-                    f"lin={raw_lin[i]:.5f}; "
-                    f"quad={raw_quad[i]:.5f}; "
-                    f"raw={raw_total[i]:.5f}; "
-                    f"share={shares[i]*100:.2f}%; "
-                    f"severity={severities[i]*100:.2f}% (=share*prob)"
-                )
-            else:
-                cell = ""
-            row_out[f"FEATURE_{rank+1}"] = cell
-
-        rows_out.append(row_out)
+    w, b, mean, std = load_model(args.model_dir)
+    w_lin, w_quad = split_weights(w, n_features)
 
-    out_df = pd.DataFrame(rows_out)
+    out_df = contributions(df_res, df_feat, w_lin, w_quad, mean, std, args.top_k)
 
     # Ensure output directory exists
     out_dir = os.path.dirname(os.path.abspath(output_path))
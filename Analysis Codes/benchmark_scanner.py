@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+benchmark_scanner.py
+Usage:
+    python3 benchmark_scanner.py [paths ...] [--min-size BYTES] [--repeat N]
+
+Compares the anchored multi-feature scan used by extract_features.py
+(feature_scanner.scan_text + lines_containing, behind the literal
+prefilter) with the reference implementation: one finditer() pass per
+A1..E1 regex plus a full line-by-line D2 pass.
+
+For every JS/TS file under the given paths (default: demo_packages/extracted)
+the hits of both implementations are compared and any difference is
+reported. With --min-size, each file is also repeated until it reaches
+that size, which simulates a large minified bundle (e.g. --min-size 5000000).
+
+Exit status is 1 if any file produced different hits.
+"""
+import argparse
+import os
+import sys
+import time
+
+from extract_features import (
+    D2_GATES,
+    D2_HOOKSTR_RE,
+    D2_PKGWRITE_RE,
+    D2_SCRIPTS_RE,
+    FEATURE_PATTERNS,
+    JS_EXTS,
+)
+from feature_scanner import PrefilterStats, gated_anchors, lines_containing, scan_text
+
+DEFAULT_ROOT = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "demo_packages", "extracted"
+)
+
+
+def d2_tags(numbered_lines):
+    out = []
+    for lineno, line in numbered_lines:
+        if D2_PKGWRITE_RE.search(line):
+            out.append(("PKGWRITE", lineno, line))
+        if D2_SCRIPTS_RE.search(line):
+            out.append(("SCRIPTS", lineno, line))
+        if D2_HOOKSTR_RE.search(line):
+            out.append(("HOOKSTR", lineno, line))
+    return out
+
+
+def reference_scan(text: str):
+    """The previous extractor: one finditer() per feature, D2 on every line."""
+    hits = {}
+    for pat in FEATURE_PATTERNS:
+        hits[pat.feature] = [(m.start(), m.group(0)) for m in pat.regex.finditer(text)]
+    hits["D2"] = d2_tags(enumerate(text.splitlines(), start=1))
+    return hits
+
+
+def anchored_scan(text: str, stats: PrefilterStats | None = None):
+    hits = {}
+    for feat, matches in scan_text(text, FEATURE_PATTERNS, stats).items():
+        hits[feat] = [(m.start(), m.group(0)) for m in matches]
+    anchors = gated_anchors(text, D2_GATES)
+    lines = lines_containing(text, anchors) if anchors else []
+    if stats is not None:
+        stats.count(not lines)
+    hits["D2"] = d2_tags(lines)
+    return hits
+
+
+def iter_sources(paths):
+    for path in paths:
+        if os.path.isfile(path):
+            yield path
+            continue
+        for dirpath, dirnames, filenames in os.walk(path):
+            dirnames.sort()
+            for fname in sorted(filenames):
+                if fname.endswith(JS_EXTS):
+                    yield os.path.join(dirpath, fname)
+
+
+def timed(fn, text, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn(text)
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("paths", nargs="*", default=[DEFAULT_ROOT],
+                        help="Files or directories to scan.")
+    parser.add_argument("--min-size", type=int, default=0,
+                        help="Repeat each file's text up to at least this many characters.")
+    parser.add_argument("--repeat", type=int, default=1,
+                        help="Time each implementation N times and keep the best.")
+    args = parser.parse_args()
+
+    n_files = 0
+    n_chars = 0
+    n_hits = 0
+    mismatches = 0
+    t_ref = 0.0
+    t_new = 0.0
+    prefilter = PrefilterStats()
+
+    for src in iter_sources(args.paths):
+        try:
+            with open(src, "r", encoding="utf-8", errors="ignore") as f:
+                text = f.read()
+        except OSError as e:
+            print(f"[!] Could not read {src}: {e}", file=sys.stderr)
+            continue
+        if text and args.min_size:
+            reps = -(-args.min_size // len(text))
+            text = text * reps
+
+        ref, dt_ref = timed(reference_scan, text, args.repeat)
+        new, dt_new = timed(anchored_scan, text, args.repeat)
+        anchored_scan(text, prefilter)
+        t_ref += dt_ref
+        t_new += dt_new
+        n_files += 1
+        n_chars += len(text)
+        n_hits += sum(len(v) for v in ref.values())
+
+        for feat in ref:
+            if ref[feat] != new[feat]:
+                mismatches += 1
+                print(f"[!] {feat} differs on {src}: "
+                      f"{len(ref[feat])} reference vs {len(new[feat])} anchored hits")
+
+    if not n_files:
+        print("[!] No JS/TS files found.", file=sys.stderr)
+        sys.exit(1)
+
+    print(f"[+] Files scanned : {n_files} ({n_chars / 1e6:.1f}M chars, {n_hits} hits)")
+    print(f"[+] Reference     : {t_ref:.3f}s (one finditer per feature)")
+    print(f"[+] Anchored      : {t_new:.3f}s (feature_scanner)")
+    if t_new > 0:
+        print(f"[+] Speed-up      : {t_ref / t_new:.1f}x")
+    print(f"[+] Prefilter     : {prefilter}")
+    if mismatches:
+        print(f"[!] {mismatches} feature/file results differ")
+        sys.exit(1)
+    print("[+] Hits identical")
+
+
+if __name__ == "__main__":
+    main()
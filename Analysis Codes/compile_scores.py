@@ -2,7 +2,7 @@
 """
 compile_scores.py
 Usage:
-    python3 compile_scores.py <analysis_root> [extracted_root]
+    python3 compile_scores.py <analysis_root> [extracted_root] [--incremental] [-j N]
 
 Example:
     python3 compile_scores.py npm_top_10k/Analysis npm_top_10k/extracted
@@ -20,6 +20,18 @@ Expected layout:
 
 If [extracted_root] is provided, we also expect:
     <extracted_root>/<pkg_name>/  (original extracted package contents)
+or, for packages scanned straight from their tarballs:
+    <extracted_root>/<pkg_name>.tgz
+
+Packages scanned by the current extract_features.py keep their scores in
+<analysis_root>/<pkg>/results.sqlite (see result_store.py). Those are read
+from the store, one score per (feature, file) row, with
+file_id = "extraction_<file>". Scores a sparse scan left out (all zero)
+are filled in as zeros from the store's list of scanned files. The
+store's manifest (recorded by the extractor's walk) gives each file's
+size and the package size, so the package source is not walked again.
+Packages without a store (older runs, or
+exported text outputs only) are read from their score files:
 
 For each package directory <analysis_root>/<pkg>/, this script:
   - Recursively finds all files matching "*_score_*.txt".
@@ -32,6 +44,7 @@ For each package directory <analysis_root>/<pkg>/, this script:
         1) <dir>/<file_id> if exists
         2) if file_id has no '.', try extensions: .js, .mjs, .cjs, .ts, .jsx, .tsx, .json
         3) fallback: first file in <dir> whose name starts with file_id
+    (each directory is listed once and looked up in memory)
   - Uses the size of that source file (bytes) as the "file size" for density metrics.
   - Computes:
         * per-file metric values
@@ -39,8 +52,13 @@ For each package directory <analysis_root>/<pkg>/, this script:
         * per-file source-file sizes
         * total package size in bytes:
 
-          - If extracted_root is provided and <extracted_root>/<pkg_name> exists:
+          - If extracted_root is provided and results.sqlite has a manifest:
+                PACKAGE_SIZE_BYTES = sum of the file sizes it recorded.
+          - Else if <extracted_root>/<pkg_name> exists:
                 PACKAGE_SIZE_BYTES = sum of all files under that directory.
+          - Else if <extracted_root>/<pkg_name>.tgz exists:
+                PACKAGE_SIZE_BYTES = sum of the file sizes in its member
+                headers (the same total, without extracting).
           - Otherwise (backwards compatible):
                 PACKAGE_SIZE_BYTES = sum of all files under the analysis pkg dir.
 
@@ -62,43 +80,128 @@ Additionally, at the root <analysis_root>, it:
   - Writes:
         <analysis_root>/Consolidated_Package_Scores.tsv
         <analysis_root>/compile_scores_root.log
+
+Every package's totals are upserted into <analysis_root>/package_scores.sqlite
+(see package_scores.py), keyed on the package name, and the root table
+and log are materialised from that store. The root table's column schema
+(the metrics of all stored packages) is fixed before it is written, one
+package at a time, so memory does not grow with the number of packages.
+
+Modes:
+  (default)      compile every package directory.
+  --update       compile only packages whose inputs (score files or
+                 results.sqlite, the package source, this script) changed
+                 since they were stored, and drop packages whose directory
+                 is gone. With --package NAME (repeatable) exactly the
+                 named packages are compiled.
+  --incremental  (batch_analysis_final.py) like --update, but a package's
+                 extraction fingerprint (see pipeline_state.py) stands in
+                 for its inputs, so unchanged packages are not even stat'ed.
+  --materialize  only rewrite the root table and log from the store.
+
+With -j N the packages are compiled by N worker processes. The output is
+the same for any N and any mode.
 """
+import bisect
+import itertools
 import os
 import sys
 import re
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 
+from package_scores import PackageScores
+from result_store import PackageStore, has_store
+from tarball_source import find_tarball, package_size_bytes as tarball_size_bytes
 
-def parse_score_file(path: str) -> dict:
+
+def parse_score_lines(lines) -> dict:
     """
-    Parse a single *_score_*.txt file into {metric_key: int_value}.
+    Parse the lines of a score file into {metric_key: int_value}.
     Accepts both "KEY=VALUE" and "KEY: VALUE".
     Ignores lines without an integer value.
     """
     metrics = {}
+    for raw in lines:
+        line = raw.strip()
+        if not line or line.startswith("#"):
+            continue
+        if "=" in line:
+            key, val = line.split("=", 1)
+        elif ":" in line:
+            key, val = line.split(":", 1)
+        else:
+            continue
+        key = key.strip()
+        val = val.strip()
+        # Extract first integer in val
+        m = re.match(r"(-?\d+)", val)
+        if not m:
+            continue
+        try:
+            ival = int(m.group(1))
+        except ValueError:
+            continue
+        metrics[key] = ival
+    return metrics
+
+
+def parse_score_file(path: str) -> dict:
+    """Parse a single *_score_*.txt file into {metric_key: int_value}."""
     with open(path, "r", encoding="utf-8", errors="ignore") as f:
-        for raw in f:
-            line = raw.strip()
-            if not line or line.startswith("#"):
-                continue
-            if "=" in line:
-                key, val = line.split("=", 1)
-            elif ":" in line:
-                key, val = line.split(":", 1)
-            else:
-                continue
-            key = key.strip()
-            val = val.strip()
-            # Extract first integer in val
-            m = re.match(r"(-?\d+)", val)
-            if not m:
+        return parse_score_lines(f)
+
+
+def find_score_files(pkg_dir: str) -> list[str]:
+    """All *_score_*.txt files under pkg_dir (recursively)."""
+    score_files = []
+    for root, dirs, files in os.walk(pkg_dir):
+        for fname in files:
+            if not fname.endswith(".txt"):
                 continue
-            try:
-                ival = int(m.group(1))
-            except ValueError:
+            if "_score_" not in fname:
                 continue
-            metrics[key] = ival
-    return metrics
+            score_files.append(os.path.join(root, fname))
+    return score_files
+
+
+def iter_package_scores(pkg_dir: str):
+    """
+    Yield (feature, file_id, metrics, score_path) for every score of the
+    package. Scores come from <pkg_dir>/results.sqlite when the extractor
+    wrote one (score_path is then None), else from the *_score_*.txt files.
+    """
+    if has_store(pkg_dir):
+        store = PackageStore(pkg_dir)
+        try:
+            stored = set()
+            for feature, file, values in store.iter_scores():
+                stored.add((feature, file))
+                # Same integer parsing as for the text score files
+                metrics = parse_score_lines(f"{k}={v}" for k, v in values.items())
+                yield feature, f"extraction_{file}", metrics, None
+            # Sparse scans leave out all-zero scores: every feature scored
+            # for a scanned file but not stored counts as zeros
+            names = store.metric_names()
+            for file, _, features in store.iter_files():
+                for feature in features:
+                    if (feature, file) not in stored and feature in names:
+                        yield feature, f"extraction_{file}", dict.fromkeys(names[feature], 0), None
+        finally:
+            store.close()
+        return
+
+    for sf in find_score_files(pkg_dir):
+        fname = os.path.basename(sf)
+        try:
+            feature, rest = fname.split("_score_", 1)
+        except ValueError:
+            # Not in expected pattern, skip
+            continue
+        feature = feature.strip()
+        label = rest  # includes .txt
+        file_id = label[:-4] if label.endswith(".txt") else label
+        yield feature, file_id, parse_score_file(sf), sf
 
 
 def metric_sort_key(k: str):
@@ -121,7 +224,61 @@ def compute_package_size_bytes(pkg_dir: str) -> int:
     return total
 
 
-def find_source_file_for_score(score_file_path: str, file_id: str) -> str | None:
+SOURCE_EXTS = [".js", ".mjs", ".cjs", ".ts", ".jsx", ".tsx", ".json"]
+
+
+class DirectoryIndex:
+    """
+    One listing of a directory: file name -> (path, size), built with a
+    single os.scandir() so that looking up the source file of every score
+    in a large Scores/ directory does not list it again each time.
+    """
+
+    def __init__(self, base_dir: str):
+        self.files: dict[str, tuple[str, int]] = {}
+        # Listing position of each file (first-match order of os.listdir)
+        self._pos: dict[str, int] = {}
+        try:
+            with os.scandir(base_dir) as it:
+                for entry in it:
+                    try:
+                        if not entry.is_file():
+                            continue
+                        size = entry.stat().st_size
+                    except OSError:
+                        continue
+                    self._pos[entry.name] = len(self._pos)
+                    self.files[entry.name] = (entry.path, size)
+        except OSError:
+            pass
+        self._sorted = sorted(self.files)
+
+    def _first_with_prefix(self, prefix: str) -> str | None:
+        """Name listed first among those starting with prefix."""
+        i = bisect.bisect_left(self._sorted, prefix)
+        best = None
+        while i < len(self._sorted) and self._sorted[i].startswith(prefix):
+            name = self._sorted[i]
+            if best is None or self._pos[name] < self._pos[best]:
+                best = name
+            i += 1
+        return best
+
+    def lookup(self, file_id: str):
+        """(path, size) of the source file for file_id, or None."""
+        if file_id in self.files:
+            return self.files[file_id]
+        if "." not in file_id:
+            for ext in SOURCE_EXTS:
+                if file_id + ext in self.files:
+                    return self.files[file_id + ext]
+        name = self._first_with_prefix(file_id)
+        return self.files[name] if name is not None else None
+
+
+def find_source_file_for_score(
+    score_file_path: str, file_id: str, indexes: dict[str, DirectoryIndex] | None = None
+) -> tuple[str, int] | None:
     """
     Given a *_score_*.txt file path and the derived file_id (label),
     try to locate the underlying 'scored' source file in the same directory.
@@ -129,34 +286,55 @@ def find_source_file_for_score(score_file_path: str, file_id: str) -> str | None
         1) <dir>/<file_id> if exists
         2) if file_id has no '.', try file_id + ext for common JS/JSON-like extensions
         3) fallback: first file in <dir> whose name startswith(file_id)
-    Returns absolute path to source file, or None if not found.
+    Each directory is listed once; pass the same `indexes` dict
+    (directory -> DirectoryIndex) for all scores of a package.
+    Returns (path, size in bytes) of the source file, or None if not found.
     """
     base_dir = os.path.dirname(score_file_path)
+    if indexes is None:
+        indexes = {}
+    if base_dir not in indexes:
+        indexes[base_dir] = DirectoryIndex(base_dir)
+    return indexes[base_dir].lookup(file_id)
 
-    # 1) exact match
-    cand = os.path.join(base_dir, file_id)
-    if os.path.isfile(cand):
-        return cand
 
-    # 2) try common extensions if file_id has no dot (no extension)
-    if "." not in file_id:
-        exts = [".js", ".mjs", ".cjs", ".ts", ".jsx", ".tsx", ".json"]
-        for ext in exts:
-            cand = os.path.join(base_dir, file_id + ext)
-            if os.path.isfile(cand):
-                return cand
-
-    # 3) fallback: any file starting with file_id
+def read_manifest(pkg_dir: str):
+    """
+    (package size in bytes, file_id -> (path, size)) from the manifest the
+    extractor recorded in pkg_dir/results.sqlite, or None without one.
+    """
+    if not has_store(pkg_dir):
+        return None
+    store = PackageStore(pkg_dir)
     try:
-        for fname in os.listdir(base_dir):
-            if fname.startswith(file_id):
-                cand = os.path.join(base_dir, fname)
-                if os.path.isfile(cand):
-                    return cand
-    except OSError:
-        pass
-
-    return None
+        sizes = store.manifest_sizes()
+        if not sizes:
+            return None
+        files = {
+            f"extraction_{file}": (path, sizes.get(path, 0))
+            for file, path, _ in store.iter_files()
+        }
+    finally:
+        store.close()
+    return sum(sizes.values()), files
+
+
+def read_package_totals(pkg_dir: str):
+    """
+    Per-package totals from an existing consolidated_scores.tsv
+    ({metric -> total}), or None if there is none.
+    """
+    pkg_table = os.path.join(pkg_dir, "consolidated_scores.tsv")
+    if not os.path.isfile(pkg_table):
+        return None
+    totals: dict[str, int] = {}
+    with open(pkg_table, "r", encoding="utf-8") as t:
+        next(t, None)  # header
+        for line in t:
+            parts = line.rstrip("\n").split("\t")
+            if len(parts) >= 2:
+                totals[parts[0]] = int(parts[1])
+    return totals
 
 
 def process_single_package(pkg_dir: str, extracted_root: str | None = None):
@@ -169,7 +347,8 @@ def process_single_package(pkg_dir: str, extracted_root: str | None = None):
                        PACKAGE_SIZE_BYTES is computed from that directory.
                        Otherwise we fall back to pkg_dir (Analysis).
 
-      - Find all *_score_*.txt under pkg_dir.
+      - Read the scores from pkg_dir/results.sqlite, or find all
+        *_score_*.txt under pkg_dir.
       - Build per-file metric table and write:
             consolidated_scores.tsv
             compile_score.log
@@ -179,12 +358,19 @@ def process_single_package(pkg_dir: str, extracted_root: str | None = None):
             warnings: list[str] (unused for now)
     """
     pkg_name = os.path.basename(pkg_dir)
+    manifest = read_manifest(pkg_dir)
 
     # Decide which directory to use for PACKAGE_SIZE_BYTES
     if extracted_root is not None:
         src_pkg_dir = os.path.join(extracted_root, pkg_name)
-        if os.path.isdir(src_pkg_dir):
+        tarball = find_tarball(extracted_root, pkg_name)
+        if manifest is not None:
+            # Recorded by the extractor's walk of the same package
+            package_size_bytes = manifest[0]
+        elif os.path.isdir(src_pkg_dir):
             package_size_bytes = compute_package_size_bytes(src_pkg_dir)
+        elif tarball:
+            package_size_bytes = tarball_size_bytes(tarball)
         else:
             # Fallback if the extracted package dir is missing
             package_size_bytes = compute_package_size_bytes(pkg_dir)
@@ -204,33 +390,12 @@ def process_single_package(pkg_dir: str, extracted_root: str | None = None):
     all_metrics: set[str] = set()
     all_features: set[str] = set()
 
-    # Recursively find *_score_*.txt
-    score_files = []
-    for root, dirs, files in os.walk(pkg_dir):
-        for fname in files:
-            if not fname.endswith(".txt"):
-                continue
-            if "_score_" not in fname:
-                continue
-            score_files.append(os.path.join(root, fname))
-
-    if not score_files:
-        # Nothing to parse for this package
-        return {}, [f"[{pkg_name}] no *_score_*.txt files found"]
-
-    # --- parse each score file ---
-    for sf in score_files:
-        fname = os.path.basename(sf)
-        try:
-            feature, rest = fname.split("_score_", 1)
-        except ValueError:
-            # Not in expected pattern, skip
-            continue
-        feature = feature.strip()
-        label = rest  # includes .txt
-        file_id = label[:-4] if label.endswith(".txt") else label
-
-        metrics = parse_score_file(sf)
+    # --- parse each score (results.sqlite, or *_score_*.txt files) ---
+    seen_scores = False
+    # directory -> DirectoryIndex, for the source-file lookups
+    dir_indexes: dict[str, DirectoryIndex] = {}
+    for feature, file_id, metrics, sf in iter_package_scores(pkg_dir):
+        seen_scores = True
         if not metrics:
             continue
 
@@ -239,13 +404,12 @@ def process_single_package(pkg_dir: str, extracted_root: str | None = None):
 
         # record source-file size (bytes) for this file_id (first seen wins)
         if file_id not in file_sizes:
-            src = find_source_file_for_score(sf, file_id)
+            if sf:
+                src = find_source_file_for_score(sf, file_id, dir_indexes)
+            else:
+                src = manifest[1].get(file_id) if manifest is not None else None
             if src is not None:
-                file_src_paths[file_id] = src
-                try:
-                    file_sizes[file_id] = os.path.getsize(src)
-                except OSError:
-                    file_sizes[file_id] = 0
+                file_src_paths[file_id], file_sizes[file_id] = src
             else:
                 file_src_paths[file_id] = ""
                 file_sizes[file_id] = 0
@@ -254,6 +418,9 @@ def process_single_package(pkg_dir: str, extracted_root: str | None = None):
             file_scores[file_id][k] = v
             all_metrics.add(k)
 
+    if not seen_scores:
+        # Nothing to parse for this package
+        return {}, [f"[{pkg_name}] no *_score_*.txt files found"]
     if not file_scores:
         return {}, [f"[{pkg_name}] *_score_*.txt files found but no metrics parsed"]
 
@@ -367,83 +534,248 @@ def process_single_package(pkg_dir: str, extracted_root: str | None = None):
     return per_pkg_totals, []  # no extra warnings for now
 
 
-def main():
-    if len(sys.argv) not in (2, 3):
-        print("Usage: python3 compile_scores.py <analysis_root> [extracted_root]", file=sys.stderr)
-        sys.exit(1)
+# Written by process_single_package(); not inputs of the package's totals
+PACKAGE_OUTPUTS = ("consolidated_scores.tsv", "compile_score.log", "files_scanned.log")
 
-    analysis_root = os.path.abspath(sys.argv[1])
-    extracted_root = os.path.abspath(sys.argv[2]) if len(sys.argv) == 3 else None
 
-    if not os.path.isdir(analysis_root):
-        print(f"[ERROR] analysis_root is not a directory: {analysis_root}", file=sys.stderr)
-        sys.exit(1)
+def _stat_entries(root: str, skip=()):
+    """Sorted 'relpath size mtime' of every file under root."""
+    entries = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        for fname in filenames:
+            path = os.path.join(dirpath, fname)
+            rel = os.path.relpath(path, root)
+            if rel in skip:
+                continue
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append(f"{rel} {st.st_size} {st.st_mtime_ns}")
+    entries.sort()
+    return entries
 
-    # Root-level outputs
-    global_table_path = os.path.join(analysis_root, "Consolidated_Package_Scores.tsv")
-    global_log_path = os.path.join(analysis_root, "compile_scores_root.log")
 
-    # Gather package dirs
-    pkg_entries = [d for d in os.scandir(analysis_root) if d.is_dir()]
-    pkg_entries.sort(key=lambda e: e.name)
+def input_signature(pkg_dir: str, extracted_root: str | None, code: str) -> str:
+    """
+    Stat signature of everything a package's totals are built from: its
+    score files (or results.sqlite), the package source it is sized from
+    (unless results.sqlite has a manifest) and the compile code. Any change to one of them changes it.
+    """
+    from pipeline_state import fingerprint
 
-    if not pkg_entries:
-        print(f"[!] No package directories found in {analysis_root}", file=sys.stderr)
-        sys.exit(0)
+    parts = [code, extracted_root, *_stat_entries(pkg_dir, PACKAGE_OUTPUTS)]
+    # With a manifest the sizes come from results.sqlite, not the source
+    if extracted_root is not None and read_manifest(pkg_dir) is None:
+        pkg_name = os.path.basename(pkg_dir)
+        src_pkg_dir = os.path.join(extracted_root, pkg_name)
+        tarball = find_tarball(extracted_root, pkg_name)
+        if os.path.isdir(src_pkg_dir):
+            parts += _stat_entries(src_pkg_dir)
+        elif tarball:
+            st = os.stat(tarball)
+            parts.append(f"{tarball} {st.st_size} {st.st_mtime_ns}")
+    return fingerprint(*parts)
 
-    # Aggregate per-package totals
-    pkg_totals: dict[str, dict[str, int]] = {}
-    all_metrics_global: set[str] = set()
-    pkgs_with_scores = []
-    pkgs_without_scores = []
-
-    for entry in pkg_entries:
-        pkg_name = entry.name
-        pkg_dir = entry.path
-        per_pkg_totals, warnings = process_single_package(pkg_dir, extracted_root)
-        if not per_pkg_totals:
-            pkgs_without_scores.append(pkg_name)
-            continue
-        pkg_totals[pkg_name] = per_pkg_totals
-        pkgs_with_scores.append(pkg_name)
-        all_metrics_global.update(per_pkg_totals.keys())
 
-    if not pkg_totals:
-        print("[!] No per-package scores found; nothing to consolidate.", file=sys.stderr)
-        sys.exit(0)
+def compile_package(pkg_dir: str, extracted_root: str | None = None):
+    """
+    Worker for the process pool: compile one package and return
+    (pkg_name, {metric -> total}), or (pkg_name, None) if it has no scores.
+    """
+    per_pkg_totals, _ = process_single_package(pkg_dir, extracted_root)
+    return os.path.basename(pkg_dir), per_pkg_totals or None
+
 
-    # Order metrics and packages for the root-level table
-    metrics_order_global = sorted(all_metrics_global, key=metric_sort_key)
-    pkg_names_sorted = sorted(pkgs_with_scores)
+def write_root_outputs(
+    scores: PackageScores, analysis_root: str, global_table_path: str, global_log_path: str
+) -> bool:
+    """
+    Materialise Consolidated_Package_Scores.tsv and compile_scores_root.log
+    from the package_scores store. False if no package has scores.
+    """
+    if not scores.count_with_scores():
+        return False
+    extracted_root = scores.get_meta("extracted_root")
 
-    # --- write global consolidated package table ---
+    # The schema of the root table is fixed before any row is written
+    metrics_order_global = sorted(scores.metrics(), key=metric_sort_key)
+
+    # --- write global consolidated package table, one package at a time ---
     with open(global_table_path, "w", encoding="utf-8") as out:
         # header: package | metric1 | metric2 | ...
         header = ["package"] + metrics_order_global
         out.write("\t".join(header) + "\n")
-        for pkg in pkg_names_sorted:
+        for pkg, totals in scores.iter_totals():
             row = [pkg]
-            scores = pkg_totals.get(pkg, {})
             for metric in metrics_order_global:
-                val = scores.get(metric, 0)
+                val = totals.get(metric, 0)
                 row.append(str(val))
             out.write("\t".join(row) + "\n")
 
     # --- write root-level log ---
+    pkgs_without_scores = scores.packages_without_scores()
     with open(global_log_path, "w", encoding="utf-8") as log:
         log.write("=== compile_scores_root.log ===\n")
         log.write(f"analysis_root={analysis_root}\n")
         if extracted_root is not None:
             log.write(f"extracted_root={extracted_root}\n")
-        log.write(f"packages_with_scores={len(pkgs_with_scores)}\n")
+        log.write(f"packages_with_scores={scores.count_with_scores()}\n")
         log.write(f"packages_without_scores={len(pkgs_without_scores)}\n")
         log.write(f"metrics_observed={','.join(metrics_order_global)}\n\n")
         if pkgs_without_scores:
             log.write("Packages with no usable *_score_*.txt metrics:\n")
-            for name in sorted(pkgs_without_scores):
+            for name in pkgs_without_scores:
                 log.write(f"  - {name}\n")
         else:
             log.write("All package directories had at least one *_score_*.txt file.\n")
+    return True
+
+
+USAGE = (
+    "Usage: python3 compile_scores.py <analysis_root> [extracted_root] "
+    "[--incremental | --update [--package NAME ...] | --materialize] [-j N]"
+)
+
+
+def parse_args(argv: list[str]):
+    """(positional args, mode, named packages, jobs) from the command line."""
+    positional = []
+    mode = "full"
+    named = []
+    jobs = 1
+    it = iter(argv)
+    for a in it:
+        if a in ("--incremental", "--update", "--materialize"):
+            mode = a[2:]
+        elif a == "--package":
+            named.append(next(it))
+        elif a.startswith("--package="):
+            named.append(a.split("=", 1)[1])
+        elif a in ("-j", "--jobs"):
+            jobs = int(next(it, "1"))
+        elif a.startswith("--jobs="):
+            jobs = int(a.split("=", 1)[1])
+        else:
+            positional.append(a)
+    if named and mode != "update":
+        raise ValueError("--package needs --update")
+    return positional, mode, named, max(1, jobs)
+
+
+def main():
+    try:
+        args, mode, named, jobs = parse_args(sys.argv[1:])
+    except (ValueError, StopIteration):
+        args = []
+    if len(args) not in (1, 2):
+        print(USAGE, file=sys.stderr)
+        sys.exit(1)
+
+    analysis_root = os.path.abspath(args[0])
+    extracted_root = os.path.abspath(args[1]) if len(args) == 2 else None
+
+    if not os.path.isdir(analysis_root):
+        print(f"[ERROR] analysis_root is not a directory: {analysis_root}", file=sys.stderr)
+        sys.exit(1)
+
+    # Root-level outputs
+    global_table_path = os.path.join(analysis_root, "Consolidated_Package_Scores.tsv")
+    global_log_path = os.path.join(analysis_root, "compile_scores_root.log")
+
+    scores = PackageScores(analysis_root)
+    if mode == "materialize":
+        if not write_root_outputs(scores, analysis_root, global_table_path, global_log_path):
+            print("[!] No per-package scores stored; nothing to materialise.", file=sys.stderr)
+            sys.exit(0)
+        scores.close()
+        print(f"[+] Global per-package table written to: {global_table_path}")
+        return
+
+    # Gather package dirs (not Analysis/.partial, where extractions in progress live)
+    pkg_names = sorted(
+        d.name for d in os.scandir(analysis_root) if d.is_dir() and not d.name.startswith(".")
+    )
+    if named:
+        # Named packages only: compile those that exist, drop the others
+        present = set(pkg_names)
+        for name in named:
+            if name not in present:
+                scores.delete(name)
+                print(f"[!] {name}: no package directory; removed from the table.")
+        pkg_names = sorted(set(named) & present)
+    else:
+        # A package whose directory is gone leaves the table
+        for name in set(scores.packages()) - set(pkg_names):
+            scores.delete(name)
+
+    if not pkg_names and not named:
+        print(f"[!] No package directories found in {analysis_root}", file=sys.stderr)
+        sys.exit(0)
+
+    from pipeline_state import code_version, fingerprint
+
+    compile_code = code_version("compile_scores.py", "result_store.py", "tarball_source.py")
+    state = None
+    if mode == "incremental":
+        from pipeline_state import PipelineState
+
+        state = PipelineState(analysis_root)
+    # (every signature covers extracted_root; this is for the root log)
+    scores.set_meta("extracted_root", extracted_root)
+
+    # pkg_name -> signature of the packages to (re)compile
+    todo: dict[str, str] = {}
+    for pkg_name in pkg_names:
+        pkg_dir = os.path.join(analysis_root, pkg_name)
+        if state is not None and state.get("extract", pkg_name) is not None:
+            # The extraction fingerprint already covers the package's content
+            sig = fingerprint(state.get("extract", pkg_name), compile_code, extracted_root)
+            if state.is_current("compile", pkg_name, sig):
+                if scores.signature(pkg_name) == sig:
+                    continue
+                # Compiled before there was a store: take its existing totals
+                totals = read_package_totals(pkg_dir)
+                if totals is not None:
+                    scores.upsert(pkg_name, sig, totals)
+                    continue
+        else:
+            sig = input_signature(pkg_dir, extracted_root, compile_code)
+            if mode != "full" and not named and scores.signature(pkg_name) == sig:
+                continue
+        todo[pkg_name] = sig
+    reused = len(pkg_names) - len(todo)
+
+    # Compile (in parallel with -j); each package's totals go straight to the store
+    pkg_dirs = [os.path.join(analysis_root, name) for name in todo]
+    pool = None
+    if jobs > 1 and len(pkg_dirs) > 1:
+        pool = ProcessPoolExecutor(max_workers=min(jobs, len(pkg_dirs)))
+        compiled = pool.map(
+            compile_package, pkg_dirs, itertools.repeat(extracted_root),
+            chunksize=max(1, len(pkg_dirs) // (jobs * 8)),
+        )
+    else:
+        compiled = (compile_package(d, extracted_root) for d in pkg_dirs)
+    try:
+        for pkg_name, totals in compiled:
+            scores.upsert(pkg_name, todo[pkg_name], totals)
+            if state is not None and state.get("extract", pkg_name) is not None:
+                state.put("compile", pkg_name, todo[pkg_name])
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    if state is not None:
+        state.close()
+    if mode != "full":
+        print(f"[+] {mode.capitalize()}: {len(todo)} package(s) compiled, {reused} unchanged")
+
+    if not write_root_outputs(scores, analysis_root, global_table_path, global_log_path):
+        scores.close()
+        print("[!] No per-package scores found; nothing to consolidate.", file=sys.stderr)
+        sys.exit(0)
+    scores.close()
 
     print("[+] Per-package consolidated_scores.tsv written inside each package directory.")
     print(f"[+] Global per-package table written to: {global_table_path}")
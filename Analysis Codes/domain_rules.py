@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+domain_rules.py
+
+Host and endpoint classification rules for the C1 and C2 processors,
+loaded from domain_rules.json (next to this file).
+
+C1 used to classify every URL host with chains of
+any(host.endswith(d) for d in ...) over several tuples, then a further
+if/elif chain for API endpoints. HostClassifier compiles all of a
+section's names into one trie over the reversed host characters.
+Classifying a host walks that trie once from the end of the host, and
+stops at the first character no rule continues with. The result is
+memoised per host.
+
+Rules keep the semantics of the old checks:
+  "suffixes"  host.endswith(name) (not label-aligned: "mygoogle.com"
+              ends with "google.com")
+  "hosts"     host == name
+  "path_prefix" / "path_contains"
+              optional URL path conditions of the rule
+When several rules match, the first one listed in the section wins, as
+the first true branch of the old if/elif chains did.
+
+C2 classifies whole hit lines by substring, not hosts. Its
+"C2_categories" are compiled into one case-insensitive alternation per
+category (line_patterns()).
+
+To add or move a domain, edit domain_rules.json; no code change is
+needed. The file is part of the result cache's ruleset version, so
+cached scores are invalidated when it changes.
+"""
+import json
+import os
+import re
+from dataclasses import dataclass
+
+RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "domain_rules.json")
+
+# Trie node keys for the rules ending at a node (characters are str keys)
+_SUFFIX = 0
+_EXACT = 1
+# Memoised hosts per classifier before the memo is reset
+MEMO_LIMIT = 100_000
+
+_rules_cache: dict[str, dict] = {}
+
+
+def load_rules(path: str = RULES_PATH) -> dict:
+    """The parsed rules file (read once per process)."""
+    if path not in _rules_cache:
+        with open(path, "r", encoding="utf-8") as f:
+            _rules_cache[path] = json.load(f)
+    return _rules_cache[path]
+
+
+@dataclass(frozen=True)
+class HostRule:
+    label: str
+    priority: int
+    path_prefix: str | None = None
+    path_contains: str | None = None
+
+    def accepts(self, path: str | None) -> bool:
+        if self.path_prefix is not None and not (path or "").startswith(self.path_prefix):
+            return False
+        if self.path_contains is not None and self.path_contains not in (path or ""):
+            return False
+        return True
+
+
+class HostClassifier:
+    """First-listed matching rule of a section, via a reversed suffix trie."""
+
+    def __init__(self, rules: list[dict], default: str | None = None):
+        self.default = default
+        self._root: dict = {}
+        self._memo: dict[str, tuple[HostRule, ...]] = {}
+        for priority, rule in enumerate(rules):
+            host_rule = HostRule(
+                rule["class"], priority, rule.get("path_prefix"), rule.get("path_contains")
+            )
+            for name in rule.get("suffixes", ()):
+                self._add(name.lower(), _SUFFIX, host_rule)
+            for name in rule.get("hosts", ()):
+                self._add(name.lower(), _EXACT, host_rule)
+
+    def _add(self, name: str, kind: int, rule: HostRule):
+        node = self._root
+        for ch in reversed(name):
+            node = node.setdefault(ch, {})
+        node.setdefault(kind, []).append(rule)
+
+    def _candidates(self, host: str) -> tuple[HostRule, ...]:
+        """All rules matching host, best (lowest priority number) first."""
+        found = []
+        node = self._root
+        for ch in reversed(host):
+            node = node.get(ch)
+            if node is None:
+                break
+            found.extend(node.get(_SUFFIX, ()))
+        else:
+            # The whole host was consumed: exact names end here
+            found.extend(node.get(_EXACT, ()))
+        return tuple(sorted(found, key=lambda r: r.priority))
+
+    def classify(self, host: str, path: str | None = None) -> str | None:
+        """Label of the first rule matching host (and path), else default."""
+        candidates = self._memo.get(host)
+        if candidates is None:
+            if len(self._memo) >= MEMO_LIMIT:
+                self._memo.clear()
+            candidates = self._memo[host] = self._candidates(host)
+        for rule in candidates:
+            if rule.accepts(path):
+                return rule.label
+        return self.default
+
+
+def host_classifier(section: str, default: str | None = None) -> HostClassifier:
+    return HostClassifier(load_rules()[section], default)
+
+
+def line_patterns(section: str) -> list[tuple[str, re.Pattern]]:
+    """(category, compiled substring alternation) per category, in file order."""
+    return [
+        (
+            entry["class"],
+            re.compile("|".join(re.escape(p) for p in entry["patterns"]), re.IGNORECASE),
+        )
+        for entry in load_rules()[section]
+    ]
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+explain.py
+Usage:
+    python3 explain.py <analysis_root> [package ...]
+                       [--extracted-root DIR] [--results CSV] [--levels MEDIUM,HIGH]
+
+Regenerate the Details/ reports of packages scanned with
+extract_features.py --summary-only.
+
+A summary-only scan stores hits and scores in each package's
+results.sqlite, but builds no human-readable reports. Most packages end up
+LOW risk and nobody reads their reports. This command builds the reports
+afterwards, only for the packages that need them:
+
+  * By default, every package whose RISK_LEVEL in
+    <analysis_root>/batch_analysis_result.csv (generate_scan_results.py,
+    then merge_preinstall_risk.py, or scoring_engine.py) is MEDIUM or
+    HIGH. --levels changes the set of levels.
+  * Or the packages named on the command line.
+
+For every scanned file of a package, the processors that scored it run
+again on the hits stored for it (no stored hits for a feature means it
+had none, as in --sparse scans). A1..A3 hits also need the source bytes
+for their context. Those are read from <extracted_root>/<package>/ or
+<extracted_root>/<package>.tgz, the same place compile_scores.py looks.
+Files that were served from the file result cache (extract_features.py
+--cache) have no stored hits; the store marks them as cached. Only those
+files are rescanned from source, with the package's own --sparse,
+--mmap and --offline / --rdns-cache settings (as recorded in its
+results.sqlite).
+
+The reports are written to Details/ (same names and contents as a full
+scan would produce) and into the package's results.sqlite. Nothing else
+in results.sqlite changes: the scores compile_scores.py read stay as
+they were.
+"""
+import argparse
+import csv
+import os
+import sys
+
+from extract_features import (
+    A_SERIES,
+    PROCESS_CONFIG,
+    configure_rdns,
+    extract_for_buffer,
+    run_a_series,
+    run_processor,
+)
+from result_store import DetailOutputs, PackageStore, has_store
+from tarball_source import TarballPackage, find_tarball
+
+RESULTS_CSV = "batch_analysis_result.csv"
+DEFAULT_LEVELS = ("MEDIUM", "HIGH")
+
+
+def flagged_packages(results_csv: str, levels) -> list[str]:
+    """PACKAGE_NAMEs of the result rows whose RISK_LEVEL is in levels."""
+    with open(results_csv, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        if reader.fieldnames is None or not {"PACKAGE_NAME", "RISK_LEVEL"} <= set(
+            reader.fieldnames
+        ):
+            raise KeyError(f"{results_csv} must contain 'PACKAGE_NAME' and 'RISK_LEVEL'")
+        return [
+            row["PACKAGE_NAME"]
+            for row in reader
+            if row["PACKAGE_NAME"] != "RISK_BANDS"
+            and row["RISK_LEVEL"].strip().upper() in levels
+        ]
+
+
+class PackageSource:
+    """Source bytes of one package, from its extracted directory or tarball."""
+
+    def __init__(self, extracted_root: str | None, pkg_name: str):
+        self.pkg_dir = None
+        self.tarball = None
+        self._members: dict[str, bytes] | None = None
+        if extracted_root is None:
+            return
+        pkg_dir = os.path.join(extracted_root, pkg_name)
+        if os.path.isdir(pkg_dir):
+            self.pkg_dir = pkg_dir
+        else:
+            self.tarball = find_tarball(extracted_root, pkg_name)
+
+    def load(self, rel_paths):
+        """Read the tarball members needed later, in one streamed pass."""
+        if self.tarball is None:
+            return
+        wanted = set(rel_paths)
+        pkg = TarballPackage(self.tarball)
+        self._members = dict(pkg.members(lambda rel: rel in wanted))
+
+    def path_of(self, rel_path: str) -> str | None:
+        """The path the extractor reported for rel_path (Details only)."""
+        if self.pkg_dir is not None:
+            return os.path.join(self.pkg_dir, rel_path)
+        if self.tarball is not None:
+            return os.path.join(self.tarball, rel_path)
+        return None
+
+    def read(self, rel_path: str) -> bytes | None:
+        if self.pkg_dir is not None:
+            try:
+                with open(os.path.join(self.pkg_dir, rel_path), "rb") as f:
+                    return f.read()
+            except OSError:
+                return None
+        if self._members is not None:
+            return self._members.get(rel_path)
+        return None
+
+
+def explain_file(
+    outputs: DetailOutputs,
+    source: PackageSource,
+    label: str,
+    rel_path: str,
+    features: list[str],
+    cached: bool = False,
+    use_mmap: bool = False,
+):
+    """Rebuild the reports of one scanned file. Returns False if it could not be done."""
+    src_path = source.path_of(rel_path)
+    analysis_root = outputs.analysis_root
+
+    if cached:
+        # File-cache hit during the scan (no hits stored): rescan from source
+        data = source.read(rel_path)
+        if data is None:
+            return False
+        extract_for_buffer(rel_path, src_path, data, outputs, None, use_mmap)
+        return True
+
+    # Features without stored hits had none (sparse scans)
+    stored = outputs.store.hits_for(label)
+    hits = {feat: stored.get(feat, "") for feat in set(features) | set(stored)}
+    paths = {feat: outputs.hits_path(feat, label) for feat in hits}
+    results = {}
+    if any(feat in features for feat in A_SERIES):
+        # The source only gives A1..A3 hits their context
+        data = None
+        if any(stored.get(feat) for feat in A_SERIES):
+            data = source.read(rel_path)
+            if data is None:
+                print(f"[!] Source of {rel_path} not found; A1..A3 reports lack context",
+                      file=sys.stderr)
+        for feat in A_SERIES:
+            hits.setdefault(feat, "")
+            paths.setdefault(feat, outputs.hits_path(feat, label))
+        results.update(run_a_series(src_path, paths, analysis_root, hits, data))
+    for feat in sorted(features):
+        if feat in A_SERIES or feat not in PROCESS_CONFIG:
+            continue
+        results[feat] = run_processor(feat, None, paths[feat], analysis_root, hits[feat])
+
+    for feat, result in results.items():
+        if result is not None and feat in features:
+            outputs.put_result(feat, label, result)
+    outputs.commit()
+    return True
+
+
+def explain_package(analysis_root: str, pkg_name: str, extracted_root: str | None) -> bool:
+    pkg_root = os.path.join(analysis_root, pkg_name)
+    if not has_store(pkg_root):
+        print(f"[!] {pkg_name}: no results.sqlite in {pkg_root}", file=sys.stderr)
+        return False
+
+    source = PackageSource(extracted_root, pkg_name)
+    store = PackageStore(pkg_root)
+    options = store.options()
+    store.close()
+    # C1's reports name the rDNS of IP URLs: resolve them as the scan did
+    configure_rdns(options.get("rdns_cache"), options.get("offline", False))
+    outputs = DetailOutputs(pkg_root, sparse=options.get("sparse", False))
+    try:
+        files = list(outputs.store.iter_files())
+        cached = outputs.store.cached_files()
+        source.load(rel for label, rel, _ in files if label in cached or outputs.store.hits_for(label))
+        missing = 0
+        for label, rel_path, features in files:
+            if not explain_file(
+                outputs, source, label, rel_path, features, label in cached,
+                options.get("mmap", False),
+            ):
+                missing += 1
+                print(f"[!] {pkg_name}: cannot explain {rel_path} (source not found)",
+                      file=sys.stderr)
+    finally:
+        outputs.close()
+    print(f"[+] {pkg_name}: Details written for {len(files) - missing} of {len(files)} files")
+    return missing == 0
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Regenerate Details/ reports for flagged packages."
+    )
+    parser.add_argument("analysis_root", help="The Analysis/ directory of a batch.")
+    parser.add_argument("packages", nargs="*",
+                        help="Packages to explain (default: MEDIUM/HIGH packages of the "
+                             "batch results).")
+    parser.add_argument("--extracted-root", default=None,
+                        help="Directory of the scanned packages / tarballs "
+                             "(default: <analysis_root>/../extracted).")
+    parser.add_argument("--results", default=None,
+                        help=f"Batch result CSV (default: <analysis_root>/{RESULTS_CSV}).")
+    parser.add_argument("--levels", default=",".join(DEFAULT_LEVELS),
+                        help="Comma-separated RISK_LEVELs to explain (default: MEDIUM,HIGH).")
+    args = parser.parse_args()
+
+    analysis_root = os.path.abspath(args.analysis_root)
+    extracted_root = args.extracted_root or os.path.join(
+        os.path.dirname(analysis_root), "extracted"
+    )
+    if not os.path.isdir(extracted_root):
+        print(f"[!] Extracted root not found: {extracted_root} "
+              "(A1..A3 reports will lack source context)", file=sys.stderr)
+        extracted_root = None
+
+    packages = args.packages
+    if not packages:
+        results_csv = args.results or os.path.join(analysis_root, RESULTS_CSV)
+        if not os.path.isfile(results_csv):
+            print(f"[!] Cannot find {results_csv}", file=sys.stderr)
+            sys.exit(1)
+        levels = {lvl.strip().upper() for lvl in args.levels.split(",") if lvl.strip()}
+        packages = flagged_packages(results_csv, levels)
+        print(f"[+] {len(packages)} package(s) with RISK_LEVEL in {sorted(levels)}")
+
+    failed = 0
+    for pkg_name in packages:
+        if not explain_package(analysis_root, pkg_name, extracted_root):
+            failed += 1
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
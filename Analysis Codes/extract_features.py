@@ -2,24 +2,73 @@
 """
 extract_features.py
 Usage:
-    python3 extract_features.py <package_root>
+    python3 extract_features.py [--mmap] [--write-segmented] [--jobs N]
+                                [--cache DIR] [--text-outputs] [--summary-only]
+                                [--sparse] [--rdns-cache DIR] [--offline]
+                                <package_root | package.tgz>
 
-Given an extracted npm package directory, this script:
+Given an extracted npm package directory (or its .tgz tarball), this script:
   * Walks all JS/TS files.
   * For each file:
       - If it looks minified (<=10 lines AND some line > 5000 chars),
-        creates a segmented_<filename> with pseudo-lines under
-        Analysis/<PackageName>/Segmented_Files/ (mirroring the package tree).
-      - Runs A1..E2 feature extractors on the appropriate file
-        (segmented if present; E2 always uses the original file).
-      - Writes hits into Analysis/<PackageName>/static_features/
-        as <FEATURE>_extraction_<relpath-with-->.txt
-      - Immediately calls the corresponding process_<feature>.py
-        if that script exists in the same directory, passing the
-        hits file, optional source file, and the analysis root path.
+        splits it into pseudo-lines in memory (segmentation.py). Hit line
+        numbers refer to pseudo-lines, byte offsets to the original file.
+        With --write-segmented, a segmented_<filename> copy is also written
+        under Analysis/<PackageName>/Segmented_Files/ (mirroring the
+        package tree) for review.
+      - Runs A1..E2 feature extractors on the file
+        (pseudo-lines if minified; E2 always uses the original lines).
+      - Stores the hits in Analysis/<PackageName>/results.sqlite
+        (result_store.py), keyed on (<FEATURE>, <relpath-with-->).
+      - Immediately runs the corresponding process_<feature>.py
+        processor in-process (process(hits, source_buffer, ctx)),
+        passing the hits, the source bytes (A1-A3 only) and the
+        analysis root path. A1..A3 run together as one stage
+        (process_a_series.py) over the buffer the file was read into.
+        Their scores and Details reports go to the same store.
+  * The same walk (or tarball pass) records a manifest of every file of
+    the package in the store: size, sha256 of scanned files, and whether
+    it was scanned, skipped or unreadable. compile_scores.py takes the
+    package and file sizes from it.
+  * With --text-outputs, everything stored is also written as the
+    classic text files: static_features/<FEATURE>_extraction_<label>.txt,
+    Scores/ and Details/. `result_store.py export` writes the same files
+    from the store later.
+  * With --summary-only, processors only compute scores: no Details
+    reports are built or stored. explain.py regenerates them later for
+    the packages that get flagged.
+  * With --sparse, only non-zero features are materialised: a feature
+    without hits stores no hit list, and all-zero scores are dropped
+    together with their Details. The store still records each scanned
+    file and the features scored for it, so compile_scores.py counts
+    the missing scores as zeros.
+  * C1 resolves the reverse DNS of IP URLs. With --rdns-cache DIR the
+    names are kept in a persistent cache with a TTL (rdns_cache.py),
+    shared by all workers and runs. --offline uses only that cache and
+    never queries DNS; its result cache entries (--cache) are kept apart
+    from those of online scans.
+  * With --mmap, each scanned file is memory-mapped and scanned with
+    bytes regexes instead of being decoded; hit offsets are then real file
+    offsets and A1..A3 slice context out of the same mapping.
+  * With --jobs N, a package with more than FILES_PER_TASK files is split
+    into file-level tasks that run on N worker processes.
+  * A literal prefilter rules features out per file before any regex
+    runs: if none of a feature's literals occur, it has no hits. The
+    share of feature scans skipped this way is printed at the end.
+  * With --cache DIR, files whose exact bytes were scanned before (under
+    the same rules) are served from a content-addressed result cache
+    (result_cache.py): only their scores are stored.
+  * Given a .tgz, the tarball is streamed once (tarball_source.py) and
+    its JS/TS members and package.json are scanned from memory, with the
+    same labels and outputs as the extracted directory <name>/ would get.
+    Nothing is written to disk except Analysis/. A tarball is one task, so
+    --jobs does not apply to it.
+  * Outputs are written to Analysis/.partial/<PackageName>/ and renamed
+    to Analysis/<PackageName>/ once the whole package succeeded, so a
+    package directory is never left half-written by a crash.
   * For package.json:
       - Runs F1 (lifecycle hooks / optionalDependencies / scripts)
-        and calls process_f1.py.
+        and runs the process_f1.py processor.
 
 Features:
   A1  – def find_package_json(pkg_root: str) -> str | None:
@@ -85,10 +134,35 @@ exec/eval/new Function
   F1  – lifecycle hooks / optionalDependencies / scripts in package.json
 """
 
+import argparse
+import hashlib
+import importlib
+import io
+import mmap
 import os
+import posixpath
 import re
+import shutil
 import sys
-import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stderr, redirect_stdout
+
+from feature_scanner import (
+    FeaturePattern,
+    PrefilterStats,
+    as_bytes_pattern,
+    byte_lines_containing,
+    gated_anchors,
+    lines_containing,
+    scan_text,
+)
+from process_a_series import process_all
+from processor_api import ProcessorContext, split_hit_lines
+from result_cache import content_key, format_stats, get_cache, new_run_id
+from result_store import PackageOutputs
+from segmentation import looks_minified, segment
+from source_index import SourceIndex
+from tarball_source import TarballPackage, is_tarball, tarball_package_name
 
 # ---------------------------------------------------------------------------
 # Helpers for running per-feature processors
@@ -99,66 +173,127 @@ def sanitize_label(path: str) -> str:
     return path.replace(os.sep, "--").replace("\\", "--")
 
 
-# Which process_* script to call, and whether it needs the source file.
+# Which process_* module to call, and whether it needs the source file.
 PROCESS_CONFIG = {
-    "A1": {"script": "process_a1.py", "needs_source": True},
-    "A2": {"script": "process_a2.py", "needs_source": True},
-    "A3": {"script": "process_a3.py", "needs_source": True},
-    "B1": {"script": "process_b1.py", "needs_source": False},
-    "B2": {"script": "process_b2.py", "needs_source": False},
-    "C1": {"script": "process_c1.py", "needs_source": False},
-    "C2": {"script": "process_c2.py", "needs_source": False},
-    "C3": {"script": "process_c3.py", "needs_source": False},
-    "D1": {"script": "process_d1.py", "needs_source": False},
-    "D2": {"script": "process_d2.py", "needs_source": False},
-    "E2": {"script": "process_e2.py", "needs_source": False},
-    "F1": {"script": "process_f1.py", "needs_source": False},
+    "A1": {"module": "process_a1", "needs_source": True},
+    "A2": {"module": "process_a2", "needs_source": True},
+    "A3": {"module": "process_a3", "needs_source": True},
+    "B1": {"module": "process_b1", "needs_source": False},
+    "B2": {"module": "process_b2", "needs_source": False},
+    "C1": {"module": "process_c1", "needs_source": False},
+    "C2": {"module": "process_c2", "needs_source": False},
+    "C3": {"module": "process_c3", "needs_source": False},
+    "D1": {"module": "process_d1", "needs_source": False},
+    "D2": {"module": "process_d2", "needs_source": False},
+    "E2": {"module": "process_e2", "needs_source": False},
+    "F1": {"module": "process_f1", "needs_source": False},
     # E1 intentionally has no processor
 }
 
+# feature -> imported processor module (None if the module is missing)
+_PROCESSORS: dict = {}
+
+
+def load_processor(feature: str):
+    """Import (once) and return the processor module for a feature."""
+    if feature not in _PROCESSORS:
+        cfg = PROCESS_CONFIG.get(feature)
+        module = None
+        if cfg:
+            try:
+                module = importlib.import_module(cfg["module"])
+            except ImportError as e:
+                # Processor not present yet – skip this feature.
+                print(f"[!] {feature} processor unavailable: {e}", file=sys.stderr)
+        _PROCESSORS[feature] = module
+    return _PROCESSORS[feature]
+
+
+# Whether C1 resolves rDNS offline (cache only); part of the result cache key
+_rdns_offline = False
+
+
+def configure_rdns(cache_dir: str | None, offline: bool):
+    """Point C1's reverse DNS at the shared on-disk cache (rdns_cache.py)."""
+    global _rdns_offline
+    _rdns_offline = offline
+    module = load_processor("C1")
+    if module is not None:
+        module.configure_rdns(cache_dir, offline)
+
 
 def run_processor(
     feature: str,
     source_path: str | None,
     hits_path: str,
     analysis_root: str,
+    hits_text: str,
+    source_buffer: bytes | None = None,
+    details: bool = True,
 ):
     """
-    Call the appropriate process_<feature>.py in the same directory as this script.
-
-    Calling convention (keeps current process_* scripts working):
-      - If needs_source:
-            process_xx.py <hits_path> <source_path> <analysis_root>
-      - Else:
-            process_xx.py <hits_path> <analysis_root>
+    Run the process_<feature>.py processor in-process on the hits of
+    hits_path. Returns the FeatureResult, or None if the processor did
+    not run.
 
-    Existing process_* scripts that only read the first 1–2 args
-    will ignore the extra analysis_root parameter.
+    hits_text is the exact content of hits_path, so the processor sees the
+    same lines it would get by reading the file back. source_buffer holds
+    the bytes of source_path for processors that need the source.
     """
-    cfg = PROCESS_CONFIG.get(feature)
-    if not cfg:
-        return
-
-    script_name = cfg["script"]
-    needs_source = cfg["needs_source"]
-    here = os.path.dirname(os.path.abspath(__file__))
-    script_path = os.path.join(here, script_name)
+    module = load_processor(feature)
+    if module is None:
+        return None
 
-    if not os.path.exists(script_path):
-        # Processor not present yet – silently skip.
-        return
-
-    if needs_source:
+    if PROCESS_CONFIG[feature]["needs_source"]:
         if source_path is None:
-            return
-        argv = [sys.executable, script_path, hits_path, source_path, analysis_root]
+            return None
+        if source_buffer is None:
+            with open(source_path, "rb") as f:
+                source_buffer = f.read()
     else:
-        argv = [sys.executable, script_path, hits_path, analysis_root]
+        source_buffer = None
 
+    label = module.get_label(hits_path)
     try:
-        subprocess.run(argv, check=True)
-    except subprocess.CalledProcessError as e:
+        ctx = ProcessorContext(hits_path, source_path, analysis_root, label, details=details)
+        result = module.process(split_hit_lines(hits_text), source_buffer, ctx)
+    except Exception as e:
         print(f"[!] {feature} processor failed on {hits_path}: {e}", file=sys.stderr)
+        return None
+    return result
+
+
+A_SERIES = ("A1", "A2", "A3")
+
+
+def run_a_series(
+    source_path: str,
+    hits_paths: dict[str, str],
+    analysis_root: str,
+    hits_text: dict[str, str],
+    source_buffer,
+    details: bool = True,
+) -> dict:
+    """
+    Run A1..A3 as one context-extraction stage (process_a_series.py): all
+    three resolve their hits against the one source_buffer the extractor
+    already holds. Returns feature -> FeatureResult for the processors
+    that ran.
+    """
+    hits_by_feature = {}
+    contexts = {}
+    for feat in A_SERIES:
+        module = load_processor(feat)
+        if module is None:
+            continue
+        hits_path = hits_paths[feat]
+        label = module.get_label(hits_path)
+        hits_by_feature[feat] = split_hit_lines(hits_text[feat])
+        contexts[feat] = ProcessorContext(
+            hits_path, source_path, analysis_root, label, details=details
+        )
+
+    return process_all(hits_by_feature, source_buffer, contexts)
 
 
 # ---------------------------------------------------------------------------
@@ -168,56 +303,39 @@ def run_processor(
 JS_EXTS = (".js", ".mjs", ".cjs", ".ts", ".tsx", ".jsx")
 
 
-def maybe_segment_minified(
-    pkg_root: str,
-    path: str,
-    segmented_root: str,
-) -> str:
+def decode_source(raw: bytes) -> str:
+    """
+    Decode file bytes exactly as open(path, "r", encoding="utf-8",
+    errors="ignore").read() would, universal newlines included.
+    """
+    text = raw.decode("utf-8", errors="ignore")
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
+
+
+def write_segmented_copy(rel_path: str, segmented_root: str, segmented):
     """
-    If file looks minified (<= 10 lines AND any line > 5000 chars),
-    create segmented_<basename> with pseudo-lines under:
+    Write segmented_<basename> for human review under:
 
         segmented_root/<rel_dir>/segmented_<basename>
 
     where <rel_dir> mirrors the original directory structure
-    relative to pkg_root.
-
-    Returns the path to the file to scan (segmented or original).
+    relative to the package root. Scanning never reads this copy.
     """
-    try:
-        with open(path, "r", encoding="utf-8", errors="ignore") as f:
-            lines = f.readlines()
-    except OSError:
-        return path
-
-    if len(lines) > 10 or not any(len(ln) > 5000 for ln in lines):
-        return path  # not minified enough
-
-    text = "".join(lines)
-
-    # Apply the sed-like transformations:
-    text = text.replace(";", ";\n")
-    text = text.replace("{", "{\n")
-    text = text.replace("}", "}\n")
-    text = re.sub(r"\bvar\b", r"\nvar", text)
-    text = re.sub(r"\blet\b", r"\nlet", text)
-    text = re.sub(r"\blet\b", r"\nlet", text)
-    text = re.sub(r"\bconst\b", r"\nconst", text)
-
-    # Mirror the package directory structure under segmented_root
-    rel = os.path.relpath(path, pkg_root)
-    seg_target_dir = os.path.join(segmented_root, os.path.dirname(rel))
+    seg_target_dir = os.path.join(segmented_root, os.path.dirname(rel_path))
     os.makedirs(seg_target_dir, exist_ok=True)
-    out_path = os.path.join(seg_target_dir, "segmented_" + os.path.basename(path))
+    out_path = os.path.join(seg_target_dir, "segmented_" + os.path.basename(rel_path))
 
     try:
-        with open(out_path, "w", encoding="utf-8") as out:
-            out.write(text)
+        if isinstance(segmented, str):
+            with open(out_path, "w", encoding="utf-8") as out:
+                out.write(segmented)
+        else:
+            with open(out_path, "wb") as out:
+                out.write(segmented)
     except OSError as e:
-        print(f"[!] Failed to write segmented file for {path}: {e}", file=sys.stderr)
-        return path
-
-    return out_path
+        print(f"[!] Failed to write segmented file for {rel_path}: {e}", file=sys.stderr)
 
 
 # ---------------------------------------------------------------------------
@@ -279,143 +397,297 @@ F1_HOOK_RE = D2_HOOKSTR_RE
 F1_OPTDEP_RE = re.compile(r'"optionalDependencies"\s*:')
 F1_SCRIPTS_RE = re.compile(r'"scripts"\s*:')
 
+# Scan plan for feature_scanner: each regex with the literals every one of
+# its matches starts with (lower-case for IGNORECASE patterns). Keep these
+# in sync with the patterns above; benchmark_scanner.py checks the output
+# against plain finditer() passes.
+D1_TOOLS = (
+    "npm", "yarn", "pnpm", "bun", "poetry", "pip", "flit", "cargo", "go",
+    "mvn", "gradle", "docker", "podman", "dotnet", "nuget", "gh", "git",
+)
+# Short tool names ("go", "gh", "npm") are everywhere; the verbs are rare.
+D1_VERBS = (
+    "publish", "adduser", "login", "token", "auth", "push", "upload",
+    "release", "credential",
+)
+FEATURE_PATTERNS = [
+    FeaturePattern("A1", A1_RE, ("child_process.", "eval(", "new Function(")),
+    FeaturePattern("A2", A2_RE, ("Buffer.from(", "atob(", "Base64.decode(")),
+    FeaturePattern("A3", A3_RE, (".toString(", "Base64.encode(", "base64Encoder")),
+    FeaturePattern("B1", B1_RE, ("process.env.",)),
+    FeaturePattern("B2", B2_RE, (
+        ".npmrc", ".gitconfig", "id_rsa", "id_dsa", "known_hosts",
+        "authorized_keys", "ssh-agent", "SSH_AUTH_SOCK",
+    )),
+    FeaturePattern("C1", C1_RE, ("http",)),
+    FeaturePattern("C2", C2_RE, (
+        "webhook.site", "requestbin", "pastebin.com", "ngrok.io",
+        "discord.com/api/webhooks", "raw.githubusercontent.com",
+        "gist.github.com", "sts.amazonaws.com", "signin.aws.amazonaws.com",
+        "accounts.google.com", "login.microsoftonline.com", "graph.microsoft.com",
+    )),
+    FeaturePattern("C3", C3_RE, ("child_process.", "fetch", "new", "require(", ".request")),
+    FeaturePattern("D1", D1_RE, D1_TOOLS, required=D1_VERBS),
+    # E1 has no literal anchor; scanned with a plain finditer()
+    FeaturePattern("E1", E1_RE),
+]
+
+# Every D2 line match contains one of these (PKGWRITE needs "fs.", SCRIPTS
+# always contains "scripts", HOOKSTR is a quoted hook name).
+D2_HOOK_NAMES = (
+    "preinstall", "install", "postinstall", "prepare", "prepack", "postpack",
+    "preversion", "version", "postversion", "prepublish", "prepublishOnly",
+    "publish", "postpublish", "prerestart", "restart", "postrestart",
+    "prebuild", "build", "postbuild",
+)
+D2_ANCHORS = ("fs.", "scripts") + tuple(f'"{name}"' for name in D2_HOOK_NAMES)
+
+# D2 prefilter: each anchor is only searched for if its gate token occurs
+# in the file. PKGWRITE lines need "package.json" next to "fs.", and every
+# hook name contains one of the stems.
+D2_HOOK_STEMS = ("install", "publish", "version", "restart", "build", "prepare", "pack")
+D2_GATES = (
+    ("package.json", ("fs.",)),
+    ("scripts", ("scripts",)),
+) + tuple(
+    (stem, tuple(f'"{name}"' for name in D2_HOOK_NAMES if stem in name))
+    for stem in D2_HOOK_STEMS
+)
+
+# Byte-native (--mmap) scan plan. \b, \s and IGNORECASE are ASCII-only here.
+FEATURE_PATTERNS_BYTES = [as_bytes_pattern(p) for p in FEATURE_PATTERNS]
+D2_GATES_BYTES = tuple(
+    (token.encode(), tuple(a.encode() for a in anchors)) for token, anchors in D2_GATES
+)
+
+# Literal prefilter counts of this process (reported per run)
+PREFILTER_STATS = PrefilterStats()
+
 
 # ---------------------------------------------------------------------------
 # Per-file feature extraction
 # ---------------------------------------------------------------------------
 
-def byte_offset(text: str, char_pos: int) -> int:
-    """Return UTF-8 byte offset for a character position."""
-    return len(text[:char_pos].encode("utf-8"))
+def map_file(path: str):
+    """Read-only mmap of path (b"" for an empty file, which mmap rejects)."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def collect_d2(numbered_lines, rel_path: str, hits: dict[str, list[str]]):
+    for lineno, line in numbered_lines:
+        if D2_PKGWRITE_RE.search(line):
+            hits["D2"].append(f"[PKGWRITE] {rel_path}:{lineno}:{line.strip()}\n")
+        if D2_SCRIPTS_RE.search(line):
+            hits["D2"].append(f"[SCRIPTS] {rel_path}:{lineno}:{line.strip()}\n")
+        if D2_HOOKSTR_RE.search(line):
+            hits["D2"].append(f"[HOOKSTR] {rel_path}:{lineno}:{line.strip()}\n")
+
+
+def collect_text_hits(text: str, seg, rel_path: str, hits: dict[str, list[str]]):
+    """
+    A1..E2 hits for a file decoded as UTF-8 text (the default mode). seg is
+    the SegmentedSource of a minified file (or None): features are scanned
+    on its pseudo-lines, and offsets are mapped back to the original.
+    """
+    scan = seg.text if seg else text
+    index = seg.index if seg else SourceIndex(text)
+    orig_index = SourceIndex(text) if seg else index
+
+    # --- A1..D1, E1: one anchored scan over the buffer ---
+    for feat, feat_matches in scan_text(scan, FEATURE_PATTERNS, PREFILTER_STATS).items():
+        for m in feat_matches:
+            pos = m.start()
+            line_no = index.line_of(pos)
+            off = orig_index.byte_offset(seg.to_original(pos) if seg else pos)
+            hits[feat].append(f"{line_no}:{off}:{m.group(0)}\n")
+
+    # --- D2 (script manipulation tags) ---
+    # Only lines containing a D2 anchor can match; run the tag regexes there.
+    anchors = gated_anchors(scan, D2_GATES)
+    lines = lines_containing(scan, anchors) if anchors else []
+    PREFILTER_STATS.count(not lines)
+    collect_d2(lines, rel_path, hits)
+
+    # --- E2 (very long original lines – NOT segmented) ---
+    for lineno, line in enumerate(text.split("\n"), start=1):
+        if len(line) > 1000:
+            hits["E2"].append(f"{lineno}:{len(line)}\n")
+
+
+def collect_mapped_hits(buf, seg, rel_path: str, hits: dict[str, list[str]]):
+    """
+    A1..E2 hits straight from the mapped bytes (--mmap). Offsets are real
+    file offsets; match text is decoded only for writing the hit line.
+    """
+    scan = seg.text if seg else buf
+    index = seg.index if seg else SourceIndex(buf)
+    for feat, feat_matches in scan_text(scan, FEATURE_PATTERNS_BYTES, PREFILTER_STATS).items():
+        for m in feat_matches:
+            pos = m.start()
+            line_no = index.line_of(pos)
+            off = seg.to_original(pos) if seg else pos
+            text = m.group(0).decode("utf-8", errors="ignore")
+            hits[feat].append(f"{line_no}:{off}:{text}\n")
+
+    anchors = gated_anchors(scan, D2_GATES_BYTES)
+    lines = byte_lines_containing(scan, anchors, index) if anchors else []
+    PREFILTER_STATS.count(not lines)
+    collect_d2(
+        (
+            (lineno, line.decode("utf-8", errors="ignore"))
+            for lineno, line in lines
+        ),
+        rel_path,
+        hits,
+    )
+
+    # E2 measures the original file in characters, as in text mode.
+    orig_index = SourceIndex(buf) if seg else index
+    for lineno, start, end in orig_index.line_spans():
+        if end - start <= 1000:
+            continue  # never more characters than bytes
+        line = buf[start:end]
+        if line.endswith(b"\r"):
+            line = line[:-1]
+        L = len(line.decode("utf-8", errors="ignore"))
+        if L > 1000:
+            hits["E2"].append(f"{lineno}:{L}\n")
 
 
 def extract_for_file(
     pkg_root: str,
     src_path: str,
-    static_dir: str,
+    outputs: PackageOutputs,
     segmented_root: str,
-    analysis_root: str,
+    use_mmap: bool = False,
+    write_segmented: bool = False,
+    cache=None,
 ):
     """
     Run A1..E2 (except F1) on a single JS/TS file.
+
+    The file is read once (memory-mapped with use_mmap) and handed to
+    extract_for_buffer().
+    """
+    try:
+        if use_mmap:
+            source_buffer = map_file(src_path)
+        else:
+            with open(src_path, "rb") as f:
+                source_buffer = f.read()
+    except (OSError, ValueError) as e:
+        print(f"[!] Could not read {src_path}: {e}", file=sys.stderr)
+        outputs.put_manifest_file(os.path.relpath(src_path, pkg_root), 0, None, "unreadable")
+        outputs.commit()
+        return
+
+    try:
+        extract_for_buffer(
+            os.path.relpath(src_path, pkg_root),
+            src_path,
+            source_buffer,
+            outputs,
+            segmented_root,
+            use_mmap,
+            write_segmented,
+            cache,
+        )
+    finally:
+        if isinstance(source_buffer, mmap.mmap):
+            source_buffer.close()
+
+
+def extract_for_buffer(
+    rel_path: str,
+    src_path: str,
+    source_buffer,
+    outputs: PackageOutputs,
+    segmented_root: str,
+    use_mmap: bool = False,
+    write_segmented: bool = False,
+    cache=None,
+):
+    """
+    Run A1..E2 (except F1) on the bytes of one JS/TS file and send hits,
+    scores and details to outputs. rel_path is its path inside the package
+    (for labels); src_path is only reported.
+
+    A minified file is segmented in memory, and the segmented copy goes to
+    segmented_root only with write_segmented. With use_mmap the buffer
+    (an mmap or bytes) is scanned with bytes regexes. Either way, A1/A2/A3
+    slice context out of the original buffer.
+
+    With a FileResultCache, files whose bytes were seen before only get
+    their cached Scores/ written. C1 classifies IP URLs by their rDNS, so
+    online and offline scans keep separate cache entries.
     """
-    rel_path = os.path.relpath(src_path, pkg_root)
     label = sanitize_label(rel_path)
+    digest = hashlib.sha256(source_buffer).hexdigest()
+    outputs.put_manifest_file(rel_path, len(source_buffer), digest, "scanned")
+
+    key = None
+    if cache is not None:
+        mode = "mmap" if use_mmap else "text"
+        if _rdns_offline:
+            mode += ":offline"
+        key = content_key(source_buffer, mode, digest)
+        cached = cache.get(key)
+        if cached is not None:
+            for feat, scores in cached.items():
+                outputs.put_scores(feat, label, scores)
+            outputs.put_file(label, rel_path, cached, cached=True)
+            outputs.commit()
+            return
 
-    # Use segmented copy if minified; store segments under Analysis/.../Segmented_Files
-    scan_path = maybe_segment_minified(pkg_root, src_path, segmented_root)
+    buf = source_buffer if use_mmap else decode_source(source_buffer)
 
-    try:
-        with open(scan_path, "r", encoding="utf-8", errors="ignore") as f:
-            text = f.read()
-    except OSError as e:
-        print(f"[!] Could not read {scan_path}: {e}", file=sys.stderr)
-        return
+    # Minified bundles are scanned as pseudo-lines (see segmentation.py)
+    seg = segment(buf) if looks_minified(buf) else None
+    if seg and write_segmented:
+        write_segmented_copy(rel_path, segmented_root, seg.text)
 
-    # Prepare hit-file paths (now with .txt extension) under Analysis/<pkg>/static_features
+    # Hit-file paths under Analysis/<pkg>/static_features (written with --text-outputs)
     paths: dict[str, str] = {}
     for feat in ["A1", "A2", "A3", "B1", "B2", "C1", "C2", "C3", "D1", "D2", "E1", "E2"]:
-        paths[feat] = os.path.join(static_dir, f"{feat}_extraction_{label}.txt")
-
-    # Open hit files
-    files = {feat: open(p, "w", encoding="utf-8") for feat, p in paths.items()}
-
-    # --- A1 ---
-    for m in A1_RE.finditer(text):
-        line_no = text.count("\n", 0, m.start()) + 1
-        off = byte_offset(text, m.start())
-        files["A1"].write(f"{line_no}:{off}:{m.group(0)}\n")
-
-    # --- A2 ---
-    for m in A2_RE.finditer(text):
-        line_no = text.count("\n", 0, m.start()) + 1
-        off = byte_offset(text, m.start())
-        files["A2"].write(f"{line_no}:{off}:{m.group(0)}\n")
-
-    # --- A3 ---
-    for m in A3_RE.finditer(text):
-        line_no = text.count("\n", 0, m.start()) + 1
-        off = byte_offset(text, m.start())
-        files["A3"].write(f"{line_no}:{off}:{m.group(0)}\n")
-
-    # --- B1 ---
-    for m in B1_RE.finditer(text):
-        line_no = text.count("\n", 0, m.start()) + 1
-        off = byte_offset(text, m.start())
-        files["B1"].write(f"{line_no}:{off}:{m.group(0)}\n")
-
-    # --- B2 ---
-    for m in B2_RE.finditer(text):
-        line_no = text.count("\n", 0, m.start()) + 1
-        off = byte_offset(text, m.start())
-        files["B2"].write(f"{line_no}:{off}:{m.group(0)}\n")
-
-    # --- C1 ---
-    for m in C1_RE.finditer(text):
-        line_no = text.count("\n", 0, m.start()) + 1
-        off = byte_offset(text, m.start())
-        files["C1"].write(f"{line_no}:{off}:{m.group(0)}\n")
-
-    # --- C2 ---
-    for m in C2_RE.finditer(text):
-        line_no = text.count("\n", 0, m.start()) + 1
-        off = byte_offset(text, m.start())
-        files["C2"].write(f"{line_no}:{off}:{m.group(0)}\n")
-
-    # --- C3 ---
-    for m in C3_RE.finditer(text):
-        line_no = text.count("\n", 0, m.start()) + 1
-        off = byte_offset(text, m.start())
-        files["C3"].write(f"{line_no}:{off}:{m.group(0)}\n")
-
-    # --- D1 ---
-    for m in D1_RE.finditer(text):
-        line_no = text.count("\n", 0, m.start()) + 1
-        off = byte_offset(text, m.start())
-        files["D1"].write(f"{line_no}:{off}:{m.group(0)}\n")
+        paths[feat] = outputs.hits_path(feat, label)
 
-    # --- D2 (script manipulation tags) ---
-    for lineno, line in enumerate(text.splitlines(), start=1):
-        if D2_PKGWRITE_RE.search(line):
-            files["D2"].write(f"[PKGWRITE] {rel_path}:{lineno}:{line.strip()}\n")
-        if D2_SCRIPTS_RE.search(line):
-            files["D2"].write(f"[SCRIPTS] {rel_path}:{lineno}:{line.strip()}\n")
-        if D2_HOOKSTR_RE.search(line):
-            files["D2"].write(f"[HOOKSTR] {rel_path}:{lineno}:{line.strip()}\n")
+    # Collect hits in memory; each list is written out verbatim as the hit file
+    hits: dict[str, list[str]] = {feat: [] for feat in paths}
 
-    # --- E1 (long base64-like strings) ---
-    for m in E1_RE.finditer(text):
-        line_no = text.count("\n", 0, m.start()) + 1
-        off = byte_offset(text, m.start())
-        files["E1"].write(f"{line_no}:{off}:{m.group(0)}\n")
-
-    # --- E2 (very long original lines – NOT segmented) ---
-    try:
-        with open(src_path, "r", encoding="utf-8", errors="ignore") as orig:
-            for lineno, line in enumerate(orig, start=1):
-                L = len(line.rstrip("\n"))
-                if L > 1000:
-                    files["E2"].write(f"{lineno}:{L}\n")
-    except OSError as e:
-        print(f"[!] Could not read original for E2 {src_path}: {e}", file=sys.stderr)
-
-    # Close all hit files
-    for f in files.values():
-        f.close()
-
-    # Run processors (now with analysis_root passed as extra arg)
-    run_processor("A1", scan_path, paths["A1"], analysis_root)
-    run_processor("A2", scan_path, paths["A2"], analysis_root)
-    run_processor("A3", scan_path, paths["A3"], analysis_root)
-    run_processor("B1", None, paths["B1"], analysis_root)
-    run_processor("B2", None, paths["B2"], analysis_root)
-    run_processor("C1", None, paths["C1"], analysis_root)
-    run_processor("C2", None, paths["C2"], analysis_root)
-    run_processor("C3", None, paths["C3"], analysis_root)
-    run_processor("D1", None, paths["D1"], analysis_root)
-    run_processor("D2", None, paths["D2"], analysis_root)
-    # E1 has no processor
-    run_processor("E2", None, paths["E2"], analysis_root)
+    if use_mmap:
+        collect_mapped_hits(buf, seg, rel_path, hits)
+    else:
+        collect_text_hits(buf, seg, rel_path, hits)
+
+    # Store all hits
+    hits_text: dict[str, str] = {}
+    for feat in paths:
+        hits_text[feat] = "".join(hits[feat])
+        outputs.put_hits(feat, label, hits_text[feat])
+
+    # Run processors in-process; A1..A3 as one stage over the source buffer
+    analysis_root = outputs.analysis_root
+    results = run_a_series(
+        src_path, paths, analysis_root, hits_text, source_buffer, outputs.details
+    )
+    for feat in ["B1", "B2", "C1", "C2", "C3", "D1", "D2", "E2"]:
+        # E1 has no processor
+        results[feat] = run_processor(
+            feat, None, paths[feat], analysis_root, hits_text[feat],
+            details=outputs.details,
+        )
+
+    results = {f: r for f, r in results.items() if r is not None}
+    for feat, result in results.items():
+        outputs.put_result(feat, label, result)
+    outputs.put_file(label, rel_path, results)
+    outputs.commit()
+
+    if key is not None:
+        cache.put(key, {f: r.scores for f, r in results.items()})
 
 
 # ---------------------------------------------------------------------------
@@ -447,28 +719,42 @@ def find_package_json(pkg_root: str) -> str | None:
     return None
 
 
-def extract_f1_for_package(pkg_root: str, static_dir: str, analysis_root: str):
+def extract_f1_for_package(pkg_root: str, outputs: PackageOutputs):
     pkg_json = find_package_json(pkg_root)
     if not pkg_json:
         return
 
+    with open(pkg_json, "rb") as f:
+        raw = f.read()
     # Label relative to pkg_root so we keep the location info
-    rel = os.path.relpath(pkg_json, pkg_root)
-    label = sanitize_label(rel)  # e.g. 'package--package.json'
-    out_path = os.path.join(static_dir, f"F1_extraction_{label}.txt")
+    extract_f1(os.path.relpath(pkg_json, pkg_root), raw, outputs)
 
-    with open(pkg_json, "r", encoding="utf-8", errors="ignore") as f, \
-         open(out_path, "w", encoding="utf-8") as out:
-        for lineno, line in enumerate(f, start=1):
-            text = line.rstrip("\n")
-            if (
-                F1_HOOK_RE.search(text)
-                or F1_OPTDEP_RE.search(text)
-                or F1_SCRIPTS_RE.search(text)
-            ):
-                out.write(f"{lineno}:0:{text}\n")
 
-    run_processor("F1", None, out_path, analysis_root)
+def extract_f1(rel_path: str, raw: bytes, outputs: PackageOutputs):
+    """F1 hits and processor for the package.json bytes found at rel_path."""
+    label = sanitize_label(rel_path)  # e.g. 'package--package.json'
+    out_path = outputs.hits_path("F1", label)
+
+    hits = []
+    for lineno, line in enumerate(io.StringIO(decode_source(raw)), start=1):
+        text = line.rstrip("\n")
+        if (
+            F1_HOOK_RE.search(text)
+            or F1_OPTDEP_RE.search(text)
+            or F1_SCRIPTS_RE.search(text)
+        ):
+            hits.append(f"{lineno}:0:{text}\n")
+
+    hits_text = "".join(hits)
+    outputs.put_hits("F1", label, hits_text)
+
+    result = run_processor(
+        "F1", None, out_path, outputs.analysis_root, hits_text, details=outputs.details
+    )
+    if result is not None:
+        outputs.put_result("F1", label, result)
+    outputs.put_file(label, rel_path, ["F1"] if result is not None else [])
+    outputs.commit()
 
 
 
@@ -477,58 +763,421 @@ def extract_f1_for_package(pkg_root: str, static_dir: str, analysis_root: str):
 # Main
 # ---------------------------------------------------------------------------
 
-def main():
-    if len(sys.argv) != 2:
-        print("Usage: python3 extract_features.py <package_root>", file=sys.stderr)
-        sys.exit(1)
-
-    pkg_root = os.path.abspath(sys.argv[1])
-    if not os.path.isdir(pkg_root):
-        print(f"Error: {pkg_root} is not a directory", file=sys.stderr)
-        sys.exit(1)
+# Large packages are split into tasks of this many files for --jobs
+# (and by batch_analysis_final.py) so their files can be scanned in parallel.
+FILES_PER_TASK = 200
 
-    # Package name from the argument path
-    package_name = os.path.basename(pkg_root.rstrip(os.sep))
+# Directories skipped within a package
+SKIP_DIRS = ("node_modules", ".git", ".hg", ".svn")
 
-    # Analysis root anchored at the current working directory
-    cwd = os.getcwd()
-    analysis_root = os.path.join(cwd, "Analysis", package_name)
+# Packages are written to Analysis/.partial/<PackageName>/ until complete
+STAGING_DIR = ".partial"
 
-    # Segmented files under Analysis/<pkg>/Segmented_Files
-    segmented_root = os.path.join(analysis_root, "Segmented_Files")
-    os.makedirs(segmented_root, exist_ok=True)
 
-    # Hits under Analysis/<pkg>/static_features
-    static_dir = os.path.join(analysis_root, "static_features")
-    os.makedirs(static_dir, exist_ok=True)
+def list_source_files(pkg_root: str) -> list[str]:
+    """All JS/TS files of a package, in scan order."""
+    files = []
+    for dirpath, dirnames, filenames in os.walk(pkg_root):
+        # Skip some noisy dirs (within the package itself)
+        dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS]
+        for filename in filenames:
+            if filename.lower().endswith(JS_EXTS):
+                files.append(os.path.join(dirpath, filename))
+    return files
 
-    # One-time F1 on package.json
-    extract_f1_for_package(pkg_root, static_dir, analysis_root)
 
-    # Walk JS/TS files
+def walk_package(pkg_root: str):
+    """
+    The extractor's one walk over a package directory. Returns its JS/TS
+    files in scan order (as list_source_files()) and the manifest entries
+    (rel_path, size, status) of every file, skipped directories included.
+    """
+    files = []
+    manifest = []
     for dirpath, dirnames, filenames in os.walk(pkg_root):
-        # Skip some noisy dirs (within the package itself)
-        dirnames[:] = [
-            d for d in dirnames
-            if d not in ("node_modules", ".git", ".hg", ".svn")
-        ]
+        rel_dir = os.path.relpath(dirpath, pkg_root)
+        in_skipped = any(part in SKIP_DIRS for part in rel_dir.split(os.sep))
         for filename in filenames:
-            if not filename.lower().endswith(JS_EXTS):
+            path = os.path.join(dirpath, filename)
+            source = not in_skipped and filename.lower().endswith(JS_EXTS)
+            if source:
+                files.append(path)
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                manifest.append((os.path.relpath(path, pkg_root), 0, "unreadable"))
                 continue
-            full_path = os.path.join(dirpath, filename)
+            status = "scanned" if source else "skipped"
+            manifest.append((os.path.relpath(path, pkg_root), size, status))
+    return files, manifest
+
+
+def split_files(files: list[str], size: int = FILES_PER_TASK) -> list[list[str]]:
+    """Chunk a package's file list into file-level tasks (at least one)."""
+    return [files[i:i + size] for i in range(0, len(files), size)] or [[]]
+
+
+def extract_files(
+    pkg_root: str,
+    work_dir: str,
+    files: list[str],
+    with_f1: bool = False,
+    use_mmap: bool = False,
+    write_segmented: bool = False,
+    cache_dir: str | None = None,
+    run_id: str | None = None,
+    text_outputs: bool = False,
+    summary_only: bool = False,
+    sparse: bool = False,
+    rdns_cache: str | None = None,
+    offline: bool = False,
+    staging: str | None = None,
+    manifest=None,
+):
+    """
+    Extract features for some files of a package into its staging
+    directory (staging, or staging_root()) for
+    <work_dir>/Analysis/<PackageName>/ (see promote(); its
+    results.sqlite, plus the text
+    files with text_outputs; no Details with summary_only; only non-zero
+    features with sparse). One file-level task; with_f1 also runs the
+    package-level F1 step (exactly one task per package should), and
+    records the walk_package() manifest entries passed as manifest.
+    With cache_dir, per-file scores go through the result cache and the
+    hit/miss counts are recorded under run_id.
+    """
+    cache = get_cache(cache_dir, run_id) if cache_dir else None
+    configure_rdns(rdns_cache, offline)
+
+    # Package name from the argument path
+    package_name = os.path.basename(pkg_root.rstrip(os.sep))
+
+    analysis_root = os.path.join(work_dir, "Analysis", package_name)
+    write_root = staging or staging_root(work_dir, package_name)
+
+    # Segmented copies (review only) under Analysis/<pkg>/Segmented_Files
+    segmented_root = os.path.join(write_root, "Segmented_Files")
+    if write_segmented:
+        os.makedirs(segmented_root, exist_ok=True)
+
+    outputs = PackageOutputs(
+        analysis_root, text_outputs, not summary_only, sparse, write_root
+    )
+    outputs.put_options(
+        {"sparse": sparse, "mmap": use_mmap, "offline": offline, "rdns_cache": rdns_cache}
+    )
+    try:
+        # One-time F1 on package.json
+        if with_f1:
+            extract_f1_for_package(pkg_root, outputs)
+        if manifest is not None:
+            outputs.put_manifest(manifest)
+            outputs.commit()
+
+        for full_path in files:
             print(f"[+] Scanning {os.path.relpath(full_path, pkg_root)}")
             extract_for_file(
                 pkg_root,
                 full_path,
-                static_dir,
+                outputs,
                 segmented_root,
-                analysis_root,
+                use_mmap,
+                write_segmented,
+                cache,
             )
+    finally:
+        outputs.close()
+    if cache is not None:
+        cache.flush_stats()
+    return analysis_root
+
+
+def is_tarball_source(rel_path: str) -> bool:
+    """Tarball counterpart of list_source_files()' filter."""
+    parts = rel_path.split("/")
+    return (
+        parts[-1].lower().endswith(JS_EXTS)
+        and not any(d in SKIP_DIRS for d in parts[:-1])
+    )
+
+
+def pick_package_json(candidates: dict[str, bytes]) -> str | None:
+    """find_package_json() over the package.json members of a tarball."""
+    for rel in ("package.json", "package/package.json"):
+        if rel in candidates:
+            return rel
+    return next(iter(candidates), None)
+
+
+def extract_tarball(
+    tgz_path: str,
+    work_dir: str,
+    use_mmap: bool = False,
+    write_segmented: bool = False,
+    cache_dir: str | None = None,
+    run_id: str | None = None,
+    text_outputs: bool = False,
+    summary_only: bool = False,
+    sparse: bool = False,
+    rdns_cache: str | None = None,
+    offline: bool = False,
+    staging: str | None = None,
+):
+    """
+    Extract features for a package tarball into the staging directory
+    (staging, or staging_root()) for <work_dir>/Analysis/<name>/ in one
+    streamed pass; the outputs are
+    those of extract_files() on the extracted <name>/ directory. Source
+    members are scanned as they are read (as bytes with use_mmap) and
+    package.json members are kept for F1, which runs at the end.
+    """
+    cache = get_cache(cache_dir, run_id) if cache_dir else None
+    configure_rdns(rdns_cache, offline)
+    pkg = TarballPackage(tgz_path)
+
+    analysis_root = os.path.join(work_dir, "Analysis", pkg.name)
+    write_root = staging or staging_root(work_dir, pkg.name)
+    segmented_root = os.path.join(write_root, "Segmented_Files")
+    if write_segmented:
+        os.makedirs(segmented_root, exist_ok=True)
+
+    outputs = PackageOutputs(
+        analysis_root, text_outputs, not summary_only, sparse, write_root
+    )
+    outputs.put_options(
+        {"sparse": sparse, "mmap": use_mmap, "offline": offline, "rdns_cache": rdns_cache}
+    )
+    try:
+        package_jsons: dict[str, bytes] = {}
+        for rel_path, data in pkg.members(
+            lambda rel: is_tarball_source(rel) or rel.endswith("/package.json")
+            or rel == "package.json"
+        ):
+            if posixpath.basename(rel_path) == "package.json":
+                package_jsons.setdefault(rel_path, data)
+                continue
+            print(f"[+] Scanning {rel_path}")
+            extract_for_buffer(
+                rel_path,
+                os.path.join(tgz_path, rel_path),
+                data,
+                outputs,
+                segmented_root,
+                use_mmap,
+                write_segmented,
+                cache,
+            )
+
+        pkg_json = pick_package_json(package_jsons)
+        if pkg_json:
+            extract_f1(pkg_json, package_jsons[pkg_json], outputs)
+
+        # Every member's size from the same pass (repeated members add up,
+        # as in the header total)
+        sizes: dict[str, int] = {}
+        for rel_path, size in pkg.files:
+            sizes[rel_path] = sizes.get(rel_path, 0) + size
+        outputs.put_manifest([
+            (rel_path, size, "scanned" if is_tarball_source(rel_path) else "skipped")
+            for rel_path, size in sizes.items()
+        ])
+        outputs.commit()
+    finally:
+        outputs.close()
+
+    if cache is not None:
+        cache.flush_stats()
+    return analysis_root
+
+
+def staging_root(work_dir: str, package_name: str) -> str:
+    """Where a package's outputs are written until it is complete."""
+    return os.path.join(work_dir, "Analysis", STAGING_DIR, package_name)
+
+
+def discard_staging(work_dir: str, package_name: str):
+    """Remove what an interrupted or failed extraction left in staging."""
+    shutil.rmtree(staging_root(work_dir, package_name), ignore_errors=True)
+
+
+def promote(work_dir: str, package_name: str, staged: str | None = None) -> str:
+    """
+    Rename a completed package's staging directory (staged, or
+    staging_root()) to <work_dir>/Analysis/<PackageName>/ (replacing an
+    older analysis). Analysis/<PackageName>/ therefore only ever holds
+    complete results.
+    """
+    final = os.path.join(work_dir, "Analysis", package_name)
+    staged = staged or staging_root(work_dir, package_name)
+    if os.path.isdir(final):
+        old = staged + ".old"
+        shutil.rmtree(old, ignore_errors=True)
+        os.rename(final, old)
+        os.rename(staged, final)
+        shutil.rmtree(old)
+    else:
+        os.rename(staged, final)
+    return final
+
+
+def capture_output(fn, *args, **kwargs):
+    """
+    Run fn with stdout/stderr captured, for pool workers whose output the
+    parent prints in order. Returns (ok, output, error).
+    """
+    buf = io.StringIO()
+    try:
+        with redirect_stdout(buf), redirect_stderr(buf):
+            fn(*args, **kwargs)
+    except Exception as e:
+        return False, buf.getvalue(), f"{type(e).__name__}: {e}"
+    return True, buf.getvalue(), ""
+
+
+def _extract_files_task(pkg_root, work_dir, files, with_f1, manifest, *options):
+    ok, output, error = capture_output(
+        extract_files, pkg_root, work_dir, files, with_f1, *options, manifest=manifest
+    )
+    # Pool workers are reused; hand this task's prefilter counts back
+    return ok, output, error, PREFILTER_STATS.take()
+
+
+def extract_directory(pkg_root: str, work_dir: str, jobs: int, options: tuple) -> str:
+    """analyze_package() for an extracted package directory."""
+    files, manifest = walk_package(pkg_root)
+    chunks = split_files(files)
+    if jobs <= 1 or len(chunks) == 1:
+        return extract_files(pkg_root, work_dir, files, True, *options, manifest=manifest)
+
+    failed = []
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [
+            pool.submit(
+                _extract_files_task, pkg_root, work_dir, chunk, i == 0,
+                manifest if i == 0 else None, *options,
+            )
+            for i, chunk in enumerate(chunks)
+        ]
+        for future in futures:
+            ok, output, error, prefilter = future.result()
+            PREFILTER_STATS.add(prefilter)
+            sys.stdout.write(output)
+            if not ok:
+                failed.append(error)
+    if failed:
+        raise RuntimeError(f"{len(failed)} file task(s) failed: {failed[0]}")
+    package_name = os.path.basename(pkg_root.rstrip(os.sep))
+    return os.path.join(work_dir, "Analysis", package_name)
 
+
+def analyze_package(
+    pkg_root: str,
+    work_dir: str,
+    use_mmap: bool = False,
+    write_segmented: bool = False,
+    jobs: int = 1,
+    cache_dir: str | None = None,
+    run_id: str | None = None,
+    text_outputs: bool = False,
+    summary_only: bool = False,
+    sparse: bool = False,
+    rdns_cache: str | None = None,
+    offline: bool = False,
+) -> str:
+    """
+    Extract all features of the package at pkg_root into
+    <work_dir>/Analysis/<PackageName>/ and return that directory. The
+    outputs are written to a staging directory and only renamed into
+    place once the whole package succeeded.
+
+    pkg_root may also be a package tarball (see extract_tarball()). With
+    jobs > 1 the files of a directory are split into FILES_PER_TASK chunks
+    that run on a process pool; their output is printed in file order.
+    With cache_dir, the file cache's hit/miss statistics for run_id (a new
+    run unless given) are printed at the end.
+    """
+    if cache_dir and not run_id:
+        run_id = new_run_id()
+    options = (
+        use_mmap, write_segmented, cache_dir, run_id, text_outputs, summary_only, sparse,
+        rdns_cache, offline,
+    )
+
+    if is_tarball(pkg_root):
+        package_name = tarball_package_name(pkg_root)
+    else:
+        package_name = os.path.basename(pkg_root.rstrip(os.sep))
+    # Leftovers of an interrupted run are never reused
+    discard_staging(work_dir, package_name)
+    try:
+        if is_tarball(pkg_root):
+            extract_tarball(pkg_root, work_dir, *options)
+        else:
+            extract_directory(pkg_root, work_dir, jobs, options)
+    except BaseException:
+        discard_staging(work_dir, package_name)
+        raise
+    analysis_root = promote(work_dir, package_name)
+
+    if cache_dir:
+        hits, misses = get_cache(cache_dir, run_id).run_stats()
+        print(f"[+] File cache ({run_id}): {format_stats(hits, misses)}")
+    print(f"[+] Literal prefilter: {PREFILTER_STATS}")
     print("[+] Feature extraction complete.")
+    return analysis_root
 
 
-if __name__ == "__main__":
-    main()
+def main():
+    parser = argparse.ArgumentParser(
+        usage="python3 extract_features.py [options] <package_root | package.tgz>"
+    )
+    parser.add_argument("package_root",
+                        help="Extracted npm package directory, or a package .tgz.")
+    parser.add_argument("--mmap", action="store_true",
+                        help="Memory-map files and scan them as bytes.")
+    parser.add_argument("--write-segmented", action="store_true",
+                        help="Also write segmented copies of minified files for review.")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="Worker processes for file-level tasks (default: 1).")
+    parser.add_argument("--cache", dest="cache_dir", default=None,
+                        help="Directory of the content-addressed per-file result cache.")
+    parser.add_argument("--cache-run-id", default=None,
+                        help="Run id for cache hit/miss statistics (set by batch runs).")
+    parser.add_argument("--text-outputs", action="store_true",
+                        help="Also write the static_features/, Scores/ and Details/ text files.")
+    parser.add_argument("--summary-only", action="store_true",
+                        help="Store hits and scores but no Details reports (see explain.py).")
+    parser.add_argument("--sparse", action="store_true",
+                        help="Only store non-zero features (no empty hits, no all-zero scores).")
+    parser.add_argument("--rdns-cache", default=None,
+                        help="Directory of the persistent reverse-DNS cache for C1.")
+    parser.add_argument("--offline", action="store_true",
+                        help="Never resolve reverse DNS live; use only the rDNS cache.")
+    args = parser.parse_args()
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+
+    pkg_root = os.path.abspath(args.package_root)
+    if not os.path.isdir(pkg_root) and not is_tarball(pkg_root):
+        print(f"Error: {pkg_root} is not a directory or .tgz tarball", file=sys.stderr)
+        sys.exit(1)
+
+    # Analysis root anchored at the current working directory
+    analyze_package(
+        pkg_root,
+        os.getcwd(),
+        args.mmap,
+        args.write_segmented,
+        args.jobs,
+        args.cache_dir,
+        args.cache_run_id,
+        args.text_outputs,
+        args.summary_only,
+        args.sparse,
+        args.rdns_cache,
+        args.offline,
+    )
 
 
+if __name__ == "__main__":
+    main()
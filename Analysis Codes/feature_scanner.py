@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+feature_scanner.py
+
+Multi-feature scanning engine used by extract_features.py.
+
+Running one finditer() per feature makes the regex engine walk the whole
+buffer once per feature, trying every alternative at every position. Most
+feature patterns can only start with one of a handful of literals, so this
+module does the following instead:
+
+  1. Every anchor literal of every feature is located with str.find(),
+     which runs at memchr speed.
+  2. Each feature regex is then tried with regex.match(text, pos) only at
+     its candidate positions, in order. Matches that overlap the previous
+     one are skipped, so the hits are exactly what finditer() returns.
+
+Patterns with no usable anchor (E1) fall back to a plain finditer().
+
+Before any of that, a literal prefilter checks whether the file contains
+at least one of a feature's literals at all. These are its `required`
+literals (every match contains one), or else its anchors. If none occurs,
+the feature has no hits and its regex is never evaluated. PrefilterStats
+counts how often that happens. Gates do the same for plain anchor sets
+such as D2's: an anchor is searched for only if its gate token occurs.
+
+The buffer may be a str or any bytes-like object with .find() (bytes,
+mmap); use as_bytes_pattern() to get the bytes form of a FeaturePattern.
+
+IGNORECASE patterns look for their anchors in a lowered copy of the
+text. That copy is only built when lowering keeps every position where
+it is. Four non-ASCII characters (U+0130, U+0131, U+017F, U+212A) also
+match ASCII letters under re.IGNORECASE. When the text contains one of
+them, those features fall back to finditer().
+"""
+import re
+from bisect import bisect_right
+from dataclasses import dataclass
+from itertools import accumulate
+
+
+@dataclass
+class FeaturePattern:
+    feature: str
+    regex: re.Pattern
+    # Every match of `regex` starts with one of these literals. Lower-case
+    # them for IGNORECASE patterns. Empty -> plain finditer() fallback.
+    anchors: tuple[str, ...] = ()
+    # Every match contains one of these literals (same case rule). Set it
+    # when fewer or rarer literals than the anchors rule the feature out;
+    # empty -> the anchors themselves are the prefilter.
+    required: tuple[str, ...] = ()
+
+    @property
+    def ignorecase(self) -> bool:
+        return bool(self.regex.flags & re.IGNORECASE)
+
+
+def as_bytes_pattern(pat: FeaturePattern) -> FeaturePattern:
+    """
+    Same pattern for scanning bytes buffers. Note that \\b, \\s, \\w and
+    IGNORECASE are ASCII-only on bytes patterns.
+    """
+    regex = re.compile(pat.regex.pattern.encode(), pat.regex.flags & ~re.UNICODE)
+    return FeaturePattern(
+        pat.feature,
+        regex,
+        tuple(a.encode() for a in pat.anchors),
+        tuple(r.encode() for r in pat.required),
+    )
+
+
+@dataclass
+class PrefilterStats:
+    """Feature scans checked by the literal prefilter, and how many it skipped."""
+    checked: int = 0
+    skipped: int = 0
+
+    def count(self, skipped: bool):
+        self.checked += 1
+        self.skipped += skipped
+
+    def add(self, other: "PrefilterStats"):
+        self.checked += other.checked
+        self.skipped += other.skipped
+
+    def take(self) -> "PrefilterStats":
+        """Return the counts so far and reset them."""
+        taken = PrefilterStats(self.checked, self.skipped)
+        self.checked = self.skipped = 0
+        return taken
+
+    def __str__(self):
+        rate = 100.0 * self.skipped / self.checked if self.checked else 0.0
+        return f"skipped {self.skipped} of {self.checked} feature scans ({rate:.1f}%)"
+
+
+# Non-ASCII characters that re.IGNORECASE matches against ASCII letters.
+_CASEFOLD_TO_ASCII = ("\u0130", "\u0131", "\u017f", "\u212a")
+
+
+def lowered_view(text):
+    """
+    Return a lower-cased copy of text with the same character positions,
+    or None if IGNORECASE matching cannot be reproduced on such a copy.
+    """
+    if not isinstance(text, str):
+        # bytes IGNORECASE is ASCII-only, exactly what bytes.lower() does
+        return bytes(text).lower()
+    if text.isascii():
+        return text.lower()
+    if any(c in text for c in _CASEFOLD_TO_ASCII):
+        return None
+    # Non-ASCII characters can never be part of an ASCII anchor; replace
+    # each with a single '?' so offsets stay aligned.
+    return text.encode("ascii", "replace").decode("ascii").lower()
+
+
+def find_all(haystack, needle) -> list[int]:
+    """Start offsets of every (possibly overlapping) occurrence of needle."""
+    out = []
+    find = haystack.find
+    i = find(needle)
+    while i != -1:
+        out.append(i)
+        i = find(needle, i + 1)
+    return out
+
+
+def contains_any(haystack, literals: tuple) -> bool:
+    """True if any literal occurs in haystack (str, bytes or mmap)."""
+    find = haystack.find
+    return any(find(lit) != -1 for lit in literals)
+
+
+def gated_anchors(haystack, gates: tuple) -> tuple:
+    """
+    Anchors of every (token, anchors) gate whose token occurs in haystack.
+    Each anchor must contain its gate's token.
+    """
+    out = []
+    for token, anchors in gates:
+        if haystack.find(token) != -1:
+            out.extend(anchors)
+    return tuple(out)
+
+
+def candidate_positions(haystack, anchors: tuple) -> list[int]:
+    """Sorted, de-duplicated start offsets of all anchors in haystack."""
+    found = set()
+    for anchor in anchors:
+        found.update(find_all(haystack, anchor))
+    return sorted(found)
+
+
+def match_at(regex: re.Pattern, text, positions: list[int]) -> list[re.Match]:
+    """
+    Same matches as regex.finditer(text), given that every match starts at
+    one of the (sorted) positions.
+    """
+    out = []
+    last_end = 0
+    match = regex.match
+    for pos in positions:
+        if pos < last_end:
+            continue
+        m = match(text, pos)
+        if m:
+            out.append(m)
+            last_end = m.end()
+    return out
+
+
+def scan_text(
+    text, patterns: list[FeaturePattern], stats: PrefilterStats | None = None
+) -> dict[str, list[re.Match]]:
+    """
+    Run every FeaturePattern over text and return feature -> matches, each
+    list identical to what pattern.regex.finditer(text) yields. Features
+    with anchors are counted in stats (skipped when the prefilter finds
+    none of their literals).
+    """
+    results: dict[str, list[re.Match]] = {}
+    lowered = None
+    lowered_ready = False
+
+    for pat in patterns:
+        if not pat.anchors:
+            results[pat.feature] = list(pat.regex.finditer(text))
+            continue
+
+        haystack = text
+        if pat.ignorecase:
+            if not lowered_ready:
+                lowered = lowered_view(text)
+                lowered_ready = True
+            if lowered is None:
+                results[pat.feature] = list(pat.regex.finditer(text))
+                if stats is not None:
+                    stats.count(False)
+                continue
+            haystack = lowered
+
+        if pat.required and not contains_any(haystack, pat.required):
+            positions = []
+        else:
+            positions = candidate_positions(haystack, pat.anchors)
+        if stats is not None:
+            stats.count(not positions)
+        results[pat.feature] = match_at(pat.regex, text, positions)
+
+    return results
+
+
+def lines_containing(text: str, anchors: tuple[str, ...]) -> list[tuple[int, str]]:
+    """
+    (1-based line number, line) for every line of text.splitlines() that
+    contains at least one anchor, in line order. Anchors must not contain
+    line-break characters.
+    """
+    positions = candidate_positions(text, anchors)
+    if not positions:
+        return []
+
+    chunks = text.splitlines(keepends=True)
+    starts = [0, *accumulate(map(len, chunks))]
+    indices = sorted({bisect_right(starts, pos) - 1 for pos in positions})
+    return [(i + 1, chunks[i].splitlines()[0]) for i in indices]
+
+
+def byte_lines_containing(buf, anchors: tuple[bytes, ...], index) -> list[tuple[int, bytes]]:
+    """
+    Bytes counterpart of lines_containing(). Lines end at b"\\n" and a
+    trailing b"\\r" is dropped, as when reading the file in text mode;
+    index is the SourceIndex of buf.
+    """
+    out = []
+    last_start = -1
+    size = len(buf)
+    for pos in candidate_positions(buf, anchors):
+        start = buf.rfind(b"\n", 0, pos) + 1
+        if start == last_start:
+            continue
+        last_start = start
+        end = buf.find(b"\n", pos)
+        if end == -1:
+            end = size
+        line = buf[start:end]
+        if line.endswith(b"\r"):
+            line = line[:-1]
+        out.append((index.line_of(pos), line))
+    return out
@@ -368,29 +368,11 @@ def add_combo_features(df: pd.DataFrame, out: pd.DataFrame) -> pd.DataFrame:
     return out
 
 # ---------------------------------------------------------------------------
-# 4. Main
+# 4. Whole feature table (also used in-process by scoring_engine.py)
 # ---------------------------------------------------------------------------
 
-def main():
-    if len(sys.argv) < 3:
-        print(
-            "Usage: python3 build_ml_features.py "
-            "input_results.tsv output_features.csv [--fill-missing]"
-        )
-        sys.exit(1)
-
-    input_path = sys.argv[1]
-    output_path = sys.argv[2]
-    fill_missing = "--fill-missing" in sys.argv
-
-    if not os.path.exists(input_path):
-        print(f"[ERROR] Input file not found: {input_path}")
-        sys.exit(1)
-
-    print(f"[+] Loading TSV: {input_path}")
-    df = pd.read_csv(input_path, sep="\t")
-
-    # Required columns (including PACKAGE_SIZE_BYTES for densities)
+def required_columns() -> Set[str]:
+    """Input columns the features are built from (incl. PACKAGE_SIZE_BYTES)."""
     required_cols: Set[str] = set()
     required_cols.update(COUNT_FEATURES)
     required_cols.update(BINARY_COUNT_FEATURES)
@@ -399,12 +381,17 @@ def main():
     required_cols.update(E2_BUCKET_COLS)
     required_cols.update(COMBO_INPUT_COLS)
     required_cols.add("PACKAGE_SIZE_BYTES")
+    return required_cols
+
 
-    df = ensure_required_columns(df, required_cols, fill_missing=fill_missing)
+def build_features(df: pd.DataFrame, fill_missing: bool = False) -> pd.DataFrame:
+    """
+    ML feature table for a consolidated score table (first column: the
+    package). Missing required columns are added to df as 0 with
+    fill_missing, otherwise they are reported and the script exits.
+    """
+    df = ensure_required_columns(df, required_columns(), fill_missing=fill_missing)
 
-    # ------------------------------------------------------------------
-    # Build output feature DataFrame
-    # ------------------------------------------------------------------
     # Always treat the first column as the package identifier
     first_col = df.columns[0]
     out = pd.DataFrame({
@@ -435,6 +422,32 @@ def main():
     # We never want PACKAGE_SIZE_BYTES as a feature
     if "PACKAGE_SIZE_BYTES" in out.columns:
         out = out.drop(columns=["PACKAGE_SIZE_BYTES"])
+    return out
+
+# ---------------------------------------------------------------------------
+# 5. Main
+# ---------------------------------------------------------------------------
+
+def main():
+    if len(sys.argv) < 3:
+        print(
+            "Usage: python3 build_ml_features.py "
+            "input_results.tsv output_features.csv [--fill-missing]"
+        )
+        sys.exit(1)
+
+    input_path = sys.argv[1]
+    output_path = sys.argv[2]
+    fill_missing = "--fill-missing" in sys.argv
+
+    if not os.path.exists(input_path):
+        print(f"[ERROR] Input file not found: {input_path}")
+        sys.exit(1)
+
+    print(f"[+] Loading TSV: {input_path}")
+    df = pd.read_csv(input_path, sep="\t")
+
+    out = build_features(df, fill_missing=fill_missing)
 
     print(f"[+] Writing features → {output_path}")
     out.to_csv(output_path, index=False)
@@ -443,5 +456,3 @@ def main():
 
 if __name__ == "__main__":
     main()
-
-
@@ -68,32 +68,22 @@ def classify(prob, low_thr, high_thr):
         return "HIGH"
 
 
-# ---------------- Main ---------------- #
-
-def main():
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--features", required=True,
-                        help="Path to generated ML features CSV.")
-    parser.add_argument("--model-dir", required=True,
-                        help="Directory containing 4 .npy files + thresholds.")
-    parser.add_argument("--output", default=None,
-                        help="Optional output CSV. Default: <basename>_analysis.csv")
-    args = parser.parse_args()
-
-    feature_path = args.features
-    model_dir = args.model_dir
-
-    # --- Load model files ---
+def load_model(model_dir):
+    """(w, b, X_mean, X_std, low_thr, high_thr) of the model in model_dir."""
     w = np.load(os.path.join(model_dir, "theta_weights.npy"))
     b = float(np.load(os.path.join(model_dir, "theta_bias.npy")))
     X_mean = np.load(os.path.join(model_dir, "norm_mean.npy"))
     X_std = np.load(os.path.join(model_dir, "norm_std.npy"))
-
     low_thr, high_thr = load_thresholds(os.path.join(model_dir, "thresholds"))
-    print(f"[+] Thresholds loaded: LOW <= {low_thr:.5f}, HIGH >= {high_thr:.5f}")
+    return w, b, X_mean, X_std, low_thr, high_thr
 
-    # --- Load feature file ---
-    df = pd.read_csv(feature_path)
+
+def score_features(df, model):
+    """
+    Score a feature table (first column PACKAGE_NAME). Returns
+    (pkg_names, probs, prob5, risks).
+    """
+    w, b, X_mean, X_std, low_thr, high_thr = model
 
     # Package names
     pkg_names = df.iloc[:, 0].astype(str).values
@@ -124,6 +114,51 @@ def main():
 
     # --- Classify ---
     risks = [classify(p, low_thr, high_thr) for p in probs]
+    return pkg_names, probs, prob5, risks
+
+
+def result_table(pkg_names, risks, prob5, low_thr, high_thr):
+    """The batch result table, with the RISK_BANDS rule row at the end."""
+    out_df = pd.DataFrame({
+        "PACKAGE_NAME": pkg_names,
+        "RISK_LEVEL": risks,
+        "PROB_MALICIOUS": prob5
+    })
+
+    bands_text = (
+        f"score <= {low_thr:.5f} => LOW; "
+        f"{low_thr:.5f} < score < {high_thr:.5f} => MEDIUM; "
+        f"score >= {high_thr:.5f} => HIGH"
+    )
+
+    out_df.loc[len(out_df)] = ["RISK_BANDS", "", bands_text]
+    return out_df
+
+
+# ---------------- Main ---------------- #
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--features", required=True,
+                        help="Path to generated ML features CSV.")
+    parser.add_argument("--model-dir", required=True,
+                        help="Directory containing 4 .npy files + thresholds.")
+    parser.add_argument("--output", default=None,
+                        help="Optional output CSV. Default: <basename>_analysis.csv")
+    args = parser.parse_args()
+
+    feature_path = args.features
+    model_dir = args.model_dir
+
+    # --- Load model files ---
+    model = load_model(model_dir)
+    low_thr, high_thr = model[4], model[5]
+    print(f"[+] Thresholds loaded: LOW <= {low_thr:.5f}, HIGH >= {high_thr:.5f}")
+
+    # --- Load feature file ---
+    df = pd.read_csv(feature_path)
+
+    pkg_names, probs, prob5, risks = score_features(df, model)
 
     # --- Print results ---
     print("\n[+] Classification Results")
@@ -141,20 +176,7 @@ def main():
         base = os.path.splitext(os.path.basename(feature_path))[0]
         out_csv = f"{base}_analysis.csv"
 
-    out_df = pd.DataFrame({
-        "PACKAGE_NAME": pkg_names,
-        "RISK_LEVEL": risks,
-        "PROB_MALICIOUS": prob5
-    })
-
-    bands_text = (
-        f"score <= {low_thr:.5f} => LOW; "
-        f"{low_thr:.5f} < score < {high_thr:.5f} => MEDIUM; "
-        f"score >= {high_thr:.5f} => HIGH"
-    )
-
-    out_df.loc[len(out_df)] = ["RISK_BANDS", "", bands_text]
-
+    out_df = result_table(pkg_names, risks, prob5, low_thr, high_thr)
     out_df.to_csv(out_csv, index=False)
     print(f"\n[+] Saved analysis: {out_csv}")
     print("[+] Done.")
@@ -162,5 +184,3 @@ def main():
 
 if __name__ == "__main__":
     main()
-
-
@@ -4,42 +4,11 @@ import sys
 import pandas as pd
 
 
-def main():
-    # ---------------------------------------------------------
-    # Parse arguments
-    # ---------------------------------------------------------
-    if len(sys.argv) < 2:
-        print("Usage: python3 tag_preinstall_packages.py <ANALYSIS_ROOT> [-overwrite]")
-        sys.exit(1)
-
-    analysis_root = sys.argv[1]
-    overwrite = (len(sys.argv) >= 3 and sys.argv[2] == "-overwrite")
-
-    scores_path = os.path.join(analysis_root, "Consolidated_Package_Scores.tsv")
-    batch_path = os.path.join(analysis_root, "batch_analysis_result.csv")
-
-    if overwrite:
-        output_path = batch_path  # overwrite original
-    else:
-        output_path = os.path.join(
-            analysis_root, "batch_analysis_result_w_preinstall.csv"
-        )
-
-    # ---------------------------------------------------------
-    # Validate paths
-    # ---------------------------------------------------------
-    if not os.path.isfile(scores_path):
-        print(f"ERROR: Cannot find {scores_path}")
-        sys.exit(1)
-    if not os.path.isfile(batch_path):
-        print(f"ERROR: Cannot find {batch_path}")
-        sys.exit(1)
-
-    # ---------------------------------------------------------
-    # 1) Load Consolidated_Package_Scores.tsv
-    # ---------------------------------------------------------
-    df_scores = pd.read_csv(scores_path, sep="\t")
-
+def preinstall_map(df_scores: pd.DataFrame) -> dict:
+    """
+    package -> script manipulation flag, for every package of a
+    consolidated score table with F1_hook_preinstall == 1.
+    """
     # package name column detection
     if "PACKAGE_NAME" in df_scores.columns:
         pkg_col = "PACKAGE_NAME"
@@ -58,7 +27,8 @@ def main():
                 f"Missing column '{col}' in Consolidated_Package_Scores.tsv"
             )
 
-    # numeric conversion
+    # numeric conversion (on a copy; the caller's table is left as it is)
+    df_scores = df_scores[[pkg_col] + required_cols].copy()
     for col in required_cols:
         df_scores[col] = pd.to_numeric(df_scores[col], errors="coerce").fillna(0)
 
@@ -71,19 +41,19 @@ def main():
     )
 
     # build mapping: package -> if script manipulation present
-    preinstall_map = {}
+    pre_map = {}
     for _, row in df_pre.iterrows():
         name = str(row[pkg_col])
         flag = bool(row["pkg_script_manipulation"])
-        preinstall_map[name] = preinstall_map.get(name, False) or flag
+        pre_map[name] = pre_map.get(name, False) or flag
+    return pre_map
 
-    print(f"Found {len(preinstall_map)} packages with F1_hook_preinstall == 1")
-
-    # ---------------------------------------------------------
-    # 2) Load batch_analysis_result.csv
-    # ---------------------------------------------------------
-    df_batch = pd.read_csv(batch_path)
 
+def apply_preinstall(df_batch: pd.DataFrame, pre_map: dict) -> pd.DataFrame:
+    """
+    Force RISK_LEVEL to HIGH and fill PREINSTALL for the packages of
+    pre_map in a batch result table (PACKAGE_NAME, RISK_LEVEL, ...).
+    """
     if "PACKAGE_NAME" not in df_batch.columns:
         raise KeyError("batch_analysis_result.csv must contain 'PACKAGE_NAME'")
     if "RISK_LEVEL" not in df_batch.columns:
@@ -95,10 +65,10 @@ def main():
 
     # Helper flags
     df_batch["_has_preinstall"] = df_batch["PACKAGE_NAME"].map(
-        lambda n: str(n) in preinstall_map
+        lambda n: str(n) in pre_map
     )
     df_batch["_script_manip"] = df_batch["PACKAGE_NAME"].map(
-        lambda n: preinstall_map.get(str(n), False)
+        lambda n: pre_map.get(str(n), False)
     )
 
     mask_pre = df_batch["_has_preinstall"]
@@ -112,9 +82,7 @@ def main():
     )
     df_batch.loc[mask_pre & ~df_batch["_script_manip"], "PREINSTALL"] = "YES"
 
-    # ---------------------------------------------------------
-    # 2b) Update RISK_BANDS summary row (if present)
-    # ---------------------------------------------------------
+    # Update RISK_BANDS summary row (if present)
     bands_mask = df_batch["PACKAGE_NAME"] == "RISK_BANDS"
     if bands_mask.any():
         df_batch.loc[
@@ -122,7 +90,53 @@ def main():
         ] = "YES = preinstall present; RISK_LEVEL forced to HIGH"
 
     # Remove helper columns
-    df_batch = df_batch.drop(columns=["_has_preinstall", "_script_manip"])
+    return df_batch.drop(columns=["_has_preinstall", "_script_manip"])
+
+
+def main():
+    # ---------------------------------------------------------
+    # Parse arguments
+    # ---------------------------------------------------------
+    if len(sys.argv) < 2:
+        print("Usage: python3 tag_preinstall_packages.py <ANALYSIS_ROOT> [-overwrite]")
+        sys.exit(1)
+
+    analysis_root = sys.argv[1]
+    overwrite = (len(sys.argv) >= 3 and sys.argv[2] == "-overwrite")
+
+    scores_path = os.path.join(analysis_root, "Consolidated_Package_Scores.tsv")
+    batch_path = os.path.join(analysis_root, "batch_analysis_result.csv")
+
+    if overwrite:
+        output_path = batch_path  # overwrite original
+    else:
+        output_path = os.path.join(
+            analysis_root, "batch_analysis_result_w_preinstall.csv"
+        )
+
+    # ---------------------------------------------------------
+    # Validate paths
+    # ---------------------------------------------------------
+    if not os.path.isfile(scores_path):
+        print(f"ERROR: Cannot find {scores_path}")
+        sys.exit(1)
+    if not os.path.isfile(batch_path):
+        print(f"ERROR: Cannot find {batch_path}")
+        sys.exit(1)
+
+    # ---------------------------------------------------------
+    # 1) Load Consolidated_Package_Scores.tsv
+    # ---------------------------------------------------------
+    df_scores = pd.read_csv(scores_path, sep="\t")
+    pre_map = preinstall_map(df_scores)
+
+    print(f"Found {len(pre_map)} packages with F1_hook_preinstall == 1")
+
+    # ---------------------------------------------------------
+    # 2) Load batch_analysis_result.csv and apply the override
+    # ---------------------------------------------------------
+    df_batch = pd.read_csv(batch_path)
+    df_batch = apply_preinstall(df_batch, pre_map)
 
     # ---------------------------------------------------------
     # 3) Save output
@@ -137,5 +151,3 @@ def main():
 
 if __name__ == "__main__":
     main()
-
-
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+package_scores.py
+Usage:
+    python3 package_scores.py show <analysis_root>
+
+Store of the per-package score totals behind Consolidated_Package_Scores.tsv.
+
+compile_scores.py upserts one package at a time into
+
+    Analysis/package_scores.sqlite
+      meta     (key, value)                  extracted_root of the last compile
+      packages (package, signature, has_scores)
+                                             one row per compiled package dir;
+                                             signature = what its totals were
+                                             built from (see compile_scores.py)
+      totals   (package, metric, value)      the package's totals per metric
+
+and materialises the TSV (and compile_scores_root.log) from it. Adding or
+updating one package is one upsert instead of a pass over the corpus;
+the table is then rewritten from the store, streaming one package at a
+time in package order. Its columns are the metrics of all stored
+packages, so it is the same table a full compile writes.
+
+The command above prints the number of stored packages and metrics.
+"""
+import os
+import sqlite3
+import sys
+
+DB_NAME = "package_scores.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS packages (
+    package    TEXT PRIMARY KEY,
+    signature  TEXT NOT NULL,
+    has_scores INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS totals (
+    package TEXT NOT NULL,
+    metric  TEXT NOT NULL,
+    value   INTEGER NOT NULL,
+    PRIMARY KEY (package, metric)
+);
+CREATE INDEX IF NOT EXISTS totals_metric ON totals(metric);
+"""
+
+
+def store_path(analysis_root: str) -> str:
+    return os.path.join(analysis_root, DB_NAME)
+
+
+class PackageScores:
+    def __init__(self, analysis_root: str):
+        self.path = store_path(analysis_root)
+        self._db = sqlite3.connect(self.path, timeout=60)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        self._db.commit()
+
+    def signature(self, package: str) -> str | None:
+        row = self._db.execute(
+            "SELECT signature FROM packages WHERE package = ?", (package,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def upsert(self, package: str, signature: str, totals: dict[str, int] | None):
+        """Replace a package's totals (None or {}: compiled, but no scores)."""
+        with self._db:
+            self._db.execute("DELETE FROM totals WHERE package = ?", (package,))
+            self._db.execute(
+                "INSERT OR REPLACE INTO packages (package, signature, has_scores) "
+                "VALUES (?, ?, ?)",
+                (package, signature, 1 if totals else 0),
+            )
+            if totals:
+                self._db.executemany(
+                    "INSERT INTO totals (package, metric, value) VALUES (?, ?, ?)",
+                    [(package, m, v) for m, v in totals.items()],
+                )
+
+    def delete(self, package: str):
+        with self._db:
+            self._db.execute("DELETE FROM totals WHERE package = ?", (package,))
+            self._db.execute("DELETE FROM packages WHERE package = ?", (package,))
+
+    def packages(self) -> list[str]:
+        return [r[0] for r in self._db.execute("SELECT package FROM packages ORDER BY package")]
+
+    def packages_without_scores(self) -> list[str]:
+        return [
+            r[0]
+            for r in self._db.execute(
+                "SELECT package FROM packages WHERE has_scores = 0 ORDER BY package"
+            )
+        ]
+
+    def count_with_scores(self) -> int:
+        return self._db.execute(
+            "SELECT COUNT(*) FROM packages WHERE has_scores = 1"
+        ).fetchone()[0]
+
+    def metrics(self) -> set[str]:
+        return {r[0] for r in self._db.execute("SELECT DISTINCT metric FROM totals")}
+
+    def iter_totals(self):
+        """Yield (package, {metric: value}) for packages with scores, in package order."""
+        cur = self._db.execute(
+            "SELECT t.package, t.metric, t.value FROM totals t "
+            "JOIN packages p ON p.package = t.package WHERE p.has_scores = 1 "
+            "ORDER BY t.package"
+        )
+        package, totals = None, {}
+        for pkg, metric, value in cur:
+            if pkg != package:
+                if package is not None:
+                    yield package, totals
+                package, totals = pkg, {}
+            totals[metric] = value
+        if package is not None:
+            yield package, totals
+
+    def get_meta(self, key: str) -> str | None:
+        row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str | None):
+        with self._db:
+            if value is None:
+                self._db.execute("DELETE FROM meta WHERE key = ?", (key,))
+            else:
+                self._db.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, value))
+
+    def close(self):
+        self._db.close()
+
+
+def main():
+    if len(sys.argv) != 3 or sys.argv[1] != "show":
+        print("Usage: python3 package_scores.py show <analysis_root>", file=sys.stderr)
+        sys.exit(1)
+    if not os.path.isfile(store_path(sys.argv[2])):
+        print(f"[!] No {DB_NAME} in {sys.argv[2]}", file=sys.stderr)
+        sys.exit(1)
+    store = PackageScores(sys.argv[2])
+    print(f"[+] {len(store.packages())} package(s), {store.count_with_scores()} with scores, "
+          f"{len(store.metrics())} metric(s)")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+paren_index.py
+
+Parenthesis matching for the A1/A3 processors, built once per file.
+
+A1 (exec/eval/new Function) and A3 (base64Encoder) recover each call's
+full text and argument by walking forward from the call's '(' to the ')'
+that closes it. Doing that walk in Python for every hit costs
+O(hits x file size) on large bundles. ParenIndex instead does one
+stack-based pass over the '(' and ')' bytes, the first time it is asked.
+After that, each lookup is a dict access.
+
+Matching is purely by counting raw '(' and ')' bytes (strings, comments
+and regex literals are not special), exactly like the per-hit walk did.
+An unbalanced '(' has no match.
+"""
+import re
+
+_PAREN_RE = re.compile(rb"[()]")
+_OPEN = ord("(")
+
+
+class ParenIndex:
+    def __init__(self, data):
+        # bytes-like buffer (bytes or mmap) of the source file
+        self._data = data
+        self._close: dict[int, int] | None = None
+
+    def _build(self) -> dict[int, int]:
+        data = self._data
+        close: dict[int, int] = {}
+        stack: list[int] = []
+        for m in _PAREN_RE.finditer(data):
+            pos = m.start()
+            if data[pos] == _OPEN:
+                stack.append(pos)
+            elif stack:
+                close[stack.pop()] = pos
+        return close
+
+    def close_of(self, open_idx: int) -> int | None:
+        """Offset of the ')' matching the '(' at open_idx, or None."""
+        if self._close is None:
+            self._close = self._build()
+        return self._close.get(open_idx)
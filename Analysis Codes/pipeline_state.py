@@ -0,0 +1,496 @@
+#!/usr/bin/env python3
+"""
+pipeline_state.py
+Usage:
+    python3 pipeline_state.py show <analysis_root>
+    python3 pipeline_state.py forget <analysis_root> [stage ...]
+
+Fingerprints of the batch pipeline's stages, make-style.
+
+batch_analysis_final.py runs a DAG of stages over a corpus:
+
+    package --extract--> Analysis/<pkg>/ --compile--> Consolidated_Package_Scores.tsv
+      --features--> ml_features.csv --classify--> batch_analysis_result.csv (with preinstall)
+      --explain--> Details/            --contrib--> contributing_features.csv
+
+Each stage output is recorded with a fingerprint of everything it was
+built from: the inputs' content, the code version (hash of the scripts
+involved) and, for the model stages, the model files. A stage whose
+fingerprint is unchanged is skipped. The fingerprints live in
+
+    Analysis/pipeline_state.sqlite
+      stages  (stage, key, fingerprint)   one row per package (extract, compile,
+                                          explain) or per whole-file stage
+      rows    (stage, key, fingerprint, row)
+                                          row-wise stages: the output row each
+                                          input row produced
+      digests (path, stat, digest)        content digests of packages, reused while
+                                          their stat signature is unchanged
+      runs    (run_id, started, finished) extraction runs of the batch
+      journal (run_id, package, state, at, detail)
+                                          append-only package state transitions:
+                                          queued -> running -> done | failed
+
+extract: a package is re-extracted only when its content digest, the
+ruleset version or the output options changed. The fingerprint is
+recorded after the package finished, so an Analysis/<pkg>/ directory
+without a matching fingerprint is outdated (built from other inputs, by
+an older version, or its redo failed or was interrupted). It is redone,
+and stays in place until the new analysis replaces it.
+
+The journal records every package's transitions, each in its own
+transaction; "done" is committed together with the extract fingerprint.
+A run that crashed has no finish time. batch_analysis_final.py --resume
+continues it: the packages it finished are taken as done without
+looking at their content again, everything else is redone.
+
+Row-wise stages (features, classify, contrib) are recomputed per row:
+only the rows whose input row changed are recomputed (by a script on a
+subset file, or in-process by scoring_engine.py), and the output file is
+rebuilt from the stored rows.
+Adding 50 packages to a 10k corpus therefore extracts, compiles and
+classifies 50 packages. A change to a script or a model file changes
+every row fingerprint and the stage runs in full.
+
+The commands above list the recorded fingerprints per stage (and an
+unfinished run, if any), or forget some (or all) stages so the next
+batch rebuilds them.
+"""
+import csv
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+
+STATE_NAME = "pipeline_state.sqlite"
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS stages (
+    stage       TEXT NOT NULL,
+    key         TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    PRIMARY KEY (stage, key)
+);
+CREATE TABLE IF NOT EXISTS rows (
+    stage       TEXT NOT NULL,
+    key         TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    row         TEXT,
+    PRIMARY KEY (stage, key)
+);
+CREATE TABLE IF NOT EXISTS digests (
+    path   TEXT PRIMARY KEY,
+    stat   TEXT NOT NULL,
+    digest TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS runs (
+    run_id   TEXT PRIMARY KEY,
+    started  REAL NOT NULL,
+    finished REAL
+);
+CREATE TABLE IF NOT EXISTS journal (
+    run_id  TEXT NOT NULL,
+    package TEXT NOT NULL,
+    state   TEXT NOT NULL,
+    at      REAL NOT NULL,
+    detail  TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS journal_run ON journal(run_id, package);
+"""
+
+
+def fingerprint(*parts) -> str:
+    """Hash of a sequence of strings (None counts as empty)."""
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(str(part if part is not None else "").encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()[:32]
+
+
+def file_digest(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def code_version(*paths) -> str:
+    """
+    Hash of scripts and model files. A path may be a directory (every
+    file in it counts); a missing path counts by name only.
+    """
+    h = hashlib.sha256()
+    for path in paths:
+        if not os.path.isabs(path):
+            path = os.path.join(_HERE, path)
+        files = [path]
+        if os.path.isdir(path):
+            files = sorted(
+                os.path.join(path, name) for name in os.listdir(path)
+                if os.path.isfile(os.path.join(path, name))
+            )
+        for name in files:
+            h.update(os.path.basename(name).encode("utf-8"))
+            if os.path.isfile(name):
+                h.update(file_digest(name).encode())
+    return h.hexdigest()[:16]
+
+
+def _walk_files(path: str):
+    """(relpath, full path) of every regular file under a package dir, sorted."""
+    found = []
+    for dirpath, dirnames, filenames in os.walk(path):
+        dirnames.sort()
+        for name in filenames:
+            full = os.path.join(dirpath, name)
+            if os.path.isfile(full) and not os.path.islink(full):
+                found.append((os.path.relpath(full, path), full))
+    found.sort()
+    return found
+
+
+class PipelineState:
+    def __init__(self, analysis_root: str):
+        os.makedirs(analysis_root, exist_ok=True)
+        self.path = os.path.join(analysis_root, STATE_NAME)
+        self._db = sqlite3.connect(self.path, timeout=60)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        self._db.commit()
+
+    # --- stage fingerprints ---
+
+    def get(self, stage: str, key: str = ""):
+        row = self._db.execute(
+            "SELECT fingerprint FROM stages WHERE stage = ? AND key = ?", (stage, key)
+        ).fetchone()
+        return row[0] if row else None
+
+    def put(self, stage: str, key: str, fp: str):
+        with self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO stages VALUES (?, ?, ?)", (stage, key, fp)
+            )
+
+    def drop(self, stage: str, key: str = ""):
+        with self._db:
+            self._db.execute("DELETE FROM stages WHERE stage = ? AND key = ?", (stage, key))
+
+    def is_current(self, stage: str, key: str, fp: str) -> bool:
+        return self.get(stage, key) == fp
+
+    def forget(self, stages=()):
+        """Drop the fingerprints of the given stages (all when empty)."""
+        with self._db:
+            if not stages:
+                self._db.execute("DELETE FROM stages")
+                self._db.execute("DELETE FROM rows")
+                return
+            for stage in stages:
+                self._db.execute("DELETE FROM stages WHERE stage = ?", (stage,))
+                self._db.execute("DELETE FROM rows WHERE stage = ?", (stage,))
+
+    def summary(self) -> list[tuple[str, int]]:
+        """(stage, number of recorded keys/rows), ordered by stage."""
+        return list(
+            self._db.execute(
+                "SELECT stage, COUNT(*) FROM "
+                "(SELECT stage FROM stages UNION ALL SELECT stage FROM rows) "
+                "GROUP BY stage ORDER BY stage"
+            )
+        )
+
+    # --- run journal ---
+
+    def start_run(self, run_id: str, packages):
+        """Open (or reopen, when resuming) run_id and queue packages."""
+        now = time.time()
+        with self._db:
+            self._db.execute(
+                "INSERT INTO runs VALUES (?, ?, NULL) "
+                "ON CONFLICT(run_id) DO UPDATE SET finished = NULL",
+                (run_id, now),
+            )
+            self._db.executemany(
+                "INSERT INTO journal VALUES (?, ?, 'queued', ?, '')",
+                [(run_id, name, now) for name in packages],
+            )
+
+    def record(self, run_id: str, package: str, state: str, detail: str = "", fp=None):
+        """
+        Journal one transition. "done" also records the package's extract
+        fingerprint and "failed" drops it, in the same transaction.
+        """
+        with self._db:
+            self._db.execute(
+                "INSERT INTO journal VALUES (?, ?, ?, ?, ?)",
+                (run_id, package, state, time.time(), detail),
+            )
+            if state == "done" and fp is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO stages VALUES ('extract', ?, ?)", (package, fp)
+                )
+            elif state == "failed":
+                self._db.execute(
+                    "DELETE FROM stages WHERE stage = 'extract' AND key = ?", (package,)
+                )
+
+    def finish_run(self, run_id: str):
+        with self._db:
+            self._db.execute(
+                "UPDATE runs SET finished = ? WHERE run_id = ?", (time.time(), run_id)
+            )
+
+    def unfinished_run(self):
+        """The most recent run that never finished (crashed or killed), or None."""
+        row = self._db.execute(
+            "SELECT run_id FROM runs WHERE finished IS NULL ORDER BY started DESC LIMIT 1"
+        ).fetchone()
+        return row[0] if row else None
+
+    def package_states(self, run_id: str) -> dict[str, str]:
+        """package -> its last journaled state in run_id."""
+        return dict(
+            self._db.execute(
+                "SELECT package, state FROM journal WHERE run_id = ? ORDER BY rowid",
+                (run_id,),
+            )
+        )
+
+    # --- package content digests ---
+
+    def package_digest(self, path: str) -> str:
+        """
+        Content digest of a package directory or tarball. The stat
+        signature (paths, sizes, mtimes) is checked first; the content is
+        only hashed again when it changed.
+        """
+        path = os.path.abspath(path)
+        if os.path.isdir(path):
+            files = _walk_files(path)
+            stats = []
+            for rel, full in files:
+                st = os.stat(full)
+                stats.append(f"{rel}:{st.st_size}:{st.st_mtime_ns}")
+            stat_sig = fingerprint(*stats)
+        else:
+            files = None
+            st = os.stat(path)
+            stat_sig = fingerprint(st.st_size, st.st_mtime_ns)
+
+        row = self._db.execute(
+            "SELECT stat, digest FROM digests WHERE path = ?", (path,)
+        ).fetchone()
+        if row and row[0] == stat_sig:
+            return row[1]
+
+        if files is None:
+            digest = file_digest(path)
+        else:
+            digest = fingerprint(*(f"{rel}:{file_digest(full)}" for rel, full in files))
+        with self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO digests VALUES (?, ?, ?)", (path, stat_sig, digest)
+            )
+        return digest
+
+    # --- row-wise stages ---
+
+    def stored_rows(self, stage: str) -> dict:
+        """key -> (fingerprint, row or None) of a row-wise stage."""
+        return {
+            key: (fp, json.loads(row) if row is not None else None)
+            for key, fp, row in self._db.execute(
+                "SELECT key, fingerprint, row FROM rows WHERE stage = ?", (stage,)
+            )
+        }
+
+    def put_rows(self, stage: str, rows: dict, keep=None):
+        """Store key -> (fingerprint, row); with keep, drop keys not in it."""
+        with self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO rows VALUES (?, ?, ?, ?)",
+                [
+                    (stage, key, fp, json.dumps(row) if row is not None else None)
+                    for key, (fp, row) in rows.items()
+                ],
+            )
+            if keep is not None:
+                gone = [
+                    (stage, key)
+                    for (key,) in self._db.execute(
+                        "SELECT key FROM rows WHERE stage = ?", (stage,)
+                    ).fetchall()
+                    if key not in keep
+                ]
+                self._db.executemany("DELETE FROM rows WHERE stage = ? AND key = ?", gone)
+
+    def close(self):
+        self._db.commit()
+        self._db.close()
+
+
+# ---------------------------------------------------------------------------
+# Keyed CSV/TSV tables (one record per line, package name in column 1)
+# ---------------------------------------------------------------------------
+
+def _split(line: str, delimiter: str) -> list[str]:
+    return next(csv.reader([line], delimiter=delimiter))
+
+
+def read_keyed_lines(path: str, delimiter: str = ","):
+    """(header line, [(key, line), ...]) of a table file, lines without newline."""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        lines = f.read().split("\n")
+    if lines and lines[-1] == "":
+        lines.pop()
+    if not lines:
+        return "", []
+    return lines[0], [(_split(line, delimiter)[0], line) for line in lines[1:] if line]
+
+
+def row_fingerprints(path: str, code_fp: str, delimiter: str = ","):
+    """[(key, fingerprint)] per row; the header takes part in every fingerprint."""
+    header, rows = read_keyed_lines(path, delimiter)
+    return [(key, fingerprint(code_fp, header, line)) for key, line in rows]
+
+
+def write_subset(src: str, dst: str, keys, delimiter: str = ","):
+    """Copy the header and the rows of keys (in file order) from src to dst."""
+    keys = set(keys)
+    header, rows = read_keyed_lines(src, delimiter)
+    with open(dst, "w", encoding="utf-8", newline="") as f:
+        f.write(header + "\n")
+        for key, line in rows:
+            if key in keys:
+                f.write(line + "\n")
+
+
+def _read_table(path: str):
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        table = list(csv.reader(f))
+    return (table[0], table[1:]) if table else ([], [])
+
+
+def _write_table(path: str, header, rows):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        w = csv.writer(f, lineterminator="\n")
+        w.writerow(header)
+        w.writerows(rows)
+
+
+def run_row_stage(
+    state: PipelineState,
+    stage: str,
+    inputs,
+    code_fp: str,
+    output_path: str,
+    run,
+    write: bool = False,
+) -> int | None:
+    """
+    Bring the CSV output_path of a row-wise stage up to date.
+
+    inputs   : [(key, row fingerprint)] in input order
+    code_fp  : code/model version; output rows not keyed by an input row
+               (e.g. RISK_BANDS) are stored under it
+    run      : run(keys, out_path) runs the stage's script over the rows
+               of keys (None: the whole input) and writes out_path; it
+               returns False on failure
+    write    : rewrite output_path from the stored rows even when nothing
+               changed (a later stage overwrote it)
+
+    Returns the number of rows recomputed (0 when up to date), or None if
+    the script failed.
+    """
+    stored = state.stored_rows(stage)
+    meta = state.get(stage, "table")
+    meta = json.loads(meta) if meta else None
+    keys = [key for key, _ in inputs]
+    fps = dict(inputs)
+    changed = [key for key, fp in inputs if stored.get(key, (None,))[0] != fp]
+
+    usable = (
+        meta is not None
+        and meta.get("code") == code_fp
+        and all(key in stored for key in keys if key not in changed)
+    )
+    if usable and not changed:
+        if write or not os.path.isfile(output_path):
+            _materialise(output_path, meta, keys, stored)
+        state.put_rows(stage, {}, keep=set(keys))
+        return 0
+
+    full = not usable or len(changed) == len(keys)
+    out_path = output_path if full else output_path + ".partial.csv"
+    if not run(None if full else changed, out_path):
+        return None
+
+    header, rows = _read_table(out_path)
+    if not full and header != meta.get("header"):
+        # The script changed its columns: recompute every row
+        os.remove(out_path)
+        state.forget([stage])
+        return run_row_stage(state, stage, inputs, code_fp, output_path, run, write)
+
+    run_keys = set(keys) if full else set(changed)
+    fresh = {key: (fps[key], None) for key in run_keys}
+    trailer = []
+    for row in rows:
+        key = row[0] if row else ""
+        if key in run_keys:
+            fresh[key] = (fps[key], row)
+        else:
+            trailer.append(row)
+    state.put_rows(stage, fresh, keep=set(keys))
+    meta = {"code": code_fp, "header": header, "trailer": trailer}
+    state.put(stage, "table", json.dumps(meta))
+
+    if not full:
+        os.remove(out_path)
+        _materialise(output_path, meta, keys, state.stored_rows(stage))
+    return len(run_keys)
+
+
+def _materialise(output_path: str, meta: dict, keys, stored: dict):
+    rows = [stored[key][1] for key in keys if key in stored and stored[key][1] is not None]
+    _write_table(output_path, meta["header"], rows + meta["trailer"])
+
+
+def main():
+    if len(sys.argv) < 3 or sys.argv[1] not in ("show", "forget"):
+        print(
+            "Usage: python3 pipeline_state.py show <analysis_root>\n"
+            "       python3 pipeline_state.py forget <analysis_root> [stage ...]",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+
+    analysis_root = sys.argv[2]
+    if not os.path.isfile(os.path.join(analysis_root, STATE_NAME)):
+        print(f"[!] No {STATE_NAME} in {analysis_root}", file=sys.stderr)
+        sys.exit(1)
+    state = PipelineState(analysis_root)
+    if sys.argv[1] == "show":
+        for stage, n in state.summary():
+            print(f"{stage}\t{n}")
+        run_id = state.unfinished_run()
+        if run_id:
+            states = state.package_states(run_id)
+            done = sum(1 for st in states.values() if st == "done")
+            print(f"[!] Run {run_id} did not finish ({done}/{len(states)} packages done)")
+    else:
+        state.forget(sys.argv[3:])
+        print(f"[+] Forgot {', '.join(sys.argv[3:]) or 'all stages'} in {state.path}")
+    state.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,16 @@
 #!/usr/bin/env python3
+import io
 import sys
 import os
 import re
 
+from processor_api import (
+    FeatureResult,
+    ProcessorContext,
+    read_hits_file,
+    write_result,
+)
+
 FEATURE_ID = "A2"
 USAGE = f"Usage: python3 process_{FEATURE_ID}.py <A2_hits_file> <source_js_file> <analysis_root>"
 
@@ -106,130 +114,141 @@ def classify_arg(arg_text: str, fmt_literal: str | None):
             fmt = fm.group(2) if fm else fmt_literal
         return ("VAR", None, fmt)
 
-def main():
-    if len(sys.argv) < 4:
-        print(USAGE, file=sys.stderr)
-        sys.exit(1)
-
-    hits_path = sys.argv[1]
-    source_path = sys.argv[2]
-    analysis_root = sys.argv[3]
-
-    label = get_label(hits_path)
-    counts_out, detail_out = resolve_output_paths(analysis_root, label)
-    data, n = load_source_bytes(source_path)
+def process(hits, source_buffer, ctx: ProcessorContext) -> FeatureResult:
+    """Classify A2 decode sites; see processor_api for the plugin contract."""
+    data = source_buffer
+    n = len(data) if data is not None else 0
+    source_path = ctx.source_path
+    hits_path = ctx.hits_path
+    label = ctx.label
 
     # Collections
     decode_from_str = []  # STRING literal decodes
     decode_from_var = []  # VAR / expression / UNKNOWN decodes
 
-    # Parse hits file
-    with open(hits_path, "r", encoding="utf-8", errors="ignore") as hits:
-        for raw in hits:
-            line = raw.strip()
-            if not line:
-                continue
-            # A2 lines look like:  2:212292:atob(
-            parts = line.split(":", 2)
-            if len(parts) < 3:
-                continue
-            _, off_str, frag = parts
-            try:
-                offset = int(off_str)
-            except ValueError:
+    # Parse hits
+    for raw in hits:
+        line = raw.strip()
+        if not line:
+            continue
+        # A2 lines look like:  2:212292:atob(
+        parts = line.split(":", 2)
+        if len(parts) < 3:
+            continue
+        _, off_str, frag = parts
+        try:
+            offset = int(off_str)
+        except ValueError:
+            continue
+        # Take a local window around the hit to re-parse the call
+        snippet = window(data, n, offset - 80, offset + 220, fallback=frag)
+        matched = False
+        for regex, func_name in DECODE_PATTERNS:
+            m = regex.search(snippet)
+            if not m:
                 continue
-            # Take a local window around the hit to re-parse the call
-            snippet = window(data, n, offset - 80, offset + 220, fallback=frag)
-            matched = False
-            for regex, func_name in DECODE_PATTERNS:
-                m = regex.search(snippet)
-                if not m:
-                    continue
-                matched = True
-                arg_text = m.group(1)
-                fmt_literal = m.group(2) if m.lastindex and m.lastindex >= 2 else None
-                kind, literal, fmt = classify_arg(arg_text, fmt_literal)
-                entry = {
-                    "offset": offset,
-                    "func": func_name,
-                    "kind": kind,           # "STRING" or "VAR"
-                    "arg_text": arg_text.strip(),
-                    "literal": literal,     # only if STRING
-                    "format": fmt,          # may be None
-                    "snippet": snippet,
-                }
-                if kind == "STRING":
-                    decode_from_str.append(entry)
-                else:
-                    decode_from_var.append(entry)
-                break
-            if not matched:
-                # couldn't re-parse; treat as variable decode with context only
-                entry = {
-                    "offset": offset,
-                    "func": "UNKNOWN",
-                    "kind": "UNKNOWN",
-                    "arg_text": "",
-                    "literal": None,
-                    "format": None,
-                    "snippet": snippet,
-                }
+            matched = True
+            arg_text = m.group(1)
+            fmt_literal = m.group(2) if m.lastindex and m.lastindex >= 2 else None
+            kind, literal, fmt = classify_arg(arg_text, fmt_literal)
+            entry = {
+                "offset": offset,
+                "func": func_name,
+                "kind": kind,           # "STRING" or "VAR"
+                "arg_text": arg_text.strip(),
+                "literal": literal,     # only if STRING
+                "format": fmt,          # may be None
+                "snippet": snippet,
+            }
+            if kind == "STRING":
+                decode_from_str.append(entry)
+            else:
                 decode_from_var.append(entry)
+            break
+        if not matched:
+            # couldn't re-parse; treat as variable decode with context only
+            entry = {
+                "offset": offset,
+                "func": "UNKNOWN",
+                "kind": "UNKNOWN",
+                "arg_text": "",
+                "literal": None,
+                "format": None,
+                "snippet": snippet,
+            }
+            decode_from_var.append(entry)
 
     total_sites = len(decode_from_str) + len(decode_from_var)
 
-    # ---------- 1) Score / counts file ----------
-    with open(counts_out, "w", encoding="utf-8") as out:
-        out.write(f"{FEATURE_ID}_total_sites={total_sites}\n")
-        out.write(
-            f"{FEATURE_ID}_decode_string_literal={len(decode_from_str)}\n"
-        )
-        out.write(
-            f"{FEATURE_ID}_decode_variable={len(decode_from_var)}\n"
-        )
+    # ---------- 1) Score / counts ----------
+    scores = {
+        f"{FEATURE_ID}_total_sites": total_sites,
+        f"{FEATURE_ID}_decode_string_literal": len(decode_from_str),
+        f"{FEATURE_ID}_decode_variable": len(decode_from_var),
+    }
 
     # ---------- 2) Summary + details ----------
-    with open(detail_out, "w", encoding="utf-8") as out:
-        out.write("===========================================\n")
-        out.write("   A2 Base64 Decode – Layer 2 Summary\n")
-        out.write("===========================================\n\n")
-        out.write(f"Source hits file : {hits_path}\n")
-        out.write(f"Source code file: {source_path or 'N/A'}\n\n")
-        out.write("[Summary]\n")
-        out.write(f"A2_total_sites={total_sites}\n")
+    if not ctx.details:
+        return FeatureResult(FEATURE_ID, scores)
+
+    out = io.StringIO()
+    out.write("===========================================\n")
+    out.write("   A2 Base64 Decode – Layer 2 Summary\n")
+    out.write("===========================================\n\n")
+    out.write(f"Source hits file : {hits_path}\n")
+    out.write(f"Source code file: {source_path or 'N/A'}\n\n")
+    out.write("[Summary]\n")
+    out.write(f"A2_total_sites={total_sites}\n")
+    out.write(
+        f"A2_decode_string_literal={len(decode_from_str)}\n"
+    )
+    out.write(
+        f"A2_decode_variable={len(decode_from_var)}\n\n"
+    )
+    out.write("[Details]\n")
+    out.write(f"target_label={label}\n")
+    out.write(f"arg1(hits_file)={hits_path}\n")
+    out.write(f"arg2(source_file)={source_path or 'N/A'}\n\n")
+
+    out.write("----- Decode from STRING literals -----\n\n")
+    for e in decode_from_str:
+        out.write(f"offset={e['offset']} func={e['func']}\n")
+        out.write(f'  literal: "{e["literal"]}"\n')
+        out.write(f"  format:  {e['format']}\n")
+        out.write(f"  arg:     {e['arg_text']}\n\n")
+
+    out.write("----- Decode from VAR / expression (for reference) -----\n\n")
+    for e in decode_from_var:
         out.write(
-            f"A2_decode_string_literal={len(decode_from_str)}\n"
+            f"offset={e['offset']} func={e['func']} kind={e['kind']}\n"
         )
-        out.write(
-            f"A2_decode_variable={len(decode_from_var)}\n\n"
-        )
-        out.write("[Details]\n")
-        out.write(f"target_label={label}\n")
-        out.write(f"arg1(hits_file)={hits_path}\n")
-        out.write(f"arg2(source_file)={source_path or 'N/A'}\n\n")
-
-        out.write("----- Decode from STRING literals -----\n\n")
-        for e in decode_from_str:
-            out.write(f"offset={e['offset']} func={e['func']}\n")
-            out.write(f'  literal: "{e["literal"]}"\n')
-            out.write(f"  format:  {e['format']}\n")
-            out.write(f"  arg:     {e['arg_text']}\n\n")
-
-        out.write("----- Decode from VAR / expression (for reference) -----\n\n")
-        for e in decode_from_var:
-            out.write(
-                f"offset={e['offset']} func={e['func']} kind={e['kind']}\n"
-            )
-            out.write(f"  arg: {e['arg_text']}\n")
-            preview = e["snippet"].replace("\n", " ")
-            if len(preview) > 180:
-                preview = preview[:180] + "..."
-            out.write(f"  context: {preview}\n\n")
+        out.write(f"  arg: {e['arg_text']}\n")
+        preview = e["snippet"].replace("\n", " ")
+        if len(preview) > 180:
+            preview = preview[:180] + "..."
+        out.write(f"  context: {preview}\n\n")
+
+    return FeatureResult(FEATURE_ID, scores, out.getvalue())
+
+def main():
+    if len(sys.argv) < 4:
+        print(USAGE, file=sys.stderr)
+        sys.exit(1)
+
+    hits_path = sys.argv[1]
+    source_path = sys.argv[2]
+    analysis_root = sys.argv[3]
+
+    label = get_label(hits_path)
+    counts_out, detail_out = resolve_output_paths(analysis_root, label)
+    data, _ = load_source_bytes(source_path)
+
+    ctx = ProcessorContext(hits_path, source_path, analysis_root, label)
+    result = process(read_hits_file(hits_path), data, ctx)
+    write_result(result, counts_out, detail_out)
 
     print(f"[+] {FEATURE_ID} scores written to {counts_out}")
     print(f"[+] {FEATURE_ID} summary written to {detail_out}")
 
 if __name__ == "__main__":
     main()
-
-
@@ -1,9 +1,18 @@
 #!/usr/bin/env python3
+import io
 import sys
 import os
 import re
 from collections import defaultdict
 
+from processor_api import (
+    FeatureResult,
+    ProcessorContext,
+    paren_index,
+    read_hits_file,
+    write_result,
+)
+
 FEATURE_ID = "A3"
 USAGE = f"Usage: python3 process_{FEATURE_ID}.py <A3_hits_file> <source_js_file> <analysis_root>"
 
@@ -65,20 +74,16 @@ def slice_chars(data: bytes | None, n: int, start: int, end: int) -> str:
     return data[start:end].decode("utf-8", errors="replace")
 
 
-def main():
-    if len(sys.argv) < 4:
-        print(USAGE, file=sys.stderr)
-        sys.exit(1)
-
-    hits_path = sys.argv[1]
-    source_path = sys.argv[2]
-    analysis_root = sys.argv[3]
-
-    label = get_label(hits_path)
-    counts_out, detail_out = resolve_output_paths(analysis_root, label)
-
-    # Load source (segmented file, typically)
-    data, n = load_source_bytes(source_path)
+def process(hits, source_buffer, ctx: ProcessorContext) -> FeatureResult:
+    """Classify A3 encode sites; see processor_api for the plugin contract."""
+    # Source (segmented file, typically)
+    data = source_buffer
+    n = len(data) if data is not None else 0
+    parens = paren_index(ctx, data) if data is not None else None
+    source_path = ctx.source_path
+    hits_path = ctx.hits_path
+    label = ctx.label
+    details = ctx.details
 
     # ----------------------------------------------------------------
     # Step 1+2: Build structured entries from hits
@@ -87,112 +92,101 @@ def main():
     # ----------------------------------------------------------------
     entries = []  # each entry: {offset, kind, text}
 
-    with open(hits_path, "r", encoding="utf-8", errors="ignore") as hits:
-        for line in hits:
-            line = line.strip()
-            if not line:
-                continue
-            # Lines look like: LINE:OFFSET:FRAGMENT
-            parts = line.split(":", 2)
-            if len(parts) < 3:
+    for line in hits:
+        line = line.strip()
+        if not line:
+            continue
+        # Lines look like: LINE:OFFSET:FRAGMENT
+        parts = line.split(":", 2)
+        if len(parts) < 3:
+            continue
+        _, off_str, frag = parts
+        try:
+            offset = int(off_str)
+        except ValueError:
+            continue
+
+        frag = frag.strip()
+
+        # CASE 1: base64Encoder(...) – try to reconstruct full call
+        if "base64Encoder" in frag and data is not None:
+            name_bytes = b"base64Encoder"
+            # Try to find function name near the offset
+            call_start = data.find(name_bytes, max(0, offset - 200))
+            if call_start == -1:
+                # fallback: just show some context
+                ctx = slice_chars(data, n, offset - 80, offset + 80)
+                text = f"offset={offset} kind=base64Encoder context={ctx}"
+                entries.append(
+                    {
+                        "offset": offset,
+                        "kind": "base64Encoder",
+                        "text": text,
+                    }
+                )
                 continue
-            _, off_str, frag = parts
-            try:
-                offset = int(off_str)
-            except ValueError:
+
+            open_paren = data.find(b"(", call_start + len(name_bytes))
+            if open_paren == -1:
+                ctx = slice_chars(data, n, call_start, call_start + 160)
+                text = f"offset={offset} kind=base64Encoder context={ctx}"
+                entries.append(
+                    {
+                        "offset": offset,
+                        "kind": "base64Encoder",
+                        "text": text,
+                    }
+                )
                 continue
 
-            frag = frag.strip()
-
-            # CASE 1: base64Encoder(...) – try to reconstruct full call
-            if "base64Encoder" in frag and data is not None:
-                name_bytes = b"base64Encoder"
-                # Try to find function name near the offset
-                call_start = data.find(name_bytes, max(0, offset - 200))
-                if call_start == -1:
-                    # fallback: just show some context
-                    ctx = slice_chars(data, n, offset - 80, offset + 80)
-                    text = f"offset={offset} kind=base64Encoder context={ctx}"
-                    entries.append(
-                        {
-                            "offset": offset,
-                            "kind": "base64Encoder",
-                            "text": text,
-                        }
-                    )
-                    continue
-
-                open_paren = data.find(b"(", call_start + len(name_bytes))
-                if open_paren == -1:
-                    ctx = slice_chars(data, n, call_start, call_start + 160)
-                    text = f"offset={offset} kind=base64Encoder context={ctx}"
-                    entries.append(
-                        {
-                            "offset": offset,
-                            "kind": "base64Encoder",
-                            "text": text,
-                        }
-                    )
-                    continue
-
-                # Match parentheses to find the end of the call
-                depth = 0
-                end_paren = None
-                for i in range(open_paren, n):
-                    b = data[i]
-                    if b == ord("("):
-                        depth += 1
-                    elif b == ord(")"):
-                        depth -= 1
-                        if depth == 0:
-                            end_paren = i
-                            break
-
-                if end_paren is None:
-                    ctx = slice_chars(data, n, call_start, call_start + 200)
-                    text = f"offset={offset} kind=base64Encoder context={ctx}"
-                    entries.append(
-                        {
-                            "offset": offset,
-                            "kind": "base64Encoder",
-                            "text": text,
-                        }
-                    )
-                else:
-                    arg = slice_chars(data, n, open_paren + 1, end_paren).strip()
-                    snippet = slice_chars(data, n, call_start, end_paren + 1)
-                    text = (
-                        f"offset={offset} kind=base64Encoder\n"
-                        f"  call: {snippet}\n"
-                        f"  arg:  {arg}\n"
-                    )
-                    entries.append(
-                        {
-                            "offset": offset,
-                            "kind": "base64Encoder",
-                            "text": text,
-                        }
-                    )
-
-            # CASE 2: something.toString("base64") or fallback when no source
+            # Match parentheses to find the end of the call
+            end_paren = parens.close_of(open_paren)
+
+            if end_paren is None:
+                ctx = slice_chars(data, n, call_start, call_start + 200)
+                text = f"offset={offset} kind=base64Encoder context={ctx}"
+                entries.append(
+                    {
+                        "offset": offset,
+                        "kind": "base64Encoder",
+                        "text": text,
+                    }
+                )
             else:
-                if data is not None:
-                    ctx = slice_chars(data, n, offset - 120, offset + 80)
-                else:
-                    # No source: at least preserve the fragment as context
-                    ctx = frag
+                arg = slice_chars(data, n, open_paren + 1, end_paren).strip()
+                snippet = slice_chars(data, n, call_start, end_paren + 1)
                 text = (
-                    f"offset={offset} kind=toString_base64\n"
-                    f"  context: {ctx}\n"
+                    f"offset={offset} kind=base64Encoder\n"
+                    f"  call: {snippet}\n"
+                    f"  arg:  {arg}\n"
                 )
                 entries.append(
                     {
                         "offset": offset,
-                        "kind": "toString_base64",
+                        "kind": "base64Encoder",
                         "text": text,
                     }
                 )
 
+        # CASE 2: something.toString("base64") or fallback when no source
+        else:
+            if data is not None:
+                ctx = slice_chars(data, n, offset - 120, offset + 80)
+            else:
+                # No source: at least preserve the fragment as context
+                ctx = frag
+            text = (
+                f"offset={offset} kind=toString_base64\n"
+                f"  context: {ctx}\n"
+            )
+            entries.append(
+                {
+                    "offset": offset,
+                    "kind": "toString_base64",
+                    "text": text,
+                }
+            )
+
     # ----------------------------------------------------------------
     # Step 3: Classify each entry
     #   SECRETS / CONFIG_OR_URL / LOG_OR_MESSAGE / OTHER
@@ -255,54 +249,74 @@ def main():
     total = len(entries)
 
     # ----------------------------------------------------------------
-    # 1) Score / counts file
+    # 1) Score / counts
     # ----------------------------------------------------------------
-    with open(counts_out, "w", encoding="utf-8") as out:
-        out.write(f"{FEATURE_ID}_total_sites={total}\n")
-        out.write(f"{FEATURE_ID}_SECRETS={len(buckets['SECRETS'])}\n")
-        out.write(
-            f"{FEATURE_ID}_CONFIG_OR_URL={len(buckets['CONFIG_OR_URL'])}\n"
-        )
-        out.write(
-            f"{FEATURE_ID}_LOG_OR_MESSAGE={len(buckets['LOG_OR_MESSAGE'])}\n"
-        )
-        out.write(f"{FEATURE_ID}_OTHER={len(buckets['OTHER'])}\n")
+    scores = {
+        f"{FEATURE_ID}_total_sites": total,
+        f"{FEATURE_ID}_SECRETS": len(buckets["SECRETS"]),
+        f"{FEATURE_ID}_CONFIG_OR_URL": len(buckets["CONFIG_OR_URL"]),
+        f"{FEATURE_ID}_LOG_OR_MESSAGE": len(buckets["LOG_OR_MESSAGE"]),
+        f"{FEATURE_ID}_OTHER": len(buckets["OTHER"]),
+    }
 
     # ----------------------------------------------------------------
     # 2) Summary + detailed suspicious entries
     # ----------------------------------------------------------------
-    with open(detail_out, "w", encoding="utf-8") as out:
-        out.write("===========================================\n")
-        out.write("   A3 base64 Encoding – Summary\n")
-        out.write("===========================================\n\n")
-        out.write(f"Source hits file={hits_path}\n")
-        out.write(f"Source code file={source_path or 'N/A'}\n\n")
-
-        out.write("[Summary]\n")
-        out.write(f"A3_total_sites={total}\n")
-        out.write(f"A3_SECRETS={len(buckets['SECRETS'])}\n")
-        out.write(
-            f"A3_CONFIG_OR_URL={len(buckets['CONFIG_OR_URL'])}\n"
-        )
-        out.write(
-            f"A3_LOG_OR_MESSAGE={len(buckets['LOG_OR_MESSAGE'])}\n"
-        )
-        out.write(f"A3_OTHER={len(buckets['OTHER'])}\n\n")
-
-        out.write("[Details]\n")
-        out.write(f"target_label={label}\n")
-        out.write(f"arg1(hits_file)={hits_path}\n")
-        out.write(f"arg2(source_file)={source_path or 'N/A'}\n\n")
-
-        # dump suspicious ones with some detail
-        for cat in ["SECRETS", "CONFIG_OR_URL"]:
-            out.write(f"===== {cat} (count={len(buckets[cat])}) =====\n\n")
-            for e in buckets[cat]:
-                out.write(
-                    f"offset={e.get('offset')} kind={e.get('kind')} "
-                    f"category={e['category']}\n"
-                )
-                out.write(e.get("text", "") + "\n\n")
+    if not details:
+        return FeatureResult(FEATURE_ID, scores)
+
+    out = io.StringIO()
+    out.write("===========================================\n")
+    out.write("   A3 base64 Encoding – Summary\n")
+    out.write("===========================================\n\n")
+    out.write(f"Source hits file={hits_path}\n")
+    out.write(f"Source code file={source_path or 'N/A'}\n\n")
+
+    out.write("[Summary]\n")
+    out.write(f"A3_total_sites={total}\n")
+    out.write(f"A3_SECRETS={len(buckets['SECRETS'])}\n")
+    out.write(
+        f"A3_CONFIG_OR_URL={len(buckets['CONFIG_OR_URL'])}\n"
+    )
+    out.write(
+        f"A3_LOG_OR_MESSAGE={len(buckets['LOG_OR_MESSAGE'])}\n"
+    )
+    out.write(f"A3_OTHER={len(buckets['OTHER'])}\n\n")
+
+    out.write("[Details]\n")
+    out.write(f"target_label={label}\n")
+    out.write(f"arg1(hits_file)={hits_path}\n")
+    out.write(f"arg2(source_file)={source_path or 'N/A'}\n\n")
+
+    # dump suspicious ones with some detail
+    for cat in ["SECRETS", "CONFIG_OR_URL"]:
+        out.write(f"===== {cat} (count={len(buckets[cat])}) =====\n\n")
+        for e in buckets[cat]:
+            out.write(
+                f"offset={e.get('offset')} kind={e.get('kind')} "
+                f"category={e['category']}\n"
+            )
+            out.write(e.get("text", "") + "\n\n")
+
+    return FeatureResult(FEATURE_ID, scores, out.getvalue())
+
+
+def main():
+    if len(sys.argv) < 4:
+        print(USAGE, file=sys.stderr)
+        sys.exit(1)
+
+    hits_path = sys.argv[1]
+    source_path = sys.argv[2]
+    analysis_root = sys.argv[3]
+
+    label = get_label(hits_path)
+    counts_out, detail_out = resolve_output_paths(analysis_root, label)
+    data, _ = load_source_bytes(source_path)
+
+    ctx = ProcessorContext(hits_path, source_path, analysis_root, label)
+    result = process(read_hits_file(hits_path), data, ctx)
+    write_result(result, counts_out, detail_out)
 
     print(f"[+] {FEATURE_ID} scores written to {counts_out}")
     print(f"[+] {FEATURE_ID} summary written to {detail_out}")
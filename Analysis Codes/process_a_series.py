@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+process_a_series.py
+Usage:
+    python3 process_a_series.py <source_js_file> <analysis_root> <A1_hits> <A2_hits> <A3_hits>
+
+Context extraction for A1 (exec/eval), A2 (base64 decode) and A3 (base64
+encode) as a single stage. All three look at the source around their hits:
+call text, arguments and context windows. They used to do that as three
+separate processors, each reading the source file again.
+
+process_all() takes the source buffer once (bytes, or the extractor's
+mmap). It builds one ParenIndex for it and resolves the A1, A2 and A3
+hits against that buffer, returning the three FeatureResults together.
+extract_features.py calls it in-process. The command-line entry point
+reads the source file once and writes the three Scores/Details files,
+exactly as running process_a1/a2/a3.py one after another would.
+"""
+import sys
+from dataclasses import replace
+
+import process_a1
+import process_a2
+import process_a3
+from paren_index import ParenIndex
+from processor_api import FeatureResult, ProcessorContext, read_hits_file, write_result
+
+A_SERIES = {
+    "A1": process_a1,
+    "A2": process_a2,
+    "A3": process_a3,
+}
+USAGE = (
+    "Usage: python3 process_a_series.py <source_js_file> <analysis_root> "
+    "<A1_hits> <A2_hits> <A3_hits>"
+)
+
+
+def process_all(
+    hits_by_feature: dict[str, list[str]],
+    source_buffer,
+    contexts: dict[str, ProcessorContext],
+) -> dict[str, FeatureResult]:
+    """
+    Run the A-series processors given in hits_by_feature over one shared
+    source buffer. Returns feature -> FeatureResult; a processor that fails
+    is reported and left out.
+    """
+    parens = ParenIndex(source_buffer) if source_buffer is not None else None
+    results: dict[str, FeatureResult] = {}
+    for feat, hits in hits_by_feature.items():
+        ctx = replace(contexts[feat], parens=parens)
+        try:
+            results[feat] = A_SERIES[feat].process(hits, source_buffer, ctx)
+        except Exception as e:
+            print(f"[!] {feat} processor failed on {ctx.hits_path}: {e}", file=sys.stderr)
+    return results
+
+
+def main():
+    if len(sys.argv) < 6:
+        print(USAGE, file=sys.stderr)
+        sys.exit(1)
+
+    source_path = sys.argv[1]
+    analysis_root = sys.argv[2]
+    hits_paths = dict(zip(A_SERIES, sys.argv[3:6]))
+
+    with open(source_path, "rb") as f:
+        data = f.read()
+
+    hits_by_feature = {}
+    contexts = {}
+    outputs = {}
+    for feat, hits_path in hits_paths.items():
+        module = A_SERIES[feat]
+        label = module.get_label(hits_path)
+        outputs[feat] = module.resolve_output_paths(analysis_root, label)
+        hits_by_feature[feat] = read_hits_file(hits_path)
+        contexts[feat] = ProcessorContext(hits_path, source_path, analysis_root, label)
+
+    for feat, result in process_all(hits_by_feature, data, contexts).items():
+        counts_out, detail_out = outputs[feat]
+        write_result(result, counts_out, detail_out)
+        print(f"[+] {feat} scores written to {counts_out}")
+        print(f"[+] {feat} summary written to {detail_out}")
+
+
+if __name__ == "__main__":
+    main()
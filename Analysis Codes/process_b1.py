@@ -1,9 +1,17 @@
 #!/usr/bin/env python3
+import io
 import re
 import sys
 import os
 from collections import defaultdict
 
+from processor_api import (
+    FeatureResult,
+    ProcessorContext,
+    read_hits_file,
+    write_result,
+)
+
 FEATURE_ID = "B1"
 USAGE = f"Usage: python3 process_{FEATURE_ID}.py <B1_hits_file> <analysis_root>"
 
@@ -69,37 +77,30 @@ def resolve_output_paths(analysis_root: str, label: str):
     return counts_out, detail_out
 
 
-def main():
-    if len(sys.argv) < 3:
-        print(USAGE, file=sys.stderr)
-        sys.exit(1)
-
-    hits_path = sys.argv[1]
-    analysis_root = sys.argv[2]
-
-    label = get_label(hits_path)
-    counts_out, detail_out = resolve_output_paths(analysis_root, label)
+def process(hits, source_buffer, ctx: ProcessorContext) -> FeatureResult:
+    """Group B1 secret references by provider; see processor_api."""
+    hits_path = ctx.hits_path
+    label = ctx.label
 
     # Collect secrets
     secret_hits = []
     provider_map = defaultdict(set)
 
-    with open(hits_path, "r", encoding="utf-8", errors="ignore") as f:
-        for raw in f:
-            line = raw.strip()
-            if not line:
-                continue
-            parts = line.split(":", 2)
-            if len(parts) < 3:
-                continue
-            _, _, text = parts
-            m = re.search(r"process\.env\.([A-Za-z0-9_]+)", text)
-            if not m:
-                continue
-            varname = m.group(1)
-            secret_hits.append(varname)
-            provider = classify_provider(varname)
-            provider_map[provider].add(varname)
+    for raw in hits:
+        line = raw.strip()
+        if not line:
+            continue
+        parts = line.split(":", 2)
+        if len(parts) < 3:
+            continue
+        _, _, text = parts
+        m = re.search(r"process\.env\.([A-Za-z0-9_]+)", text)
+        if not m:
+            continue
+        varname = m.group(1)
+        secret_hits.append(varname)
+        provider = classify_provider(varname)
+        provider_map[provider].add(varname)
 
     unique_secrets = sorted(set(secret_hits))
     n_refs = len(secret_hits)
@@ -109,62 +110,84 @@ def main():
     all_providers = list(PROVIDER_RULES.keys()) + [DEFAULT_PROVIDER]
 
     # -------- scores / machine-readable ----------
-    with open(counts_out, "w", encoding="utf-8") as out:
-        out.write(f"{FEATURE_ID}_total_refs={n_refs}\n")
-        out.write(f"{FEATURE_ID}_total_secrets={n_secrets}\n")
-        out.write(f"{FEATURE_ID}_total_providers={n_providers}\n")
-        for p in all_providers:
-            out.write(f"{FEATURE_ID}_{p}={len(provider_map.get(p, set()))}\n")
+    scores = {
+        f"{FEATURE_ID}_total_refs": n_refs,
+        f"{FEATURE_ID}_total_secrets": n_secrets,
+        f"{FEATURE_ID}_total_providers": n_providers,
+    }
+    for p in all_providers:
+        scores[f"{FEATURE_ID}_{p}"] = len(provider_map.get(p, set()))
 
     # -------- human-readable detail ----------
-    with open(detail_out, "w", encoding="utf-8") as out:
-        out.write("===========================================\n")
-        out.write("   B1 Static Credential Feature Summary\n")
-        out.write("===========================================\n\n")
-        out.write(f"Source_hits_file={hits_path}\n")
-        out.write("Source_code_file=N/A\n\n")
-
-        out.write("[Summary]\n")
-        out.write(f"B1_total_refs={n_refs}\n")
-        out.write(f"B1_total_secrets={n_secrets}\n")
-        out.write(f"B1_total_providers={n_providers}\n")
+    if not ctx.details:
+        return FeatureResult(FEATURE_ID, scores)
+
+    out = io.StringIO()
+    out.write("===========================================\n")
+    out.write("   B1 Static Credential Feature Summary\n")
+    out.write("===========================================\n\n")
+    out.write(f"Source_hits_file={hits_path}\n")
+    out.write("Source_code_file=N/A\n\n")
+
+    out.write("[Summary]\n")
+    out.write(f"B1_total_refs={n_refs}\n")
+    out.write(f"B1_total_secrets={n_secrets}\n")
+    out.write(f"B1_total_providers={n_providers}\n")
+    for p in all_providers:
+        out.write(f"B1_{p}={len(provider_map.get(p, set()))}\n")
+    out.write("\n")
+
+    out.write("[Details]\n")
+    out.write(f"target_label={label}\n")
+    out.write(f"arg1(hits_file)={hits_path}\n")
+    out.write("arg2(source_file)=N/A\n\n")
+
+    out.write("Providers Found:\n")
+    if n_providers == 0:
+        out.write("  (none)\n\n")
+    else:
         for p in all_providers:
-            out.write(f"B1_{p}={len(provider_map.get(p, set()))}\n")
+            s = sorted(provider_map.get(p, set()))
+            if s:
+                out.write(f"  - {p} ({len(s)})\n")
         out.write("\n")
 
-        out.write("[Details]\n")
-        out.write(f"target_label={label}\n")
-        out.write(f"arg1(hits_file)={hits_path}\n")
-        out.write("arg2(source_file)=N/A\n\n")
-
-        out.write("Providers Found:\n")
-        if n_providers == 0:
-            out.write("  (none)\n\n")
-        else:
-            for p in all_providers:
-                s = sorted(provider_map.get(p, set()))
-                if s:
-                    out.write(f"  - {p} ({len(s)})\n")
-            out.write("\n")
-
-        out.write("Secrets by Provider:\n")
-        if n_providers == 0:
-            out.write("  (none)\n")
-        else:
-            for p in all_providers:
-                s = sorted(provider_map.get(p, set()))
-                if not s:
-                    continue
-                out.write(f"\n[{p}] ({len(s)})\n")
-                for v in s:
-                    out.write(f"  • {v}\n")
-
-        out.write("\nRaw_hits_in_order:\n")
-        if not secret_hits:
-            out.write("  (none)\n")
-        else:
-            for s in secret_hits:
-                out.write(f"  - {s}\n")
+    out.write("Secrets by Provider:\n")
+    if n_providers == 0:
+        out.write("  (none)\n")
+    else:
+        for p in all_providers:
+            s = sorted(provider_map.get(p, set()))
+            if not s:
+                continue
+            out.write(f"\n[{p}] ({len(s)})\n")
+            for v in s:
+                out.write(f"  • {v}\n")
+
+    out.write("\nRaw_hits_in_order:\n")
+    if not secret_hits:
+        out.write("  (none)\n")
+    else:
+        for s in secret_hits:
+            out.write(f"  - {s}\n")
+
+    return FeatureResult(FEATURE_ID, scores, out.getvalue())
+
+
+def main():
+    if len(sys.argv) < 3:
+        print(USAGE, file=sys.stderr)
+        sys.exit(1)
+
+    hits_path = sys.argv[1]
+    analysis_root = sys.argv[2]
+
+    label = get_label(hits_path)
+    counts_out, detail_out = resolve_output_paths(analysis_root, label)
+
+    ctx = ProcessorContext(hits_path, None, analysis_root, label)
+    result = process(read_hits_file(hits_path), None, ctx)
+    write_result(result, counts_out, detail_out)
 
     print(f"[+] {FEATURE_ID} scores → {counts_out}")
     print(f"[+] {FEATURE_ID} details → {detail_out}")
@@ -1,9 +1,17 @@
 #!/usr/bin/env python3
+import io
 import re
 import sys
 import os
 from collections import defaultdict
 
+from processor_api import (
+    FeatureResult,
+    ProcessorContext,
+    read_hits_file,
+    write_result,
+)
+
 FEATURE_ID = "B2"
 USAGE = f"Usage: python3 process_{FEATURE_ID}.py <B2_hits_file> <analysis_root>"
 
@@ -92,40 +100,33 @@ def resolve_output_paths(analysis_root: str, label: str):
     return counts_out, detail_out
 
 
-def main():
-    if len(sys.argv) < 3:
-        print(USAGE, file=sys.stderr)
-        sys.exit(1)
-
-    hits_path = sys.argv[1]
-    analysis_root = sys.argv[2]
-
-    label = get_label(hits_path)
-    counts_out, detail_out = resolve_output_paths(analysis_root, label)
+def process(hits, source_buffer, ctx: ProcessorContext) -> FeatureResult:
+    """Classify B2 token-flow hits; see processor_api for the plugin contract."""
+    hits_path = ctx.hits_path
+    label = ctx.label
 
     # ---------- Parse B2 hits ----------
     events = []  # each: {line_no, provider, flow_type, raw}
     provider_buckets = defaultdict(list)
     flow_buckets = defaultdict(list)
 
-    with open(hits_path, "r", encoding="utf-8", errors="replace") as f:
-        for idx, line in enumerate(f, start=1):
-            raw = line.rstrip("\n")
-            if not raw.strip():
-                continue
+    for idx, line in enumerate(hits, start=1):
+        raw = line.rstrip("\n")
+        if not raw.strip():
+            continue
 
-            provider = classify_provider(raw)
-            flow_type = classify_flow_type(raw)
+        provider = classify_provider(raw)
+        flow_type = classify_flow_type(raw)
 
-            event = {
-                "line_no": idx,
-                "provider": provider,
-                "flow_type": flow_type,
-                "raw": raw,
-            }
-            events.append(event)
-            provider_buckets[provider].append(event)
-            flow_buckets[flow_type].append(event)
+        event = {
+            "line_no": idx,
+            "provider": provider,
+            "flow_type": flow_type,
+            "raw": raw,
+        }
+        events.append(event)
+        provider_buckets[provider].append(event)
+        flow_buckets[flow_type].append(event)
 
     total_events = len(events)
     # Only count providers that actually have at least one event
@@ -135,61 +136,81 @@ def main():
     all_providers = list(PROVIDER_RULES.keys()) + [DEFAULT_PROVIDER]
     all_flow_types = ["VALIDATE", "EXCHANGE", "PUBLISH", "OTHER"]
 
-    # ---------- 1) Counts file (machine-readable) ----------
-    with open(counts_out, "w", encoding="utf-8") as out:
-        out.write(f"{FEATURE_ID}_total_events={total_events}\n")
-        out.write(f"{FEATURE_ID}_total_providers={n_providers}\n")
-        # per provider
-        for p in all_providers:
-            count_p = len(provider_buckets.get(p, []))
-            out.write(f"{FEATURE_ID}_{p}={count_p}\n")
-        # per flow type
-        for ft in all_flow_types:
-            count_ft = len(flow_buckets.get(ft, []))
-            out.write(f"{FEATURE_ID}_{ft}={count_ft}\n")
+    # ---------- 1) Counts (machine-readable) ----------
+    scores = {
+        f"{FEATURE_ID}_total_events": total_events,
+        f"{FEATURE_ID}_total_providers": n_providers,
+    }
+    # per provider
+    for p in all_providers:
+        scores[f"{FEATURE_ID}_{p}"] = len(provider_buckets.get(p, []))
+    # per flow type
+    for ft in all_flow_types:
+        scores[f"{FEATURE_ID}_{ft}"] = len(flow_buckets.get(ft, []))
 
     # ---------- 2) Summary + details (human-readable) ----------
-    with open(detail_out, "w", encoding="utf-8") as out:
-        out.write("===========================================\n")
-        out.write("   B2 Token Flows / Validation – Layer 2\n")
-        out.write("===========================================\n\n")
-        out.write(f"Source hits file={hits_path}\n")
-        out.write("Source code file=N/A\n\n")
-
-        out.write("[Summary]\n")
-        out.write(f"B2_total_events={total_events}\n")
-        out.write(f"B2_total_providers={n_providers}\n")
+    if not ctx.details:
+        return FeatureResult(FEATURE_ID, scores)
+
+    out = io.StringIO()
+    out.write("===========================================\n")
+    out.write("   B2 Token Flows / Validation – Layer 2\n")
+    out.write("===========================================\n\n")
+    out.write(f"Source hits file={hits_path}\n")
+    out.write("Source code file=N/A\n\n")
+
+    out.write("[Summary]\n")
+    out.write(f"B2_total_events={total_events}\n")
+    out.write(f"B2_total_providers={n_providers}\n")
+    for p in all_providers:
+        out.write(f"B2_{p}={len(provider_buckets.get(p, []))}\n")
+    for ft in all_flow_types:
+        out.write(f"B2_{ft}={len(flow_buckets.get(ft, []))}\n")
+    out.write("\n")
+
+    out.write("[Details]\n")
+    out.write(f"target_label={label}\n")
+    out.write(f"arg1(hits_file)={hits_path}\n")
+    out.write("arg2(source_file)=N/A\n\n")
+
+    out.write("Providers detected:\n")
+    if n_providers == 0:
+        out.write("  (none)\n\n")
+    else:
         for p in all_providers:
-            out.write(f"B2_{p}={len(provider_buckets.get(p, []))}\n")
-        for ft in all_flow_types:
-            out.write(f"B2_{ft}={len(flow_buckets.get(ft, []))}\n")
+            evs = provider_buckets.get(p, [])
+            if not evs:
+                continue
+            out.write(f"  - {p} (events={len(evs)})\n")
         out.write("\n")
 
-        out.write("[Details]\n")
-        out.write(f"target_label={label}\n")
-        out.write(f"arg1(hits_file)={hits_path}\n")
-        out.write("arg2(source_file)=N/A\n\n")
-
-        out.write("Providers detected:\n")
-        if n_providers == 0:
-            out.write("  (none)\n\n")
-        else:
-            for p in all_providers:
-                evs = provider_buckets.get(p, [])
-                if not evs:
-                    continue
-                out.write(f"  - {p} (events={len(evs)})\n")
-            out.write("\n")
-
-        # Detailed listing per provider
-        for p in all_providers:
-            ev_list = provider_buckets.get(p, [])
-            if not ev_list:
-                continue
-            out.write(f"===== Provider: {p} (events={len(ev_list)}) =====\n\n")
-            for e in ev_list:
-                out.write(f"[line {e['line_no']}] type={e['flow_type']}\n")
-                out.write(f"  {e['raw']}\n\n")
+    # Detailed listing per provider
+    for p in all_providers:
+        ev_list = provider_buckets.get(p, [])
+        if not ev_list:
+            continue
+        out.write(f"===== Provider: {p} (events={len(ev_list)}) =====\n\n")
+        for e in ev_list:
+            out.write(f"[line {e['line_no']}] type={e['flow_type']}\n")
+            out.write(f"  {e['raw']}\n\n")
+
+    return FeatureResult(FEATURE_ID, scores, out.getvalue())
+
+
+def main():
+    if len(sys.argv) < 3:
+        print(USAGE, file=sys.stderr)
+        sys.exit(1)
+
+    hits_path = sys.argv[1]
+    analysis_root = sys.argv[2]
+
+    label = get_label(hits_path)
+    counts_out, detail_out = resolve_output_paths(analysis_root, label)
+
+    ctx = ProcessorContext(hits_path, None, analysis_root, label)
+    result = process(read_hits_file(hits_path, errors="replace"), None, ctx)
+    write_result(result, counts_out, detail_out)
 
     print(f"[+] {FEATURE_ID} counts written to {counts_out}")
     print(f"[+] {FEATURE_ID} summary written to {detail_out}")
@@ -12,77 +12,55 @@ Writes:
     - C1_detail_<label>  (classified summary with per-host details and aggregate stats)
 """
 
+import io
 import sys
 import re
 import os
 import ipaddress
-import socket
 from urllib.parse import urlparse
 from collections import defaultdict, OrderedDict
 
+from processor_api import (
+    FeatureResult,
+    ProcessorContext,
+    read_hits_file,
+    write_result,
+)
+from domain_rules import host_classifier
+from rdns_cache import ReverseDNS
+
 FEATURE_ID = "C1"
 
 # ---------------- URL extraction ----------------
 URL_RE = re.compile(r"(https?://\S+)", re.IGNORECASE)
 
 # ---------------- rDNS cache ----------------
-_rdns_cache = {}
+# In-process only until configure_rdns() sets up the shared cache (rdns_cache.py)
+_rdns = ReverseDNS()
+
+
+def configure_rdns(cache_dir: str | None = None, offline: bool = False):
+    """Use the on-disk rDNS cache in cache_dir; offline never resolves live."""
+    global _rdns
+    if (_rdns.cache_dir, _rdns.offline) == (cache_dir, offline):
+        return
+    _rdns.close()
+    _rdns = ReverseDNS(cache_dir, offline)
 
 
 def reverse_dns(ip_str: str):
     """Return reverse DNS hostname or None (cached)."""
-    if ip_str in _rdns_cache:
-        return _rdns_cache[ip_str]
-    try:
-        name = socket.gethostbyaddr(ip_str)[0].rstrip(".").lower()
-    except Exception:
-        name = None
-    _rdns_cache[ip_str] = name
-    return name
+    return _rdns.lookup(ip_str)
 
 
 # ---------------- Domain classifier ----------------
+# Rules live in domain_rules.json (see domain_rules.py)
+DOMAIN_CLASSES = host_classifier("C1_domain_classes", default="GENERIC_DOMAIN")
+API_CLASSES = host_classifier("C1_api_classes")
+
+
 def classify_domain(name: str) -> str:
-    host = name.lower().rstrip(".")
-
-    # Dev / source control
-    if any(host.endswith(d) for d in (
-        "github.com", "githubusercontent.com",
-        "gitlab.com", "bitbucket.org",
-    )):
-        return "DEV_HOST"
-
-    # Package registries
-    if any(host.endswith(d) for d in (
-        "npmjs.com", "npmjs.org", "yarnpkg.com",
-    )):
-        return "PACKAGE_INFRA"
-
-    # Cloud / infra
-    if any(host.endswith(d) for d in (
-        "amazonaws.com", "cloudfront.net",
-        "googleapis.com", "gstatic.com", "google.com",
-        "azure.com", "microsoft.com",
-    )):
-        return "CLOUD_PROVIDER"
-
-    # Sinks / paste / canary
-    if any(host.endswith(d) for d in (
-        "webhook.site",
-        "requestcatcher.com",
-        "requestbin.net",
-        "canarytokens.org",
-        "pastebin.com",
-        "paste.ee",
-        "hastebin.com",
-    )):
-        return "SINK_SERVICE"
-
-    # Local
-    if host in ("localhost", "127.0.0.1", "::1"):
-        return "LOCALHOST"
-
-    return "GENERIC_DOMAIN"
+    return DOMAIN_CLASSES.classify(name.lower().rstrip("."))
 
 
 # ---------------- Host classifier (IP + rDNS) ----------------
@@ -170,43 +148,8 @@ def classify_url(parsed):
     # Base host classification (DEV_HOST, CLOUD_PROVIDER, etc.)
     host_cls, rdns, is_ip = classify_host_with_rdns(host or parsed.netloc or "")
 
-    api_cls = None
-
-    # ---- API-level patterns (most specific first) ----
-    # Discord webhooks
-    if host.endswith("discord.com") and path.startswith("/api/webhooks"):
-        api_cls = "API_DISCORD_WEBHOOK"
-
-    # Raw GitHub content / gists
-    elif host == "raw.githubusercontent.com":
-        api_cls = "API_GITHUB_RAW"
-    elif host in ("gist.github.com", "gist.githubusercontent.com"):
-        api_cls = "API_GITHUB_GIST"
-
-    # Pastebin (UI vs raw)
-    elif host == "pastebin.com":
-        if "/raw" in path:
-            api_cls = "API_PASTEBIN_RAW"
-        else:
-            api_cls = "API_PASTEBIN"
-
-    # Webhook / request bins
-    elif host == "webhook.site":
-        api_cls = "API_WEBHOOK_SITE"
-    elif host.endswith("requestbin.net") or host.endswith("requestcatcher.com"):
-        api_cls = "API_REQUESTBIN"
-
-    # Cloud auth / tokens
-    elif host == "sts.amazonaws.com":
-        api_cls = "API_AWS_STS"
-    elif host.endswith(".amazonaws.com"):
-        api_cls = "API_AWS_GENERIC"
-    elif host == "accounts.google.com":
-        api_cls = "API_GOOGLE_ACCOUNTS"
-    elif host == "login.microsoftonline.com":
-        api_cls = "API_MS_LOGIN"
-    elif host == "graph.microsoft.com":
-        api_cls = "API_MS_GRAPH"
+    # ---- API-level patterns (most specific first, domain_rules.json) ----
+    api_cls = API_CLASSES.classify(host, path)
 
     # Final decision: API class (if any) overrides host class
     final_cls = api_cls or host_cls
@@ -214,7 +157,7 @@ def classify_url(parsed):
 
 
 # ---------------- Core processing ----------------
-def process_file(path: str):
+def process_lines(lines):
     hosts = {}
     stats = {
         "raw_url_hits": 0,      # all regex matches
@@ -225,57 +168,56 @@ def process_file(path: str):
         "class_counts": defaultdict(int),  # per-URL class counts
     }
 
-    with open(path, "r", encoding="utf-8", errors="ignore") as f:
-        for raw in f:
-            line = raw.rstrip("\n")
-            for m in URL_RE.finditer(line):
-                url = m.group(1).rstrip('",\' );]}>')
-                prefix = line[:m.start()]
-                line_no = extract_line_number(prefix)
-
-                stats["raw_url_hits"] += 1
-
-                # Parse URL
-                try:
-                    parsed = urlparse(url)
-                except Exception:
-                    stats["skipped_urls"] += 1
-                    continue
-
-                host = parsed.hostname
-                if not is_valid_hostname(host):
-                    stats["skipped_urls"] += 1
-                    continue  # skip invalid URL/host
-
-                # API-first classification
-                cls, rdns, is_ip = classify_url(parsed)
-
-                stats["valid_url_hits"] += 1
-                if is_ip:
-                    stats["ip_urls"] += 1
-                else:
-                    stats["domain_urls"] += 1
-
-                # EXACTLY ONE count per URL hit
-                stats["class_counts"][cls] += 1
-
-                # Per-host aggregation (using host string)
-                host_key = host.lower()
-                if host_key not in hosts:
-                    hosts[host_key] = {
-                        "class": cls,
-                        "rdns": rdns,
-                        "hits": [],
-                        "is_ip": is_ip,
-                    }
-
-                # If host was previously generic, upgrade to more specific class
-                if hosts[host_key]["class"] == "GENERIC_DOMAIN" and cls != "GENERIC_DOMAIN":
-                    hosts[host_key]["class"] = cls
-                if rdns and not hosts[host_key]["rdns"]:
-                    hosts[host_key]["rdns"] = rdns
-
-                hosts[host_key]["hits"].append((line_no, url))
+    for raw in lines:
+        line = raw.rstrip("\n")
+        for m in URL_RE.finditer(line):
+            url = m.group(1).rstrip('",\' );]}>')
+            prefix = line[:m.start()]
+            line_no = extract_line_number(prefix)
+
+            stats["raw_url_hits"] += 1
+
+            # Parse URL
+            try:
+                parsed = urlparse(url)
+            except Exception:
+                stats["skipped_urls"] += 1
+                continue
+
+            host = parsed.hostname
+            if not is_valid_hostname(host):
+                stats["skipped_urls"] += 1
+                continue  # skip invalid URL/host
+
+            # API-first classification
+            cls, rdns, is_ip = classify_url(parsed)
+
+            stats["valid_url_hits"] += 1
+            if is_ip:
+                stats["ip_urls"] += 1
+            else:
+                stats["domain_urls"] += 1
+
+            # EXACTLY ONE count per URL hit
+            stats["class_counts"][cls] += 1
+
+            # Per-host aggregation (using host string)
+            host_key = host.lower()
+            if host_key not in hosts:
+                hosts[host_key] = {
+                    "class": cls,
+                    "rdns": rdns,
+                    "hits": [],
+                    "is_ip": is_ip,
+                }
+
+            # If host was previously generic, upgrade to more specific class
+            if hosts[host_key]["class"] == "GENERIC_DOMAIN" and cls != "GENERIC_DOMAIN":
+                hosts[host_key]["class"] = cls
+            if rdns and not hosts[host_key]["rdns"]:
+                hosts[host_key]["rdns"] = rdns
+
+            hosts[host_key]["hits"].append((line_no, url))
 
     ordered = OrderedDict(
         sorted(hosts.items(), key=lambda kv: (-len(kv[1]["hits"]), kv[0]))
@@ -321,7 +263,7 @@ def resolve_output_paths(analysis_root: str, label: str):
     detail_out = os.path.join(details_dir, f"{FEATURE_ID}_detail_{label}")
     return counts_out, detail_out
 
-def write_counts(stats, counts_out: str):
+def count_scores(stats) -> dict[str, int]:
     class_counts = stats["class_counts"]
 
     suspicious_ip_hits = (
@@ -329,88 +271,97 @@ def write_counts(stats, counts_out: str):
         + class_counts.get("CLOUD_METADATA", 0)
     )
 
-    with open(counts_out, "w", encoding="utf-8") as w:
-
-        # ===== EXACTLY the required schema =====
-
-        # API buckets
-        w.write(f"{FEATURE_ID}_API_AWS_GENERIC={class_counts.get('API_AWS_GENERIC', 0)}\n")
-        w.write(f"{FEATURE_ID}_API_AWS_STS={class_counts.get('API_AWS_STS', 0)}\n")
-        w.write(f"{FEATURE_ID}_API_GITHUB_GIST={class_counts.get('API_GITHUB_GIST', 0)}\n")
-        w.write(f"{FEATURE_ID}_API_GITHUB_RAW={class_counts.get('API_GITHUB_RAW', 0)}\n")
-        w.write(f"{FEATURE_ID}_API_GOOGLE_ACCOUNTS={class_counts.get('API_GOOGLE_ACCOUNTS', 0)}\n")
-        w.write(f"{FEATURE_ID}_API_MS_GRAPH={class_counts.get('API_MS_GRAPH', 0)}\n")
-        w.write(f"{FEATURE_ID}_API_MS_LOGIN={class_counts.get('API_MS_LOGIN', 0)}\n")
-        w.write(f"{FEATURE_ID}_API_PASTEBIN={class_counts.get('API_PASTEBIN', 0)}\n")
-        w.write(f"{FEATURE_ID}_API_WEBHOOK_SITE={class_counts.get('API_WEBHOOK_SITE', 0)}\n")
-
-        # Infra / classification groups
-        w.write(f"{FEATURE_ID}_CLOUD_METADATA={class_counts.get('CLOUD_METADATA', 0)}\n")
-        w.write(f"{FEATURE_ID}_CLOUD_PROVIDER={class_counts.get('CLOUD_PROVIDER', 0)}\n")
-        w.write(f"{FEATURE_ID}_DEV_HOST={class_counts.get('DEV_HOST', 0)}\n")
-        w.write(f"{FEATURE_ID}_GENERIC_DOMAIN={class_counts.get('GENERIC_DOMAIN', 0)}\n")
-        w.write(f"{FEATURE_ID}_LOCALHOST={class_counts.get('LOCALHOST', 0)}\n")
-        w.write(f"{FEATURE_ID}_PACKAGE_INFRA={class_counts.get('PACKAGE_INFRA', 0)}\n")
-
-        # IP buckets
-        w.write(f"{FEATURE_ID}_PRIVATE_IP={class_counts.get('PRIVATE_IP', 0)}\n")
-        w.write(f"{FEATURE_ID}_PUBLIC_IP={class_counts.get('PUBLIC_IP', 0)}\n")
-
-        # Core counters
-        w.write(f"{FEATURE_ID}_domain_url_hits={stats['domain_urls']}\n")
-        w.write(f"{FEATURE_ID}_ip_url_hits={stats['ip_urls']}\n")
-        w.write(f"{FEATURE_ID}_raw_url_hits={stats['raw_url_hits']}\n")
-        w.write(f"{FEATURE_ID}_skipped_invalid_urls={stats['skipped_urls']}\n")
-        w.write(f"{FEATURE_ID}_suspicious_ip_hits={suspicious_ip_hits}\n")
-        w.write(f"{FEATURE_ID}_valid_url_hits={stats['valid_url_hits']}\n")
-
-def write_summary(hosts, stats, detail_out: str, hits_path: str, label: str):
+    # ===== EXACTLY the required schema =====
+    scores = {}
+
+    # API buckets
+    for cls in (
+        "API_AWS_GENERIC", "API_AWS_STS", "API_GITHUB_GIST", "API_GITHUB_RAW",
+        "API_GOOGLE_ACCOUNTS", "API_MS_GRAPH", "API_MS_LOGIN", "API_PASTEBIN",
+        "API_WEBHOOK_SITE",
+    ):
+        scores[f"{FEATURE_ID}_{cls}"] = class_counts.get(cls, 0)
+
+    # Infra / classification groups
+    for cls in (
+        "CLOUD_METADATA", "CLOUD_PROVIDER", "DEV_HOST", "GENERIC_DOMAIN",
+        "LOCALHOST", "PACKAGE_INFRA",
+    ):
+        scores[f"{FEATURE_ID}_{cls}"] = class_counts.get(cls, 0)
+
+    # IP buckets
+    for cls in ("PRIVATE_IP", "PUBLIC_IP"):
+        scores[f"{FEATURE_ID}_{cls}"] = class_counts.get(cls, 0)
+
+    # Core counters
+    scores[f"{FEATURE_ID}_domain_url_hits"] = stats["domain_urls"]
+    scores[f"{FEATURE_ID}_ip_url_hits"] = stats["ip_urls"]
+    scores[f"{FEATURE_ID}_raw_url_hits"] = stats["raw_url_hits"]
+    scores[f"{FEATURE_ID}_skipped_invalid_urls"] = stats["skipped_urls"]
+    scores[f"{FEATURE_ID}_suspicious_ip_hits"] = suspicious_ip_hits
+    scores[f"{FEATURE_ID}_valid_url_hits"] = stats["valid_url_hits"]
+    return scores
+
+def format_summary(hosts, stats, hits_path: str, label: str) -> str:
     suspicious_ip_hits = (
         stats["class_counts"].get("PUBLIC_IP", 0)
         + stats["class_counts"].get("CLOUD_METADATA", 0)
     )
 
-    with open(detail_out, "w", encoding="utf-8") as w:
-        w.write("===========================================\n")
-        w.write("   C1 URL / Domain Feature Summary\n")
-        w.write("===========================================\n\n")
-        w.write(f"Source hits file={hits_path}\n")
-        w.write("Source code file=N/A\n\n")
-
-        # Summary block
-        w.write("[Summary]\n")
-        w.write(f"C1_raw_url_hits={stats['raw_url_hits']}\n")
-        w.write(f"C1_valid_url_hits={stats['valid_url_hits']}\n")
-        w.write(f"C1_skipped_invalid_urls={stats['skipped_urls']}\n")
-        w.write(f"C1_ip_url_hits={stats['ip_urls']}\n")
-        w.write(f"C1_domain_url_hits={stats['domain_urls']}\n")
-        w.write(f"C1_suspicious_ip_hits={suspicious_ip_hits}\n")
-        w.write("\nC1_by_class_url_hits:\n")
-        for cls, count in sorted(stats["class_counts"].items()):
-            w.write(f"  {cls}={count}\n")
-        w.write("\n")
-
-        # Details block
-        w.write("[Details]\n")
-        w.write(f"target_label={label}\n")
-        w.write(f"arg1(hits_file)={hits_path}\n")
-        w.write("arg2(source_file)=N/A\n\n")
-
-        # Per-host details
-        for host, info in hosts.items():
-            hits = info["hits"]
-            cls = info["class"]
-            rdns = info["rdns"]
-            count = len(hits)
-
-            if rdns:
-                w.write(f"{host} count={count} class={cls} (rdns={rdns})\n")
-            else:
-                w.write(f"{host} count={count} class={cls}\n")
+    w = io.StringIO()
+    w.write("===========================================\n")
+    w.write("   C1 URL / Domain Feature Summary\n")
+    w.write("===========================================\n\n")
+    w.write(f"Source hits file={hits_path}\n")
+    w.write("Source code file=N/A\n\n")
+
+    # Summary block
+    w.write("[Summary]\n")
+    w.write(f"C1_raw_url_hits={stats['raw_url_hits']}\n")
+    w.write(f"C1_valid_url_hits={stats['valid_url_hits']}\n")
+    w.write(f"C1_skipped_invalid_urls={stats['skipped_urls']}\n")
+    w.write(f"C1_ip_url_hits={stats['ip_urls']}\n")
+    w.write(f"C1_domain_url_hits={stats['domain_urls']}\n")
+    w.write(f"C1_suspicious_ip_hits={suspicious_ip_hits}\n")
+    w.write("\nC1_by_class_url_hits:\n")
+    for cls, count in sorted(stats["class_counts"].items()):
+        w.write(f"  {cls}={count}\n")
+    w.write("\n")
+
+    # Details block
+    w.write("[Details]\n")
+    w.write(f"target_label={label}\n")
+    w.write(f"arg1(hits_file)={hits_path}\n")
+    w.write("arg2(source_file)=N/A\n\n")
+
+    # Per-host details
+    for host, info in hosts.items():
+        hits = info["hits"]
+        cls = info["class"]
+        rdns = info["rdns"]
+        count = len(hits)
+
+        if rdns:
+            w.write(f"{host} count={count} class={cls} (rdns={rdns})\n")
+        else:
+            w.write(f"{host} count={count} class={cls}\n")
 
-            for line_no, url in hits:
-                w.write(f"  * [line {line_no}] {url}\n")
-            w.write("\n")
+        for line_no, url in hits:
+            w.write(f"  * [line {line_no}] {url}\n")
+        w.write("\n")
+    return w.getvalue()
+
+
+def process(hits, source_buffer, ctx: ProcessorContext) -> FeatureResult:
+    """Classify C1 URL hits; see processor_api for the plugin contract."""
+    hosts, stats = process_lines(hits)
+    if not ctx.details:
+        return FeatureResult(FEATURE_ID, count_scores(stats))
+    return FeatureResult(
+        FEATURE_ID,
+        count_scores(stats),
+        format_summary(hosts, stats, ctx.hits_path, ctx.label),
+    )
 
 
 # ---------------- Entry point ----------------
@@ -426,13 +377,12 @@ def main():
     counts_out, detail_out = resolve_output_paths(analysis_root, label)
 
     print(f"[+] Processing {hits_path} ...")
-    hosts, stats = process_file(hits_path)
+    ctx = ProcessorContext(hits_path, None, analysis_root, label)
+    result = process(read_hits_file(hits_path), None, ctx)
 
     print(f"[+] Writing counts  -> {counts_out}")
-    write_counts(stats, counts_out)
-
     print(f"[+] Writing summary -> {detail_out}")
-    write_summary(hosts, stats, detail_out, hits_path, label)
+    write_result(result, counts_out, detail_out)
 
     print("[+] Done.")
 
@@ -1,44 +1,26 @@
 #!/usr/bin/env python3
+import io
 import sys
-import re
 import os
 from collections import defaultdict
 
+from processor_api import (
+    FeatureResult,
+    ProcessorContext,
+    read_hits_file,
+    write_result,
+)
+from domain_rules import line_patterns
+
 FEATURE_ID = "C2"
 USAGE = f"Usage: python3 process_{FEATURE_ID}.py <C2_hits_file> <analysis_root>"
 
-# Categories:
+# Categories (patterns in domain_rules.json, "C2_categories"):
 # - sink_exfil: endpoints commonly used as data sinks / collectors
 # - dev_code_host: code/content hosts devs use (raw GH, gists)
 # - cloud_auth: cloud identity / token endpoints (AWS/GCP/Azure)
 # - other_suspicious: fallback bucket if nothing matches above
-CATEGORY_PATTERNS = [
-    # Data sinks / exfil collectors
-    (
-        "sink_exfil",
-        re.compile(
-            r"(webhook\.site|requestbin|ngrok\.io|discord\.com/api/webhooks|pastebin\.com)",
-            re.IGNORECASE,
-        ),
-    ),
-    # Developer-oriented hosting (raw code / gists)
-    (
-        "dev_code_host",
-        re.compile(
-            r"(raw\.githubusercontent\.com|gist\.github\.com)",
-            re.IGNORECASE,
-        ),
-    ),
-    # Cloud auth / token / identity endpoints
-    (
-        "cloud_auth",
-        re.compile(
-            r"(sts\.amazonaws\.com|signin\.aws\.amazon\.com|accounts\.google\.com|"
-            r"login\.microsoftonline\.com|graph\.microsoft\.com)",
-            re.IGNORECASE,
-        ),
-    ),
-]
+CATEGORY_PATTERNS = line_patterns("C2_categories")
 
 ALL_CATEGORIES = ["sink_exfil", "dev_code_host", "cloud_auth", "other_suspicious"]
 
@@ -91,6 +73,67 @@ def resolve_output_paths(analysis_root: str, label: str):
     return counts_out, detail_out
 
 
+def process(hits, source_buffer, ctx: ProcessorContext) -> FeatureResult:
+    """Classify C2 endpoint hits; see processor_api for the plugin contract."""
+    hits_path = ctx.hits_path
+    label = ctx.label
+
+    total_hits = 0
+    category_counts = {cat: 0 for cat in ALL_CATEGORIES}
+    category_lines = defaultdict(list)
+
+    # Read C2 hits and classify each line
+    for raw_line in hits:
+        line = raw_line.rstrip("\n")
+        if not line.strip():
+            continue
+        total_hits += 1
+        category = classify_line(line)
+        category_counts[category] += 1
+        category_lines[category].append(line)
+
+    # 1) Counts: C2_score_<label>
+    scores = {f"{FEATURE_ID}_total_hits": total_hits}
+    for cat in ALL_CATEGORIES:
+        scores[f"{FEATURE_ID}_{cat}"] = category_counts.get(cat, 0)
+
+    # 2) Summary + details file: C2_detail_<label>
+    if not ctx.details:
+        return FeatureResult(FEATURE_ID, scores)
+
+    out = io.StringIO()
+    out.write("===========================================\n")
+    out.write("   C2 Suspicious Endpoint Classes\n")
+    out.write("===========================================\n\n")
+    out.write(f"Source hits file={hits_path}\n")
+    out.write("Source code file=N/A\n\n")
+
+    # Summary block
+    out.write("[Summary]\n")
+    out.write(f"C2_total_hits={total_hits}\n")
+    for cat in ALL_CATEGORIES:
+        out.write(f"C2_{cat}={category_counts.get(cat, 0)}\n")
+    out.write("\n")
+
+    # Details block
+    out.write("[Details]\n")
+    out.write(f"target_label={label}\n")
+    out.write(f"arg1(hits_file)={hits_path}\n")
+    out.write("arg2(source_file)=N/A\n\n")
+
+    for cat in ALL_CATEGORIES:
+        cat_hits = category_lines.get(cat, [])
+        out.write(f"===== {cat} (count={len(cat_hits)}) =====\n\n")
+        if not cat_hits:
+            out.write("  (none)\n\n")
+            continue
+        for line in cat_hits:
+            out.write(line + "\n")
+        out.write("\n")
+
+    return FeatureResult(FEATURE_ID, scores, out.getvalue())
+
+
 def main():
     if len(sys.argv) < 3:
         print(USAGE, file=sys.stderr)
@@ -102,57 +145,9 @@ def main():
     label = get_label(hits_path)
     counts_out, detail_out = resolve_output_paths(analysis_root, label)
 
-    total_hits = 0
-    category_counts = {cat: 0 for cat in ALL_CATEGORIES}
-    category_lines = defaultdict(list)
-
-    # Read C2 hits and classify each line
-    with open(hits_path, "r", encoding="utf-8", errors="replace") as f:
-        for raw_line in f:
-            line = raw_line.rstrip("\n")
-            if not line.strip():
-                continue
-            total_hits += 1
-            category = classify_line(line)
-            category_counts[category] += 1
-            category_lines[category].append(line)
-
-    # 1) Counts file: C2_score_<label>
-    with open(counts_out, "w", encoding="utf-8") as out:
-        out.write(f"{FEATURE_ID}_total_hits={total_hits}\n")
-        for cat in ALL_CATEGORIES:
-            out.write(f"{FEATURE_ID}_{cat}={category_counts.get(cat, 0)}\n")
-
-    # 2) Summary + details file: C2_detail_<label>
-    with open(detail_out, "w", encoding="utf-8") as out:
-        out.write("===========================================\n")
-        out.write("   C2 Suspicious Endpoint Classes\n")
-        out.write("===========================================\n\n")
-        out.write(f"Source hits file={hits_path}\n")
-        out.write("Source code file=N/A\n\n")
-
-        # Summary block
-        out.write("[Summary]\n")
-        out.write(f"C2_total_hits={total_hits}\n")
-        for cat in ALL_CATEGORIES:
-            out.write(f"C2_{cat}={category_counts.get(cat, 0)}\n")
-        out.write("\n")
-
-        # Details block
-        out.write("[Details]\n")
-        out.write(f"target_label={label}\n")
-        out.write(f"arg1(hits_file)={hits_path}\n")
-        out.write("arg2(source_file)=N/A\n\n")
-
-        for cat in ALL_CATEGORIES:
-            hits = category_lines.get(cat, [])
-            out.write(f"===== {cat} (count={len(hits)}) =====\n\n")
-            if not hits:
-                out.write("  (none)\n\n")
-                continue
-            for line in hits:
-                out.write(line + "\n")
-            out.write("\n")
+    ctx = ProcessorContext(hits_path, None, analysis_root, label)
+    result = process(read_hits_file(hits_path, errors="replace"), None, ctx)
+    write_result(result, counts_out, detail_out)
 
     print(f"[+] {FEATURE_ID} counts written to {counts_out}")
     print(f"[+] {FEATURE_ID} summary written to {detail_out}")
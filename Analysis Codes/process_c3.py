@@ -1,9 +1,17 @@
 #!/usr/bin/env python3
+import io
 import sys
 import re
 import os
 from collections import defaultdict
 
+from processor_api import (
+    FeatureResult,
+    ProcessorContext,
+    read_hits_file,
+    write_result,
+)
+
 FEATURE_ID = "C3"
 USAGE = f"Usage: python3 process_{FEATURE_ID}.py <C3_hits_file> <analysis_root>"
 
@@ -91,6 +99,68 @@ def resolve_output_paths(analysis_root: str, label: str):
     return counts_out, detail_out
 
 
+def process(hits, source_buffer, ctx: ProcessorContext) -> FeatureResult:
+    """Classify C3 capability hits; see processor_api for the plugin contract."""
+    hits_path = ctx.hits_path
+    label = ctx.label
+
+    # Counters and line buckets
+    counts = {cat: 0 for cat in ALL_CATEGORIES}
+    buckets = defaultdict(list)
+    total_hits = 0
+
+    # Pass 1: classify and count
+    for raw_line in hits:
+        line = raw_line.rstrip("\n")
+        if not line.strip():
+            continue
+        total_hits += 1
+        category = classify_line(line)
+        counts[category] += 1
+        buckets[category].append(line)
+
+    # 1) Counts: C3_score_<label>
+    scores = {f"{FEATURE_ID}_total_hits": total_hits}
+    for cat in ALL_CATEGORIES:
+        scores[f"{FEATURE_ID}_{cat}"] = counts.get(cat, 0)
+
+    # 2) Summary + details: C3_detail_<label>
+    if not ctx.details:
+        return FeatureResult(FEATURE_ID, scores)
+
+    fout = io.StringIO()
+    fout.write("===========================================\n")
+    fout.write("   C3 Network / Exec Capability Summary\n")
+    fout.write("===========================================\n\n")
+    fout.write(f"Source hits file={hits_path}\n")
+    fout.write("Source code file=N/A\n\n")
+
+    # Summary block
+    fout.write("[Summary]\n")
+    fout.write(f"C3_total_hits={total_hits}\n")
+    for cat in ALL_CATEGORIES:
+        fout.write(f"C3_{cat}={counts.get(cat, 0)}\n")
+    fout.write("\n")
+
+    # Details block
+    fout.write("[Details]\n")
+    fout.write(f"target_label={label}\n")
+    fout.write(f"arg1(hits_file)={hits_path}\n")
+    fout.write("arg2(source_file)=N/A\n\n")
+
+    for cat in ALL_CATEGORIES:
+        lines = buckets.get(cat, [])
+        fout.write(f"===== {cat} (count={len(lines)}) =====\n\n")
+        if not lines:
+            fout.write("  (none)\n\n")
+            continue
+        for line in lines:
+            fout.write(line + "\n")
+        fout.write("\n")
+
+    return FeatureResult(FEATURE_ID, scores, fout.getvalue())
+
+
 def main():
     if len(sys.argv) < 3:
         print(USAGE, file=sys.stderr)
@@ -106,58 +176,9 @@ def main():
     label = get_label(hits_path)
     counts_out, detail_out = resolve_output_paths(analysis_root, label)
 
-    # Counters and line buckets
-    counts = {cat: 0 for cat in ALL_CATEGORIES}
-    buckets = defaultdict(list)
-    total_hits = 0
-
-    # Pass 1: classify and count
-    with open(hits_path, "r", encoding="utf-8", errors="replace") as fin:
-        for raw_line in fin:
-            line = raw_line.rstrip("\n")
-            if not line.strip():
-                continue
-            total_hits += 1
-            category = classify_line(line)
-            counts[category] += 1
-            buckets[category].append(line)
-
-    # 1) Counts file: C3_score_<label>
-    with open(counts_out, "w", encoding="utf-8") as fout:
-        fout.write(f"{FEATURE_ID}_total_hits={total_hits}\n")
-        for cat in ALL_CATEGORIES:
-            fout.write(f"{FEATURE_ID}_{cat}={counts.get(cat, 0)}\n")
-
-    # 2) Summary + details: C3_detail_<label>
-    with open(detail_out, "w", encoding="utf-8") as fout:
-        fout.write("===========================================\n")
-        fout.write("   C3 Network / Exec Capability Summary\n")
-        fout.write("===========================================\n\n")
-        fout.write(f"Source hits file={hits_path}\n")
-        fout.write("Source code file=N/A\n\n")
-
-        # Summary block
-        fout.write("[Summary]\n")
-        fout.write(f"C3_total_hits={total_hits}\n")
-        for cat in ALL_CATEGORIES:
-            fout.write(f"C3_{cat}={counts.get(cat, 0)}\n")
-        fout.write("\n")
-
-        # Details block
-        fout.write("[Details]\n")
-        fout.write(f"target_label={label}\n")
-        fout.write(f"arg1(hits_file)={hits_path}\n")
-        fout.write("arg2(source_file)=N/A\n\n")
-
-        for cat in ALL_CATEGORIES:
-            lines = buckets.get(cat, [])
-            fout.write(f"===== {cat} (count={len(lines)}) =====\n\n")
-            if not lines:
-                fout.write("  (none)\n\n")
-                continue
-            for line in lines:
-                fout.write(line + "\n")
-            fout.write("\n")
+    ctx = ProcessorContext(hits_path, None, analysis_root, label)
+    result = process(read_hits_file(hits_path, errors="replace"), None, ctx)
+    write_result(result, counts_out, detail_out)
 
     print(f"[+] {FEATURE_ID} counts written to {counts_out}")
     print(f"[+] {FEATURE_ID} summary written to {detail_out}")
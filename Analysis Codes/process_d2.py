@@ -1,8 +1,16 @@
 #!/usr/bin/env python3
+import io
 import sys
 import os
 from collections import defaultdict
 
+from processor_api import (
+    FeatureResult,
+    ProcessorContext,
+    read_hits_file,
+    write_result,
+)
+
 FEATURE_ID = "D2"
 USAGE = f"Usage: python3 process_{FEATURE_ID}.py <D2_hits_file> <analysis_root>"
 
@@ -101,6 +109,70 @@ def classify_line(line: str) -> str:
     return CAT_UNKNOWN
 
 
+def process(hits, source_buffer, ctx: ProcessorContext) -> FeatureResult:
+    """Count D2 script/lifecycle hits by tag; see processor_api."""
+    input_path = ctx.hits_path
+    label = ctx.label
+
+    # Prepare counts and details
+    counts = {cat: 0 for cat in CATEGORY_ORDER}
+    details = defaultdict(list)
+
+    # Classify each line
+    for raw_line in hits:
+        line = raw_line.rstrip("\n")
+        if not line.strip():
+            continue
+        cat = classify_line(line)
+        counts[cat] += 1
+        details[cat].append(line)
+
+    total_hits = sum(counts.values())
+
+    # ---------- 1) Scores: D2_score_<label> ----------
+    scores = {f"{FEATURE_ID}_total_hits": total_hits}
+    for cat in CATEGORY_ORDER:
+        scores[CATEGORY_LABELS[cat]] = counts[cat]
+
+    # ---------- 2) Human-readable summary: D2_detail_<label> ----------
+    if not ctx.details:
+        return FeatureResult(FEATURE_ID, scores)
+
+    out = io.StringIO()
+    out.write("===========================================\n")
+    out.write("   D2 – Script / Lifecycle Behaviour\n")
+    out.write("===========================================\n\n")
+    out.write(f"Source hits file={input_path}\n")
+    out.write("Source code file=N/A\n\n")
+
+    out.write("[Summary]\n")
+    out.write(f"D2_total_hits={total_hits}\n")
+    out.write("D2_category_counts:\n")
+    for cat in CATEGORY_ORDER:
+        out_label = CATEGORY_LABELS[cat]
+        out.write(f"  {out_label}={counts[cat]}\n")
+    out.write("\n")
+
+    out.write("[Details]\n")
+    out.write(f"target_label={label}\n")
+    out.write(f"arg1(hits_file)={input_path}\n")
+    out.write("arg2(source_file)=N/A\n\n")
+
+    # Grouped detail lines by category (only show blocks that have hits)
+    for cat in CATEGORY_ORDER:
+        out_label = CATEGORY_LABELS[cat]
+        cat_hits = details[cat]
+        out.write(f"== {out_label} (count={len(cat_hits)}) ==\n")
+        if not cat_hits:
+            out.write("  (no hits)\n\n")
+            continue
+        for line in cat_hits:
+            out.write(line + "\n")
+        out.write("\n")
+
+    return FeatureResult(FEATURE_ID, scores, out.getvalue())
+
+
 def main():
     if len(sys.argv) != 3:
         print(USAGE, file=sys.stderr)
@@ -113,63 +185,12 @@ def main():
         print(f"Error: file not found: {input_path}", file=sys.stderr)
         sys.exit(1)
 
-    # Prepare counts and details
-    counts = {cat: 0 for cat in CATEGORY_ORDER}
-    details = defaultdict(list)
-
-    # Read and classify each line
-    with open(input_path, "r", encoding="utf-8", errors="replace") as f:
-        for raw_line in f:
-            line = raw_line.rstrip("\n")
-            if not line.strip():
-                continue
-            cat = classify_line(line)
-            counts[cat] += 1
-            details[cat].append(line)
-
-    total_hits = sum(counts.values())
     label = get_label(input_path)
     counts_out, detail_out = resolve_output_paths(analysis_root, label)
 
-    # ---------- 1) Score file: D2_score_<label> ----------
-    with open(counts_out, "w", encoding="utf-8") as hf:
-        hf.write(f"{FEATURE_ID}_total_hits={total_hits}\n")
-        for cat in CATEGORY_ORDER:
-            out_label = CATEGORY_LABELS[cat]
-            hf.write(f"{out_label}={counts[cat]}\n")
-
-    # ---------- 2) Human-readable summary: D2_detail_<label> ----------
-    with open(detail_out, "w", encoding="utf-8") as out:
-        out.write("===========================================\n")
-        out.write("   D2 – Script / Lifecycle Behaviour\n")
-        out.write("===========================================\n\n")
-        out.write(f"Source hits file={input_path}\n")
-        out.write("Source code file=N/A\n\n")
-
-        out.write("[Summary]\n")
-        out.write(f"D2_total_hits={total_hits}\n")
-        out.write("D2_category_counts:\n")
-        for cat in CATEGORY_ORDER:
-            out_label = CATEGORY_LABELS[cat]
-            out.write(f"  {out_label}={counts[cat]}\n")
-        out.write("\n")
-
-        out.write("[Details]\n")
-        out.write(f"target_label={label}\n")
-        out.write(f"arg1(hits_file)={input_path}\n")
-        out.write("arg2(source_file)=N/A\n\n")
-
-        # Grouped detail lines by category (only show blocks that have hits)
-        for cat in CATEGORY_ORDER:
-            out_label = CATEGORY_LABELS[cat]
-            cat_hits = details[cat]
-            out.write(f"== {out_label} (count={len(cat_hits)}) ==\n")
-            if not cat_hits:
-                out.write("  (no hits)\n\n")
-                continue
-            for line in cat_hits:
-                out.write(line + "\n")
-            out.write("\n")
+    ctx = ProcessorContext(input_path, None, analysis_root, label)
+    result = process(read_hits_file(input_path, errors="replace"), None, ctx)
+    write_result(result, counts_out, detail_out)
 
     print(f"[+] {FEATURE_ID} scores written to {counts_out}")
     print(f"[+] {FEATURE_ID} summary written to {detail_out}")
@@ -1,26 +1,33 @@
 #!/usr/bin/env python3
+import io
 import sys
 import os
 
+from processor_api import (
+    FeatureResult,
+    ProcessorContext,
+    read_hits_file,
+    write_result,
+)
+
 FEATURE_ID = "E2"
 USAGE = f"Usage: python3 process_{FEATURE_ID}.py <E2_hits_file> <analysis_root>"
 
 
-def parse_e2(path):
-    """Parse E2 into list of (line_no, length)."""
+def parse_e2(hits):
+    """Parse E2 hit lines into list of (line_no, length)."""
     entries = []  # list of (line_no, length)
-    with open(path, "r", encoding="utf-8", errors="ignore") as f:
-        for raw in f:
-            line = raw.strip()
-            if not line or ":" not in line:
-                continue
-            left, right = line.split(":", 1)
-            try:
-                ln = int(left.strip())
-                ln_len = int(right.strip())
-            except ValueError:
-                continue
-            entries.append((ln, ln_len))
+    for raw in hits:
+        line = raw.strip()
+        if not line or ":" not in line:
+            continue
+        left, right = line.split(":", 1)
+        try:
+            ln = int(left.strip())
+            ln_len = int(right.strip())
+        except ValueError:
+            continue
+        entries.append((ln, ln_len))
     return entries
 
 
@@ -96,6 +103,87 @@ def resolve_output_paths(analysis_root: str, label: str):
     return counts_out, detail_out
 
 
+def process(hits, source_buffer, ctx: ProcessorContext) -> FeatureResult:
+    """Summarise E2 long-line hits; see processor_api for the plugin contract."""
+    e2_path = ctx.hits_path
+    label = ctx.label
+
+    entries = parse_e2(hits)
+    summary = summarize(entries)
+
+    # ---- counts for scoring ----
+    if summary is None:
+        bins = {
+            "100-999": 0,
+            "1000-9999": 0,
+            "10000-99999": 0,
+            "100000-999999": 0,
+            ">=1000000": 0,
+        }
+        total_long_lines = 0
+    else:
+        bins = summary["bins"]
+        total_long_lines = summary["count"]
+    scores = {
+        f"{FEATURE_ID}_total_long_lines": total_long_lines,
+        f"{FEATURE_ID}_bin_100_999": bins["100-999"],
+        f"{FEATURE_ID}_bin_1000_9999": bins["1000-9999"],
+        f"{FEATURE_ID}_bin_10000_99999": bins["10000-99999"],
+        f"{FEATURE_ID}_bin_100000_999999": bins["100000-999999"],
+        f"{FEATURE_ID}_bin_ge_1000000": bins[">=1000000"],
+    }
+
+    # ---- detailed summary ----
+    if not ctx.details:
+        return FeatureResult(FEATURE_ID, scores)
+
+    out = io.StringIO()
+    if summary is None:
+        out.write("=========================================\n")
+        out.write("                E2 Summary\n")
+        out.write("        Very Long Lines (original file)\n")
+        out.write("=========================================\n\n")
+        out.write(f"[Args]\n")
+        out.write(f"  arg1(E2_hits_file)={e2_path}\n")
+        out.write("  arg2(source_file)=N/A\n\n")
+        out.write("[Summary]\n")
+        out.write("E2_total_long_lines=0\n")
+    else:
+        out.write("=========================================\n")
+        out.write("                E2 Summary\n")
+        out.write("        Very Long Lines (original file)\n")
+        out.write("=========================================\n\n")
+        out.write("[Args]\n")
+        out.write(f"  arg1(E2_hits_file)={e2_path}\n")
+        out.write("  arg2(source_file)=N/A\n\n")
+
+        out.write("[Summary]\n")
+        out.write(f"E2_total_long_lines={summary['count']}\n")
+        out.write(f"E2_min_length={summary['min_len']}\n")
+        out.write(f"E2_max_length={summary['max_len']}\n")
+        out.write(f"E2_avg_length={summary['avg_len']:.2f}\n\n")
+
+        out.write("E2_length_bins(line_counts):\n")
+        bins = summary["bins"]
+        out.write(f"  100–999 chars:         {bins['100-999']}\n")
+        out.write(f"  1,000–9,999 chars:     {bins['1000-9999']}\n")
+        out.write(f"  10,000–99,999 chars:   {bins['10000-99999']}\n")
+        out.write(f"  100,000–999,999 chars: {bins['100000-999999']}\n")
+        out.write(f"  ≥ 1,000,000 chars:     {bins['>=1000000']}\n\n")
+
+        out.write("[Details]\n")
+        out.write(f"target_label={label}\n")
+        out.write(f"arg1(hits_file)={e2_path}\n")
+        out.write("arg2(source_file)=N/A\n\n")
+
+        out.write("[Top longest lines]\n")
+        out.write("line_no:length\n")
+        for ln, ln_len in summary["top"]:
+            out.write(f"  {ln}:{ln_len}\n")
+
+    return FeatureResult(FEATURE_ID, scores, out.getvalue())
+
+
 def main():
     if len(sys.argv) != 3:
         print(USAGE, file=sys.stderr)
@@ -111,71 +199,9 @@ def main():
     label = get_label(e2_path)
     counts_out, details_out = resolve_output_paths(analysis_root, label)
 
-    entries = parse_e2(e2_path)
-    summary = summarize(entries)
-
-    # ---- counts file for scoring ----
-    with open(counts_out, "w", encoding="utf-8") as out:
-        if summary is None:
-            out.write(f"{FEATURE_ID}_total_long_lines=0\n")
-            out.write(f"{FEATURE_ID}_bin_100_999=0\n")
-            out.write(f"{FEATURE_ID}_bin_1000_9999=0\n")
-            out.write(f"{FEATURE_ID}_bin_10000_99999=0\n")
-            out.write(f"{FEATURE_ID}_bin_100000_999999=0\n")
-            out.write(f"{FEATURE_ID}_bin_ge_1000000=0\n")
-        else:
-            bins = summary["bins"]
-            out.write(f"{FEATURE_ID}_total_long_lines={summary['count']}\n")
-            out.write(f"{FEATURE_ID}_bin_100_999={bins['100-999']}\n")
-            out.write(f"{FEATURE_ID}_bin_1000_9999={bins['1000-9999']}\n")
-            out.write(f"{FEATURE_ID}_bin_10000_99999={bins['10000-99999']}\n")
-            out.write(f"{FEATURE_ID}_bin_100000_999999={bins['100000-999999']}\n")
-            out.write(f"{FEATURE_ID}_bin_ge_1000000={bins['>=1000000']}\n")
-
-    # ---- detailed summary ----
-    with open(details_out, "w", encoding="utf-8") as out:
-        if summary is None:
-            out.write("=========================================\n")
-            out.write("                E2 Summary\n")
-            out.write("        Very Long Lines (original file)\n")
-            out.write("=========================================\n\n")
-            out.write(f"[Args]\n")
-            out.write(f"  arg1(E2_hits_file)={e2_path}\n")
-            out.write("  arg2(source_file)=N/A\n\n")
-            out.write("[Summary]\n")
-            out.write("E2_total_long_lines=0\n")
-        else:
-            out.write("=========================================\n")
-            out.write("                E2 Summary\n")
-            out.write("        Very Long Lines (original file)\n")
-            out.write("=========================================\n\n")
-            out.write("[Args]\n")
-            out.write(f"  arg1(E2_hits_file)={e2_path}\n")
-            out.write("  arg2(source_file)=N/A\n\n")
-
-            out.write("[Summary]\n")
-            out.write(f"E2_total_long_lines={summary['count']}\n")
-            out.write(f"E2_min_length={summary['min_len']}\n")
-            out.write(f"E2_max_length={summary['max_len']}\n")
-            out.write(f"E2_avg_length={summary['avg_len']:.2f}\n\n")
-
-            out.write("E2_length_bins(line_counts):\n")
-            bins = summary["bins"]
-            out.write(f"  100–999 chars:         {bins['100-999']}\n")
-            out.write(f"  1,000–9,999 chars:     {bins['1000-9999']}\n")
-            out.write(f"  10,000–99,999 chars:   {bins['10000-99999']}\n")
-            out.write(f"  100,000–999,999 chars: {bins['100000-999999']}\n")
-            out.write(f"  ≥ 1,000,000 chars:     {bins['>=1000000']}\n\n")
-
-            out.write("[Details]\n")
-            out.write(f"target_label={label}\n")
-            out.write(f"arg1(hits_file)={e2_path}\n")
-            out.write("arg2(source_file)=N/A\n\n")
-
-            out.write("[Top longest lines]\n")
-            out.write("line_no:length\n")
-            for ln, ln_len in summary["top"]:
-                out.write(f"  {ln}:{ln_len}\n")
+    ctx = ProcessorContext(e2_path, None, analysis_root, label)
+    result = process(read_hits_file(e2_path), None, ctx)
+    write_result(result, counts_out, details_out)
 
     print(f"[+] {FEATURE_ID} scores written to {counts_out}")
     print(f"[+] {FEATURE_ID} details written to {details_out}")
@@ -1,7 +1,15 @@
 #!/usr/bin/env python3
+import io
 import sys
 import os
 
+from processor_api import (
+    FeatureResult,
+    ProcessorContext,
+    read_hits_file,
+    write_result,
+)
+
 FEATURE_ID = "F1"
 USAGE = (
     f"Usage:\n"
@@ -52,13 +60,97 @@ def resolve_output_paths(analysis_root: str, label: str):
     detail_out = os.path.join(details_dir, f"{FEATURE_ID}_detail_{label}")
     return counts_out, detail_out
 
+def process(hits, source_buffer, ctx: ProcessorContext) -> FeatureResult:
+    """Count lifecycle hooks in F1 hits; see processor_api for the plugin contract."""
+    hits_file = ctx.hits_path
+    pkg_json_path = ctx.source_path or "(not provided)"
+    analysis_root = ctx.analysis_root
+    label = ctx.label
+
+    # ---- Counters ----
+    counts = {
+        "total_hooks": 0,
+        "total_optional_hooks": 0,
+        "optionalDependencies": 0,
+        "scripts_block": 0,
+    }
+    hook_counts = {h: 0 for h in LIFECYCLE_HOOKS}
+
+    # ---- Parse hits ----
+    for raw in hits:
+        line = raw.strip()
+        if not line:
+            continue
+        parts = line.split(":", 3)
+        if len(parts) >= 3:
+            # F1 lines are "lineno:offset:text"
+            _, _, text = parts[0], parts[1], parts[2]
+        else:
+            text = line
+
+        # Match lifecycle hooks
+        for hook in LIFECYCLE_HOOKS:
+            if f"\"{hook}\"" in text or f"'{hook}'" in text:
+                counts["total_hooks"] += 1
+                hook_counts[hook] += 1
+                if hook in OPTIONAL_HOOKS:
+                    counts["total_optional_hooks"] += 1
+                break
+
+        if '"optionalDependencies"' in text:
+            counts["optionalDependencies"] += 1
+        if '"scripts"' in text:
+            counts["scripts_block"] += 1
+
+    # ------------------------------------
+    # 1) Counts (for ML scoring)
+    # ------------------------------------
+    scores = {
+        f"{FEATURE_ID}_total_hooks": counts["total_hooks"],
+        f"{FEATURE_ID}_optional_hooks": counts["total_optional_hooks"],
+        f"{FEATURE_ID}_optionalDependencies": counts["optionalDependencies"],
+        f"{FEATURE_ID}_scripts_block": counts["scripts_block"],
+    }
+    for hook in LIFECYCLE_HOOKS:
+        scores[f"{FEATURE_ID}_hook_{hook}"] = hook_counts.get(hook, 0)
+
+    # ------------------------------------
+    # 2) Detailed summary
+    # ------------------------------------
+    if not ctx.details:
+        return FeatureResult(FEATURE_ID, scores)
+
+    out = io.StringIO()
+    out.write("===========================================\n")
+    out.write("   F1 – package.json Lifecycle Hooks\n")
+    out.write("===========================================\n\n")
+    out.write(f"Hits file:    {hits_file}\n")
+    out.write(f"package.json: {pkg_json_path}\n\n")
+    out.write("[Summary]\n")
+    out.write(f"F1_total_hooks={counts['total_hooks']}\n")
+    out.write(f"F1_optional_hooks={counts['total_optional_hooks']}\n")
+    out.write(f"F1_optionalDependencies={counts['optionalDependencies']}\n")
+    out.write(f"F1_scripts_block={counts['scripts_block']}\n\n")
+    out.write("F1_per_hook_counts:\n")
+    for hook in LIFECYCLE_HOOKS:
+        c = hook_counts[hook]
+        flag = " (optional)" if hook in OPTIONAL_HOOKS else ""
+        out.write(f"  - {hook:15s}: {c}{flag}\n")
+    out.write("\n[Details]\n")
+    out.write(f"target_label={label}\n")
+    out.write(f"arg1(hits_file)={hits_file}\n")
+    out.write(f"arg2(package.json)={pkg_json_path}\n")
+    out.write(f"arg3(analysis_root)={analysis_root}\n")
+
+    return FeatureResult(FEATURE_ID, scores, out.getvalue())
+
 def main():
     # Support both old (3 args) and new (2 args) calling conventions
     if len(sys.argv) == 3:
         # New: process_f1.py <hits_file> <analysis_root>
         hits_file = sys.argv[1]
         analysis_root = sys.argv[2]
-        pkg_json_path = "(not provided)"
+        pkg_json_path = None
     elif len(sys.argv) == 4:
         # Old: process_f1.py <hits_file> <package_json_path> <analysis_root>
         hits_file = sys.argv[1]
@@ -75,77 +167,9 @@ def main():
     label = get_label(hits_file)
     out_counts, out_details = resolve_output_paths(analysis_root, label)
 
-    # ---- Counters ----
-    counts = {
-        "total_hooks": 0,
-        "total_optional_hooks": 0,
-        "optionalDependencies": 0,
-        "scripts_block": 0,
-    }
-    hook_counts = {h: 0 for h in LIFECYCLE_HOOKS}
-
-    # ---- Parse hits ----
-    with open(hits_file, "r", encoding="utf-8", errors="ignore") as f:
-        for raw in f:
-            line = raw.strip()
-            if not line:
-                continue
-            parts = line.split(":", 3)
-            if len(parts) >= 3:
-                # F1 lines are "lineno:offset:text"
-                _, _, text = parts[0], parts[1], parts[2]
-            else:
-                text = line
-
-            # Match lifecycle hooks
-            for hook in LIFECYCLE_HOOKS:
-                if f"\"{hook}\"" in text or f"'{hook}'" in text:
-                    counts["total_hooks"] += 1
-                    hook_counts[hook] += 1
-                    if hook in OPTIONAL_HOOKS:
-                        counts["total_optional_hooks"] += 1
-                    break
-
-            if '"optionalDependencies"' in text:
-                counts["optionalDependencies"] += 1
-            if '"scripts"' in text:
-                counts["scripts_block"] += 1
-
-    # ------------------------------------
-    # 1) Counts file (for ML scoring)
-    # ------------------------------------
-    with open(out_counts, "w", encoding="utf-8") as out:
-        out.write(f"{FEATURE_ID}_total_hooks={counts['total_hooks']}\n")
-        out.write(f"{FEATURE_ID}_optional_hooks={counts['total_optional_hooks']}\n")
-        out.write(f"{FEATURE_ID}_optionalDependencies={counts['optionalDependencies']}\n")
-        out.write(f"{FEATURE_ID}_scripts_block={counts['scripts_block']}\n")
-        for hook in LIFECYCLE_HOOKS:
-            out.write(f"{FEATURE_ID}_hook_{hook}={hook_counts.get(hook, 0)}\n")
-
-    # ------------------------------------
-    # 2) Detailed summary file
-    # ------------------------------------
-    with open(out_details, "w", encoding="utf-8") as out:
-        out.write("===========================================\n")
-        out.write("   F1 – package.json Lifecycle Hooks\n")
-        out.write("===========================================\n\n")
-        out.write(f"Hits file:    {hits_file}\n")
-        out.write(f"package.json: {pkg_json_path}\n\n")
-        out.write("[Summary]\n")
-        out.write(f"F1_total_hooks={counts['total_hooks']}\n")
-        out.write(f"F1_optional_hooks={counts['total_optional_hooks']}\n")
-        out.write(f"F1_optionalDependencies={counts['optionalDependencies']}\n")
-        out.write(f"F1_scripts_block={counts['scripts_block']}\n\n")
-        out.write("F1_per_hook_counts:\n")
-        for hook in LIFECYCLE_HOOKS:
-            c = hook_counts[hook]
-            flag = " (optional)" if hook in OPTIONAL_HOOKS else ""
-            out.write(f"  - {hook:15s}: {c}{flag}\n")
-        out.write("\n[Details]\n")
-        out.write(f"target_label={label}\n")
-        out.write(f"arg1(hits_file)={hits_file}\n")
-        out.write(f"arg2(package.json)={pkg_json_path}\n")
-        out.write(f"arg3(analysis_root)={analysis_root}\n")
+    ctx = ProcessorContext(hits_file, pkg_json_path, analysis_root, label)
+    result = process(read_hits_file(hits_file), None, ctx)
+    write_result(result, out_counts, out_details)
 
     print(f"[+] {FEATURE_ID} counts written to {out_counts}")
     print(f"[+] {FEATURE_ID} details written to {out_details}")
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+processor_api.py
+
+Shared plumbing for the per-feature processors (process_a1.py .. process_f1.py).
+
+Every processor module exposes one in-process entry point:
+
+    process(hits, source_buffer, ctx) -> FeatureResult
+
+  hits          : iterable of raw hit lines, exactly as they would be read
+                  back from <FEATURE>_extraction_<label>.txt (text mode,
+                  universal newlines).
+  source_buffer : bytes of the scanned source file for processors that need
+                  it (A1/A2/A3), otherwise None.
+  ctx           : ProcessorContext with the hits/source paths (only used for
+                  the human-readable report) and the analysis root. For
+                  the A-series it may also carry the ParenIndex of
+                  source_buffer, shared by A1..A3 of the same file.
+                  With ctx.details False (summary-only scans) the
+                  processor skips building the report and returns
+                  scores with an empty detail.
+
+extract_features.py imports the processors and calls process() directly,
+so no interpreter is started per feature/file. The process_*.py command-line
+entry points are thin wrappers around the same function.
+"""
+import io
+from dataclasses import dataclass, field
+
+from paren_index import ParenIndex
+
+
+@dataclass
+class ProcessorContext:
+    hits_path: str
+    source_path: str | None
+    analysis_root: str
+    label: str
+    # Paren matches of source_buffer (built lazily, shared across A1..A3)
+    parens: ParenIndex | None = None
+    # Build the Details report (False in summary-only scans)
+    details: bool = True
+
+
+def paren_index(ctx: ProcessorContext, source_buffer) -> ParenIndex:
+    """The shared ParenIndex from ctx, or a new one for source_buffer."""
+    return ctx.parens if ctx.parens is not None else ParenIndex(source_buffer)
+
+
+@dataclass
+class FeatureResult:
+    feature: str
+    # metric -> value, in the order the score file lists them
+    scores: dict[str, int] = field(default_factory=dict)
+    # full text of the Details/<F>_detail_<label> report
+    detail: str = ""
+
+
+def split_hit_lines(content: str) -> list[str]:
+    """
+    Split in-memory hits into lines the same way reading the hits file back
+    in text mode would (\\r and \\r\\n become \\n).
+    """
+    return io.StringIO(content, newline=None).readlines()
+
+
+def read_hits_file(hits_path: str, errors: str = "ignore") -> list[str]:
+    """Read a hits file into a list of lines (keeps trailing newlines)."""
+    with open(hits_path, "r", encoding="utf-8", errors=errors) as f:
+        return f.readlines()
+
+
+def write_scores(scores: dict[str, int], counts_out: str):
+    """Write a score file (one key=value line per metric)."""
+    with open(counts_out, "w", encoding="utf-8") as out:
+        for key, val in scores.items():
+            out.write(f"{key}={val}\n")
+
+
+def write_result(result: FeatureResult, counts_out: str, detail_out: str):
+    """Write the score file and the detail report for one FeatureResult."""
+    write_scores(result.scores, counts_out)
+    with open(detail_out, "w", encoding="utf-8") as out:
+        out.write(result.detail)
+
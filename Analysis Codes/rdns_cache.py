@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+rdns_cache.py
+Usage:
+    python3 rdns_cache.py prefetch <cache_dir> <package_dir | package.tgz> [...]
+                          [--deadline SECONDS] [--threads N]
+
+Reverse-DNS lookups for the C1 processor, with a persistent cache.
+
+process_c1.py looks up the reverse DNS name of every IP it finds in a URL.
+Before this module, the cache was an in-memory dict in each process, so
+every worker resolved the same IPs again. socket.gethostbyaddr() can also
+block for seconds when a resolver times out.
+
+ReverseDNS keeps an optional on-disk cache: one SQLite database (WAL mode)
+under a cache directory, shared by every worker of a batch and kept
+between runs. Each entry expires after a TTL. Failed lookups are cached
+too, with a shorter TTL. In offline mode only the cache is consulted,
+and an IP that is not cached simply has no rDNS name. That makes a scan
+deterministic and fast on hosts without DNS.
+
+prefetch() resolves a run's IPs up front. It scans the packages for
+URLs whose host is an IP, then resolves all uncached IPs at once on a
+pool of threads. When the deadline passes, the IPs that are still
+pending are recorded as failed lookups. The command above does the same
+for a set of packages. Running it on a connected host and copying the
+cache directory prepares an offline scan.
+"""
+import argparse
+import ipaddress
+import os
+import queue
+import re
+import socket
+import sqlite3
+import threading
+import time
+
+DB_NAME = "rdns.sqlite"
+# Successful lookups are reused for a week, failures for a day
+DEFAULT_TTL = 7 * 24 * 3600
+NEGATIVE_TTL = 24 * 3600
+DEFAULT_DEADLINE = 60.0
+DEFAULT_THREADS = 32
+
+# Host part of http(s) URLs that may be IP literals (v4, or bracketed v6)
+_IP_URL_RE = re.compile(rb"https?://(\[[0-9A-Fa-f:.]+\]|[0-9.]+)", re.IGNORECASE)
+
+
+def resolve(ip_str: str):
+    """Live reverse DNS name of ip_str, or None."""
+    try:
+        return socket.gethostbyaddr(ip_str)[0].rstrip(".").lower()
+    except Exception:
+        return None
+
+
+def needs_rdns(ip_str: str) -> bool:
+    """True for IPs that C1 looks up (not loopback, not link-local/metadata)."""
+    try:
+        ip = ipaddress.ip_address(ip_str)
+    except ValueError:
+        return False
+    if ip.is_loopback or ip.is_link_local:
+        return False
+    return not (ip.version == 4 and ip_str.startswith("169.254."))
+
+
+def ips_in(data) -> set[str]:
+    """IP-literal URL hosts in a source buffer that C1 would look up."""
+    found = set()
+    if b"://" not in data:
+        return found
+    for m in _IP_URL_RE.finditer(data):
+        host = m.group(1).strip(b"[]").decode("ascii").lower()
+        if needs_rdns(host):
+            found.add(host)
+    return found
+
+
+class ReverseDNS:
+    """
+    Reverse DNS with an in-process memo and, with cache_dir, a shared
+    on-disk cache. offline=True never resolves live.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str | None = None,
+        offline: bool = False,
+        ttl: float = DEFAULT_TTL,
+        negative_ttl: float = NEGATIVE_TTL,
+    ):
+        self.cache_dir = cache_dir
+        self.offline = offline
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._memo: dict[str, str | None] = {}
+        self._db = None
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            self._db = sqlite3.connect(os.path.join(cache_dir, DB_NAME), timeout=60)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS entries (
+                    ip          TEXT PRIMARY KEY,
+                    name        TEXT,
+                    resolved_at REAL NOT NULL
+                )
+                """
+            )
+            self._db.commit()
+
+    def cached(self, ip_str: str):
+        """(True, name) if the disk cache holds a fresh entry, else (False, None)."""
+        if self._db is None:
+            return False, None
+        row = self._db.execute(
+            "SELECT name, resolved_at FROM entries WHERE ip = ?", (ip_str,)
+        ).fetchone()
+        if row is None:
+            return False, None
+        name, resolved_at = row
+        ttl = self.ttl if name is not None else self.negative_ttl
+        if not self.offline and time.time() - resolved_at > ttl:
+            # Offline scans use whatever is cached, however old
+            return False, None
+        return True, name
+
+    def store(self, results: dict[str, str | None]):
+        self._memo.update(results)
+        if self._db is None or not results:
+            return
+        now = time.time()
+        with self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?)",
+                [(ip, name, now) for ip, name in results.items()],
+            )
+
+    def lookup(self, ip_str: str):
+        """Reverse DNS hostname of ip_str or None."""
+        if ip_str in self._memo:
+            return self._memo[ip_str]
+        hit, name = self.cached(ip_str)
+        if hit:
+            self._memo[ip_str] = name
+            return name
+        if self.offline:
+            self._memo[ip_str] = None
+            return None
+        name = resolve(ip_str)
+        self.store({ip_str: name})
+        return name
+
+    def prefetch(
+        self,
+        ips,
+        deadline: float = DEFAULT_DEADLINE,
+        threads: int = DEFAULT_THREADS,
+    ) -> tuple[int, int, int]:
+        """
+        Resolve every uncached IP of ips concurrently, for at most deadline
+        seconds. Returns (cached, resolved, timed_out). IPs still pending
+        at the deadline are stored as failed lookups.
+        """
+        todo = [ip for ip in sorted(set(ips)) if not self.cached(ip)[0]]
+        n_cached = len(set(ips)) - len(todo)
+        if self.offline or not todo:
+            return n_cached, 0, 0
+
+        work: queue.Queue = queue.Queue()
+        for ip in todo:
+            work.put(ip)
+        results: dict[str, str | None] = {}
+        lock = threading.Lock()
+        done = threading.Event()
+
+        def worker():
+            while True:
+                try:
+                    ip = work.get_nowait()
+                except queue.Empty:
+                    return
+                name = resolve(ip)
+                with lock:
+                    results[ip] = name
+                    if len(results) == len(todo):
+                        done.set()
+
+        # Daemon threads: lookups stuck past the deadline must not keep
+        # the interpreter alive
+        for _ in range(min(threads, len(todo))):
+            threading.Thread(target=worker, daemon=True).start()
+        done.wait(deadline)
+
+        with lock:
+            finished = dict(results)
+        timed_out = {ip: None for ip in todo if ip not in finished}
+        # Drop the remaining queue so idle workers stop
+        while not work.empty():
+            try:
+                work.get_nowait()
+            except queue.Empty:
+                break
+        self.store(finished)
+        self.store(timed_out)
+        return n_cached, len(finished), len(timed_out)
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+def package_ips(path: str) -> set[str]:
+    """IPs that C1 would look up in one package (directory or tarball)."""
+    from extract_features import is_tarball_source, list_source_files
+    from tarball_source import TarballPackage, is_tarball
+
+    ips: set[str] = set()
+    if is_tarball(path):
+        for _, data in TarballPackage(path).members(is_tarball_source):
+            ips |= ips_in(data)
+        return ips
+    for src in list_source_files(path):
+        try:
+            with open(src, "rb") as f:
+                ips |= ips_in(f.read())
+        except OSError:
+            continue
+    return ips
+
+
+def prefetch_packages(
+    paths,
+    cache_dir: str,
+    deadline: float = DEFAULT_DEADLINE,
+    threads: int = DEFAULT_THREADS,
+) -> str:
+    """Collect the IPs of all packages and prefetch them. Returns a summary line."""
+    ips: set[str] = set()
+    for path in paths:
+        ips |= package_ips(path)
+    rdns = ReverseDNS(cache_dir)
+    try:
+        n_cached, n_resolved, n_timed_out = rdns.prefetch(ips, deadline, threads)
+    finally:
+        rdns.close()
+    return (
+        f"{len(ips)} IPs: {n_cached} cached, {n_resolved} resolved, "
+        f"{n_timed_out} timed out"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Pre-resolve the IPs found in packages into an rDNS cache."
+    )
+    parser.add_argument("command", choices=["prefetch"])
+    parser.add_argument("cache_dir", help="rDNS cache directory.")
+    parser.add_argument("paths", nargs="+", help="Package directories and/or tarballs.")
+    parser.add_argument("--deadline", type=float, default=DEFAULT_DEADLINE,
+                        help=f"Seconds to wait for lookups (default: {DEFAULT_DEADLINE:g}).")
+    parser.add_argument("--threads", type=int, default=DEFAULT_THREADS,
+                        help=f"Concurrent lookups (default: {DEFAULT_THREADS}).")
+    args = parser.parse_args()
+
+    summary = prefetch_packages(args.paths, args.cache_dir, args.deadline, args.threads)
+    print(f"[+] rDNS prefetch: {summary}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+result_cache.py
+
+Content-addressed cache of per-file feature scores, shared across packages
+and runs.
+
+The same file bytes (vendored lodash, polyfills, identical dist/ bundles)
+show up in thousands of packages. extract_features.py looks every file up
+by (sha256 of its bytes, ruleset version, scan mode). On a hit it stores
+the cached scores and skips scanning and processing entirely. Hits and
+Details reports are only produced on a miss.
+
+The ruleset version is a hash of the extractor and processor sources (and
+of domain_rules.json), so any change to a regex, a domain list or a
+processor invalidates old entries.
+
+Store: one SQLite database (WAL mode) under the cache directory. Workers
+of a parallel batch can safely share it. The cache is bounded by a size
+budget, and least-recently-used entries are evicted first. Hit/miss
+counters are kept per run id so a batch can report totals over all of
+its workers.
+"""
+import glob
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+DB_NAME = "file_results.sqlite"
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+# Eviction trims the cache to this fraction of the budget
+EVICT_TO_FRACTION = 0.9
+# Check the size budget every N inserts
+EVICT_CHECK_EVERY = 100
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+_ruleset_version = None
+
+
+def ruleset_version() -> str:
+    """Hash of every source file that influences per-file scores."""
+    global _ruleset_version
+    if _ruleset_version is None:
+        names = sorted(
+            [
+                "domain_rules.json",
+                "domain_rules.py",
+                "extract_features.py",
+                "feature_scanner.py",
+                "paren_index.py",
+                "processor_api.py",
+                "segmentation.py",
+                "source_index.py",
+            ]
+            + [os.path.basename(p) for p in glob.glob(os.path.join(_HERE, "process_*.py"))]
+        )
+        h = hashlib.sha256()
+        for name in names:
+            h.update(name.encode())
+            with open(os.path.join(_HERE, name), "rb") as f:
+                h.update(f.read())
+        _ruleset_version = h.hexdigest()[:16]
+    return _ruleset_version
+
+
+def content_key(data, mode: str = "text", digest: str | None = None) -> str:
+    """
+    Cache key for a file's bytes (bytes or mmap) under a scan mode. Pass
+    digest (their sha256 hex digest) if it is already known.
+    """
+    return f"{digest or hashlib.sha256(data).hexdigest()}:{ruleset_version()}:{mode}"
+
+
+class FileResultCache:
+    def __init__(self, cache_dir: str, run_id: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, DB_NAME)
+        self.run_id = run_id
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._flushed = (0, 0)
+        self._puts = 0
+        self._db = sqlite3.connect(self.path, timeout=60)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                key       TEXT PRIMARY KEY,
+                scores    TEXT NOT NULL,
+                size      INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS entries_last_used ON entries(last_used);
+            CREATE TABLE IF NOT EXISTS run_stats (
+                run_id TEXT PRIMARY KEY,
+                hits   INTEGER NOT NULL,
+                misses INTEGER NOT NULL
+            );
+            """
+        )
+        self._db.commit()
+
+    def get(self, key: str):
+        """feature -> {metric: value} for key, or None (counted as a miss)."""
+        row = self._db.execute(
+            "SELECT scores FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        with self._db:
+            self._db.execute(
+                "UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key)
+            )
+        return json.loads(row[0])
+
+    def put(self, key: str, scores: dict[str, dict[str, int]]):
+        payload = json.dumps(scores)
+        with self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (key, scores, size, last_used) "
+                "VALUES (?, ?, ?, ?)",
+                (key, payload, len(key) + len(payload), time.time()),
+            )
+        self._puts += 1
+        if self._puts % EVICT_CHECK_EVERY == 0:
+            self.evict()
+
+    def evict(self):
+        """Drop least-recently-used entries while over the size budget."""
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        target = total - int(self.max_bytes * EVICT_TO_FRACTION)
+        freed = 0
+        doomed = []
+        for key, size in self._db.execute(
+            "SELECT key, size FROM entries ORDER BY last_used"
+        ):
+            doomed.append((key,))
+            freed += size
+            if freed >= target:
+                break
+        with self._db:
+            self._db.executemany("DELETE FROM entries WHERE key = ?", doomed)
+
+    def flush_stats(self):
+        """Add this process's hits/misses since the last flush to run_stats."""
+        d_hits = self.hits - self._flushed[0]
+        d_misses = self.misses - self._flushed[1]
+        if not d_hits and not d_misses:
+            return
+        with self._db:
+            self._db.execute(
+                "INSERT INTO run_stats (run_id, hits, misses) VALUES (?, ?, ?) "
+                "ON CONFLICT(run_id) DO UPDATE SET "
+                "hits = hits + excluded.hits, misses = misses + excluded.misses",
+                (self.run_id, d_hits, d_misses),
+            )
+        self._flushed = (self.hits, self.misses)
+
+    def run_stats(self) -> tuple[int, int]:
+        """(hits, misses) recorded for this run id by all processes."""
+        row = self._db.execute(
+            "SELECT hits, misses FROM run_stats WHERE run_id = ?", (self.run_id,)
+        ).fetchone()
+        return (row[0], row[1]) if row else (0, 0)
+
+    def close(self):
+        self.flush_stats()
+        self.evict()
+        self._db.close()
+
+
+def new_run_id() -> str:
+    return f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}"
+
+
+def format_stats(hits: int, misses: int) -> str:
+    total = hits + misses
+    rate = 100.0 * hits / total if total else 0.0
+    return f"{hits} hits, {misses} misses ({rate:.1f}% hit rate)"
+
+
+# One cache connection per process and directory
+_open_caches: dict[tuple[str, str], FileResultCache] = {}
+
+
+def get_cache(cache_dir: str, run_id: str) -> FileResultCache:
+    """Per-process shared FileResultCache for cache_dir/run_id."""
+    k = (os.path.abspath(cache_dir), run_id)
+    if k not in _open_caches:
+        _open_caches[k] = FileResultCache(cache_dir, run_id)
+    return _open_caches[k]
@@ -0,0 +1,459 @@
+#!/usr/bin/env python3
+"""
+result_store.py
+Usage:
+    python3 result_store.py export <Analysis/PackageName> [...]
+
+Per-package structured store of extraction results.
+
+A scanned JS file used to leave 12 hit files under static_features/, and
+one Scores/ plus one Details/ file per processor. A single package could
+produce tens of thousands of tiny files, and compile_scores.py had to walk
+and re-parse all of them. extract_features.py now writes everything for a
+package into one SQLite database instead:
+
+    Analysis/<PackageName>/results.sqlite
+      files   (file, path, features, cached)
+                                         every scanned file, its package path,
+                                         the features scored for it and whether
+                                         its scores came from the result cache
+      metrics (feature, metric)          every metric name a feature reported
+      hits    (feature, file, content)   hit lines, as in <F>_extraction_<file>.txt
+      scores  (feature, file, metrics)   JSON {metric: value}, in score-file order
+      details (feature, file, content)   the Details/ report text
+      manifest (path, size, sha256, status)
+                                         every file of the package source: its
+                                         size, the content hash of scanned files
+                                         and whether it was scanned, skipped or
+                                         unreadable
+      options (key, value)               JSON scan options (sparse, mmap,
+                                         offline, rdns_cache) for explain.py's
+                                         rescans
+
+<file> is the package-relative path with "/" replaced by "--" (the label
+used in the text file names). Each table is keyed on (feature, file) and
+indexed on file. Workers scanning chunks of the same package can share
+the database (WAL mode).
+
+The manifest is filled by the extractor's own walk of the package (or
+pass over the tarball), so compile_scores.py takes PACKAGE_SIZE_BYTES and
+per-file sizes from it instead of walking the package source again.
+
+Summary-only scans (extract_features.py --summary-only) store no details.
+explain.py fills them in later, for the packages someone will read,
+through DetailOutputs: it stores the details and nothing else, so the
+scan's hits, scores and manifest stay as they were.
+
+Sparse scans (--sparse) only materialise non-zero features: empty hit
+lists and all-zero scores (with their details) are not stored or written.
+The files and metrics tables still record every scanned file, what was
+scored for it and the metric names. Readers (compile_scores.py) use them
+to fill in the missing scores as zeros.
+
+The classic text files are an optional export. Write them while scanning
+with extract_features.py --text-outputs, or afterwards with the export
+command above. The export writes the same names and contents the
+extractor would have written.
+"""
+import json
+import os
+import sqlite3
+import sys
+
+from processor_api import write_result, write_scores
+
+STORE_NAME = "results.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    file     TEXT PRIMARY KEY,
+    path     TEXT NOT NULL,
+    features TEXT NOT NULL,
+    cached   INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS metrics (
+    feature TEXT NOT NULL,
+    metric  TEXT NOT NULL,
+    PRIMARY KEY (feature, metric)
+);
+CREATE TABLE IF NOT EXISTS hits (
+    feature TEXT NOT NULL,
+    file    TEXT NOT NULL,
+    content TEXT NOT NULL,
+    PRIMARY KEY (feature, file)
+);
+CREATE TABLE IF NOT EXISTS scores (
+    feature TEXT NOT NULL,
+    file    TEXT NOT NULL,
+    metrics TEXT NOT NULL,
+    PRIMARY KEY (feature, file)
+);
+CREATE TABLE IF NOT EXISTS details (
+    feature TEXT NOT NULL,
+    file    TEXT NOT NULL,
+    content TEXT NOT NULL,
+    PRIMARY KEY (feature, file)
+);
+CREATE TABLE IF NOT EXISTS manifest (
+    path   TEXT PRIMARY KEY,
+    size   INTEGER NOT NULL,
+    sha256 TEXT,
+    status TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS options (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS hits_file ON hits(file);
+CREATE INDEX IF NOT EXISTS scores_file ON scores(file);
+CREATE INDEX IF NOT EXISTS details_file ON details(file);
+"""
+
+
+# ---------------------------------------------------------------------------
+# Text file names (the classic layout under Analysis/<PackageName>/)
+# ---------------------------------------------------------------------------
+
+def hits_name(feature: str, file: str) -> str:
+    return f"{feature}_extraction_{file}.txt"
+
+
+def score_name(feature: str, file: str) -> str:
+    return f"{feature}_score_extraction_{file}.txt"
+
+
+def detail_name(feature: str, file: str) -> str:
+    return f"{feature}_detail_extraction_{file}.txt"
+
+
+def store_path(analysis_root: str) -> str:
+    return os.path.join(analysis_root, STORE_NAME)
+
+
+def has_store(analysis_root: str) -> bool:
+    return os.path.isfile(store_path(analysis_root))
+
+
+class PackageStore:
+    def __init__(self, analysis_root: str):
+        os.makedirs(analysis_root, exist_ok=True)
+        self.analysis_root = analysis_root
+        self._db = sqlite3.connect(store_path(analysis_root), timeout=60)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        # Stores written before files.cached existed
+        if "cached" not in {r[1] for r in self._db.execute("PRAGMA table_info(files)")}:
+            self._db.execute("ALTER TABLE files ADD COLUMN cached INTEGER NOT NULL DEFAULT 0")
+        self._db.commit()
+
+    # --- writing (committed by commit(), once per scanned file) ---
+
+    def put_file(self, file: str, path: str, features=(), cached: bool = False):
+        self._db.execute(
+            "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)",
+            (file, path, ",".join(features), 1 if cached else 0),
+        )
+
+    def put_metric_names(self, feature: str, names):
+        self._db.executemany(
+            "INSERT OR IGNORE INTO metrics VALUES (?, ?)", [(feature, n) for n in names]
+        )
+
+    def put_hits(self, feature: str, file: str, content: str):
+        self._db.execute(
+            "INSERT OR REPLACE INTO hits VALUES (?, ?, ?)", (feature, file, content)
+        )
+
+    def put_scores(self, feature: str, file: str, metrics: dict[str, int]):
+        self._db.execute(
+            "INSERT OR REPLACE INTO scores VALUES (?, ?, ?)",
+            (feature, file, json.dumps(metrics)),
+        )
+
+    def put_detail(self, feature: str, file: str, content: str):
+        self._db.execute(
+            "INSERT OR REPLACE INTO details VALUES (?, ?, ?)", (feature, file, content)
+        )
+
+    def put_manifest(self, entries):
+        """
+        Record the package's files [(path, size, status)] from the
+        extractor's walk; a scanned file's hash and status are kept.
+        """
+        self._db.executemany(
+            "INSERT INTO manifest (path, size, status) VALUES (?, ?, ?) "
+            "ON CONFLICT(path) DO UPDATE SET size = excluded.size",
+            entries,
+        )
+
+    def put_manifest_file(self, path: str, size: int, sha256: str | None, status: str):
+        """Record how one file was scanned (whichever of this and the walk comes first)."""
+        self._db.execute(
+            "INSERT INTO manifest (path, size, sha256, status) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(path) DO UPDATE SET sha256 = excluded.sha256, status = excluded.status",
+            (path, size, sha256, status),
+        )
+
+    def put_options(self, options: dict):
+        self._db.executemany(
+            "INSERT OR REPLACE INTO options VALUES (?, ?)",
+            [(k, json.dumps(v)) for k, v in options.items()],
+        )
+
+    def commit(self):
+        self._db.commit()
+
+    def close(self):
+        self._db.commit()
+        self._db.close()
+
+    # --- reading ---
+
+    def options(self) -> dict:
+        """The scan options put_options() recorded (empty for older stores)."""
+        return {k: json.loads(v) for k, v in self._db.execute("SELECT key, value FROM options")}
+
+    def manifest_sizes(self) -> dict[str, int]:
+        """path -> size of every file in the manifest (empty for older stores)."""
+        return dict(self._db.execute("SELECT path, size FROM manifest"))
+
+    def iter_files(self):
+        """Yield (file, path, [feature, ...]) of every scanned file, ordered by file."""
+        for file, path, features in self._db.execute(
+            "SELECT file, path, features FROM files ORDER BY file"
+        ):
+            yield file, path, features.split(",") if features else []
+
+    def cached_files(self) -> set[str]:
+        """Files whose scores came from the result cache (no hits or details stored)."""
+        return {r[0] for r in self._db.execute("SELECT file FROM files WHERE cached = 1")}
+
+    def metric_names(self) -> dict[str, list[str]]:
+        """feature -> metric names it reported, in first-seen order."""
+        names: dict[str, list[str]] = {}
+        for feature, metric in self._db.execute(
+            "SELECT feature, metric FROM metrics ORDER BY rowid"
+        ):
+            names.setdefault(feature, []).append(metric)
+        return names
+
+    def hits_for(self, file: str) -> dict[str, str]:
+        """feature -> stored hit lines of one file (empty for file-cache hits)."""
+        return dict(
+            self._db.execute("SELECT feature, content FROM hits WHERE file = ?", (file,))
+        )
+
+    def iter_scores(self):
+        """Yield (feature, file, {metric: value}) ordered by (feature, file)."""
+        for feature, file, metrics in self._db.execute(
+            "SELECT feature, file, metrics FROM scores ORDER BY feature, file"
+        ):
+            yield feature, file, json.loads(metrics)
+
+    def iter_hits(self):
+        yield from self._db.execute(
+            "SELECT feature, file, content FROM hits ORDER BY feature, file"
+        )
+
+    def details_for(self, file: str) -> dict[str, str]:
+        """feature -> stored detail report of one file."""
+        return dict(
+            self._db.execute("SELECT feature, content FROM details WHERE file = ?", (file,))
+        )
+
+    def iter_details(self):
+        yield from self._db.execute(
+            "SELECT feature, file, content FROM details ORDER BY feature, file"
+        )
+
+    def export_text(self):
+        """
+        Write static_features/, Scores/ and Details/ text files for
+        everything in the store. Returns the number of files written.
+        """
+        written = 0
+        layout = (
+            ("static_features", hits_name, self.iter_hits()),
+            ("Details", detail_name, self.iter_details()),
+        )
+        for subdir, name, rows in layout:
+            out_dir = os.path.join(self.analysis_root, subdir)
+            os.makedirs(out_dir, exist_ok=True)
+            for feature, file, content in rows:
+                with open(os.path.join(out_dir, name(feature, file)), "w", encoding="utf-8") as f:
+                    f.write(content)
+                written += 1
+
+        scores_dir = os.path.join(self.analysis_root, "Scores")
+        os.makedirs(scores_dir, exist_ok=True)
+        for feature, file, metrics in self.iter_scores():
+            write_scores(metrics, os.path.join(scores_dir, score_name(feature, file)))
+            written += 1
+        return written
+
+
+class PackageOutputs:
+    """
+    Where the extractor sends one package's results: its PackageStore and,
+    with text=True, also the classic text files. With details=False
+    (summary-only scans) no Details reports are built or written. With
+    sparse=True empty hits and all-zero scores are dropped.
+
+    With write_root, everything is written there instead (a staging
+    directory that the caller renames to analysis_root once the package
+    is complete); reported paths still name analysis_root.
+    """
+
+    def __init__(
+        self,
+        analysis_root: str,
+        text: bool = False,
+        details: bool = True,
+        sparse: bool = False,
+        write_root: str | None = None,
+    ):
+        self.analysis_root = analysis_root
+        self.write_root = write_root or analysis_root
+        self.static_dir = os.path.join(analysis_root, "static_features")
+        self.store = PackageStore(self.write_root)
+        self.text = text
+        self.details = details
+        self.sparse = sparse
+        self._made_dirs: set[str] = set()
+        self._known_metrics: set[tuple[str, str]] = set()
+
+    def _text_dir(self, subdir: str) -> str:
+        path = os.path.join(self.write_root, subdir)
+        if path not in self._made_dirs:
+            os.makedirs(path, exist_ok=True)
+            self._made_dirs.add(path)
+        return path
+
+    def hits_path(self, feature: str, file: str) -> str:
+        """Path of the hits text file (reported by processors even when not written)."""
+        return os.path.join(self.static_dir, hits_name(feature, file))
+
+    def put_file(self, file: str, path: str, features=(), cached: bool = False):
+        """Record a scanned file, the features scored for it and whether they were cached."""
+        self.store.put_file(file, path, features, cached)
+
+    def put_manifest(self, entries):
+        self.store.put_manifest(entries)
+
+    def put_manifest_file(self, path: str, size: int, sha256: str | None, status: str):
+        self.store.put_manifest_file(path, size, sha256, status)
+
+    def put_options(self, options: dict):
+        self.store.put_options(options)
+
+    def _skip_scores(self, feature: str, metrics: dict[str, int]) -> bool:
+        """Record the metric names; True if sparse and every value is zero."""
+        new = [k for k in metrics if (feature, k) not in self._known_metrics]
+        if new:
+            self.store.put_metric_names(feature, new)
+            self._known_metrics.update((feature, k) for k in new)
+        return self.sparse and not any(metrics.values())
+
+    def put_hits(self, feature: str, file: str, content: str):
+        if self.sparse and not content:
+            return
+        self.store.put_hits(feature, file, content)
+        if self.text:
+            path = os.path.join(self._text_dir("static_features"), hits_name(feature, file))
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(content)
+
+    def put_result(self, feature: str, file: str, result):
+        """Store a FeatureResult (scores and, unless summary-only, its detail report)."""
+        if not self.details:
+            self.put_scores(feature, file, result.scores)
+            return
+        if self._skip_scores(feature, result.scores):
+            return
+        self.store.put_scores(feature, file, result.scores)
+        self.store.put_detail(feature, file, result.detail)
+        if self.text:
+            write_result(
+                result,
+                os.path.join(self._text_dir("Scores"), score_name(feature, file)),
+                os.path.join(self._text_dir("Details"), detail_name(feature, file)),
+            )
+
+    def put_detail(self, feature: str, file: str, detail: str):
+        """Store a detail report on its own (explain.py); always written as text too."""
+        self.store.put_detail(feature, file, detail)
+        path = os.path.join(self._text_dir("Details"), detail_name(feature, file))
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(detail)
+
+    def put_scores(self, feature: str, file: str, metrics: dict[str, int]):
+        """Store scores only (file-cache hits have no hits or details)."""
+        if self._skip_scores(feature, metrics):
+            return
+        self.store.put_scores(feature, file, metrics)
+        if self.text:
+            write_scores(metrics, os.path.join(self._text_dir("Scores"), score_name(feature, file)))
+
+    def commit(self):
+        self.store.commit()
+
+    def close(self):
+        self.store.close()
+
+
+class DetailOutputs(PackageOutputs):
+    """
+    Outputs of explain.py's rescans: only the detail reports are stored
+    (and written as text). The scan's files, hits, scores and manifest are
+    left untouched. With sparse, the details of all-zero scores are
+    dropped as the scan dropped them.
+    """
+
+    def __init__(self, analysis_root: str, sparse: bool = False):
+        super().__init__(analysis_root, details=True, sparse=sparse)
+
+    def put_file(self, file: str, path: str, features=(), cached: bool = False):
+        pass
+
+    def put_manifest(self, entries):
+        pass
+
+    def put_manifest_file(self, path: str, size: int, sha256: str | None, status: str):
+        pass
+
+    def put_options(self, options: dict):
+        pass
+
+    def put_hits(self, feature: str, file: str, content: str):
+        pass
+
+    def put_scores(self, feature: str, file: str, metrics: dict[str, int]):
+        pass
+
+    def put_result(self, feature: str, file: str, result):
+        if self.sparse and not any(result.scores.values()):
+            return
+        self.put_detail(feature, file, result.detail)
+
+
+def main():
+    if len(sys.argv) < 3 or sys.argv[1] != "export":
+        print("Usage: python3 result_store.py export <Analysis/PackageName> [...]", file=sys.stderr)
+        sys.exit(1)
+
+    status = 0
+    for analysis_root in sys.argv[2:]:
+        if not has_store(analysis_root):
+            print(f"[!] No {STORE_NAME} in {analysis_root}", file=sys.stderr)
+            status = 1
+            continue
+        store = PackageStore(analysis_root)
+        n = store.export_text()
+        store.close()
+        print(f"[+] Exported {n} text files to {analysis_root}")
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+scoring_engine.py
+Usage:
+    python3 scoring_engine.py <analysis_root> [--scores TSV] [--model-dir DIR] [--top-k K]
+
+Step 3 of the batch in one process: from the consolidated score
+table (Consolidated_Package_Scores.tsv) to
+
+    ml_features.csv             generate_package_features.py (--fill-missing)
+    batch_analysis_result.csv   generate_scan_results.py + merge_preinstall_risk.py
+    contributing_features.csv   analyse_contributing_feature.py
+
+The engine calls the scripts' own functions, so the tables are the ones
+the scripts write, but the model is loaded once and each table is
+handed to the next step in memory instead of being written and read
+back as CSV. The scripts keep their command lines.
+
+batch_analysis_final.py runs the engine over the changed rows of the
+score table only (see pipeline_state.py). The command above scores a
+whole Analysis/ folder and writes the three CSVs into it.
+"""
+import argparse
+import os
+import sys
+from dataclasses import dataclass
+
+import pandas as pd
+
+import analyse_contributing_feature as contrib
+import generate_package_features as features
+import generate_scan_results as scan
+import merge_preinstall_risk as preinstall
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_MODEL_DIR = os.path.join(_HERE, "classification_configuration")
+
+# The scripts behind the engine's tables (their code is part of every
+# table's fingerprint)
+SCRIPTS = [
+    os.path.join(_HERE, name)
+    for name in (
+        "scoring_engine.py",
+        "generate_package_features.py",
+        "generate_scan_results.py",
+        "merge_preinstall_risk.py",
+        "analyse_contributing_feature.py",
+    )
+]
+
+FEATURES_CSV = "ml_features.csv"
+RESULTS_CSV = "batch_analysis_result.csv"
+CONTRIB_CSV = "contributing_features.csv"
+
+
+@dataclass
+class ScoringResult:
+    features: pd.DataFrame       # ml_features.csv
+    results: pd.DataFrame        # batch_analysis_result.csv (incl. RISK_BANDS)
+    contributions: pd.DataFrame  # contributing_features.csv
+
+
+class ScoringEngine:
+    def __init__(self, model_dir: str = DEFAULT_MODEL_DIR, top_k: int = 10):
+        self.model_dir = model_dir
+        self.top_k = top_k
+        self.model = scan.load_model(model_dir)
+        w, _, X_mean, X_std, _, _ = self.model
+        # analyse_contributing_feature.py works on the flattened mean / std
+        self.mean = X_mean.reshape(-1)
+        self.std = X_std.reshape(-1)
+        self.w = w
+
+    def score(self, df_scores: pd.DataFrame, fill_missing: bool = True) -> ScoringResult:
+        """Features, risk levels and contributions of a consolidated score table."""
+        df_feat = features.build_features(df_scores.copy(), fill_missing=fill_missing)
+
+        _, _, _, _, low_thr, high_thr = self.model
+        pkg_names, _, prob5, risks = scan.score_features(df_feat, self.model)
+        results = scan.result_table(pkg_names, risks, prob5, low_thr, high_thr)
+
+        try:
+            pre_map = preinstall.preinstall_map(df_scores)
+            print(f"[+] Found {len(pre_map)} packages with F1_hook_preinstall == 1")
+            results = preinstall.apply_preinstall(results, pre_map)
+        except KeyError as e:
+            print(f"[!] Skipping preinstall risk: {e}")
+
+        indexed = df_feat.set_index("PACKAGE_NAME")
+        w_lin, w_quad = contrib.split_weights(self.w, len(indexed.columns))
+        out = contrib.contributions(
+            contrib.prepare_results(results.copy()),
+            indexed, w_lin, w_quad, self.mean, self.std, self.top_k,
+        )
+        return ScoringResult(df_feat, results, out)
+
+
+def read_scores(path: str) -> pd.DataFrame:
+    """A consolidated score table, as generate_package_features.py reads it."""
+    return pd.read_csv(path, sep="\t")
+
+
+def write(result: ScoringResult, analysis_root: str):
+    """Write the three tables of result into analysis_root."""
+    result.features.to_csv(os.path.join(analysis_root, FEATURES_CSV), index=False)
+    result.results.to_csv(os.path.join(analysis_root, RESULTS_CSV), index=False)
+    result.contributions.to_csv(os.path.join(analysis_root, CONTRIB_CSV), index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Features, classification, preinstall risk and feature "
+                    "contributions of a consolidated score table, in one process."
+    )
+    parser.add_argument("analysis_root", help="Analysis/ folder to write the CSVs into.")
+    parser.add_argument("--scores", default=None,
+                        help="Consolidated score TSV "
+                             "(default: <analysis_root>/Consolidated_Package_Scores.tsv).")
+    parser.add_argument("--model-dir", default=DEFAULT_MODEL_DIR,
+                        help="Folder with the model parameters and thresholds.")
+    parser.add_argument("--top-k", type=int, default=10,
+                        help="Number of top features per package (default: 10).")
+    args = parser.parse_args()
+
+    scores = args.scores or os.path.join(args.analysis_root, "Consolidated_Package_Scores.tsv")
+    if not os.path.isfile(scores):
+        print(f"[!] Score table not found: {scores}")
+        sys.exit(1)
+
+    print(f"[+] Loading model from: {args.model_dir}")
+    engine = ScoringEngine(args.model_dir, args.top_k)
+    print(f"[+] Loading TSV: {scores}")
+    result = engine.score(read_scores(scores))
+    write(result, args.analysis_root)
+    print(f"[+] Wrote {FEATURES_CSV}, {RESULTS_CSV} and {CONTRIB_CSV} to: {args.analysis_root}")
+
+
+if __name__ == "__main__":
+    main()
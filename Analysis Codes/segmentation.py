@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+segmentation.py
+
+In-memory segmentation of minified JS for extract_features.py.
+
+A file counts as minified when it has at most 10 lines and some line is
+longer than 5000 characters. Minified files are split into pseudo-lines
+the way the original sed pipeline did:
+
+    ;  {  }     -> newline inserted after
+    var  const  -> newline inserted before
+    let         -> two newlines inserted before (the sed step ran twice)
+
+All of this happens in one regex pass. The result is a SegmentedSource:
+the segmented buffer plus a map from segmented positions and pseudo-lines
+back to the original buffer. Hits keep their pseudo-line numbers, while
+byte offsets and A1..A3 context point into the original file. Writing the
+segmented copy to disk is left to the caller, for human review only.
+
+Works on str (text mode) and on bytes-like buffers (--mmap).
+"""
+import re
+from bisect import bisect_right
+
+from source_index import SourceIndex
+
+SEGMENT_RE = re.compile(r"[;{}]|\b(?:var|let|const)\b")
+SEGMENT_BYTES_RE = re.compile(SEGMENT_RE.pattern.encode())
+
+MAX_MINIFIED_LINES = 10
+MIN_MINIFIED_LINE_CHARS = 5000
+
+
+def iter_lines(buf, nl):
+    """Yield (start, stop) of each line, stop including the newline."""
+    n = len(buf)
+    start = 0
+    while start < n:
+        end = buf.find(nl, start)
+        stop = n if end == -1 else end + 1
+        yield start, stop
+        start = stop
+
+
+def looks_minified(buf) -> bool:
+    """
+    <= 10 lines and at least one line longer than 5000 characters, counting
+    lines and lengths as readlines() in text mode would (newline included).
+    """
+    is_text = isinstance(buf, str)
+    spans = []
+    for span in iter_lines(buf, "\n" if is_text else b"\n"):
+        spans.append(span)
+        if len(spans) > MAX_MINIFIED_LINES:
+            return False
+
+    for start, stop in spans:
+        if stop - start <= MIN_MINIFIED_LINE_CHARS:
+            continue
+        if is_text:
+            return True
+        # Byte length is only an upper bound; count characters like text mode.
+        line = buf[start:stop]
+        if line.endswith(b"\r\n"):
+            line = line[:-2] + b"\n"
+        if len(line.decode("utf-8", errors="ignore")) > MIN_MINIFIED_LINE_CHARS:
+            return True
+    return False
+
+
+class SegmentedSource:
+    """Segmented copy of a buffer plus the map back to the original."""
+
+    def __init__(self, text, cuts: list[int], shifts: list[int]):
+        # Segmented buffer (str or bytes) and its line index
+        self.text = text
+        self.index = SourceIndex(text)
+        # cuts[i]   : original position where insertion i happened
+        # shifts[i] : newlines inserted up to and including insertion i
+        self._cuts = cuts
+        self._shifts = shifts
+        # Segmented position just after insertion i
+        self._seg_ends = [c + s for c, s in zip(cuts, shifts)]
+
+    def to_original(self, pos: int) -> int:
+        """Map a position in the segmented buffer to the original buffer."""
+        i = bisect_right(self._seg_ends, pos) - 1
+        orig = pos - (self._shifts[i] if i >= 0 else 0)
+        # Positions inside an inserted run map to its cut point
+        if i + 1 < len(self._cuts) and orig > self._cuts[i + 1]:
+            orig = self._cuts[i + 1]
+        return orig
+
+    def line_range(self, pseudo_line: int) -> tuple[int, int]:
+        """Original [start, end) covered by a 1-based pseudo-line."""
+        start, end = self.index.line_bounds(pseudo_line)
+        return self.to_original(start), self.to_original(end)
+
+
+def segment(buf) -> SegmentedSource:
+    """Segment buf (str or bytes-like) in a single pass."""
+    if isinstance(buf, str):
+        seg_re, nl, empty, after, let = SEGMENT_RE, "\n", "", ";{}", "let"
+    else:
+        seg_re, nl, empty, after, let = SEGMENT_BYTES_RE, b"\n", b"", b";{}", b"let"
+
+    parts = []
+    cuts: list[int] = []
+    shifts: list[int] = []
+    last = 0
+    inserted = 0
+    for m in seg_re.finditer(buf):
+        token = m.group(0)
+        if token in after:
+            cut, k = m.end(), 1
+        else:
+            cut, k = m.start(), (2 if token == let else 1)
+        parts.append(buf[last:cut])
+        parts.append(nl * k)
+        last = cut
+        inserted += k
+        cuts.append(cut)
+        shifts.append(inserted)
+    parts.append(buf[last:])
+    return SegmentedSource(empty.join(parts), cuts, shifts)
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+source_index.py
+
+Position lookups for one scanned buffer, built once per file.
+
+The extractor reports every hit as line:byteoffset:match. Computing these
+with text.count("\\n", 0, pos) and len(text[:pos].encode()) costs
+O(file size) per hit, so bundles with tens of thousands of hits take
+quadratic time. SourceIndex does one linear pass up front. After that,
+each lookup costs:
+
+  line_of(pos)     -> 1-based line number     bisect over newline offsets
+  byte_offset(pos) -> UTF-8 byte offset       per-block byte checkpoints
+  line_spans()     -> (line, start, end) of every line
+  line_bounds(n)   -> (start, end) of line n
+
+The buffer may be str (character positions) or bytes-like (positions are
+already byte offsets, so byte_offset() is the identity).
+"""
+import re
+from bisect import bisect_left
+
+# Characters per checkpoint for the char -> byte map. A lookup encodes at
+# most this many characters.
+BLOCK_CHARS = 4096
+
+_NEWLINE_STR_RE = re.compile("\n")
+_NEWLINE_BYTES_RE = re.compile(b"\n")
+
+
+class SourceIndex:
+    def __init__(self, buf):
+        is_text = isinstance(buf, str)
+        newline_re = _NEWLINE_STR_RE if is_text else _NEWLINE_BYTES_RE
+        self._buf = buf
+        # Offsets of every '\n', ascending
+        self._newlines = [m.start() for m in newline_re.finditer(buf)]
+        # block_bytes[k] = byte offset of character k * BLOCK_CHARS.
+        # None when positions already are byte offsets (bytes, ASCII text).
+        self._block_bytes = None
+        if is_text and not buf.isascii():
+            block_bytes = [0]
+            total = 0
+            for start in range(0, len(buf), BLOCK_CHARS):
+                total += len(buf[start:start + BLOCK_CHARS].encode("utf-8"))
+                block_bytes.append(total)
+            self._block_bytes = block_bytes
+
+    def line_of(self, pos: int) -> int:
+        """1-based line number of position pos (same as count('\\n') + 1)."""
+        return bisect_left(self._newlines, pos) + 1
+
+    def byte_offset(self, pos: int) -> int:
+        """UTF-8 byte offset of position pos."""
+        if self._block_bytes is None:
+            return pos
+        block = pos // BLOCK_CHARS
+        start = block * BLOCK_CHARS
+        return self._block_bytes[block] + len(self._buf[start:pos].encode("utf-8"))
+
+    def line_bounds(self, line: int) -> tuple[int, int]:
+        """(start, end) of a 1-based line, end excluding '\\n'."""
+        start = self._newlines[line - 2] + 1 if line > 1 else 0
+        end = self._newlines[line - 1] if line - 1 < len(self._newlines) else len(self._buf)
+        return start, end
+
+    def line_spans(self):
+        """Yield (1-based line, start, end) for each line, end excluding '\\n'."""
+        start = 0
+        for i, nl in enumerate(self._newlines):
+            yield i + 1, start, nl
+            start = nl + 1
+        if start < len(self._buf):
+            yield len(self._newlines) + 1, start, len(self._buf)
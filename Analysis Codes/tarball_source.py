@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+tarball_source.py
+
+Read npm package tarballs (.tgz) in place, without extracting them.
+
+extract_tgz.py unpacks every tarball into extracted/<name>/ so that
+extract_features.py can walk the tree, which writes and then reads back
+every file of every package. TarballPackage streams the archive once
+with tarfile's "r|gz" mode instead. The members the caller asks for are
+handed over as bytes, and all other members are skipped.
+
+Member paths are the paths the file would have under extracted/<name>/
+(e.g. "package/lib/index.js"), so labels and Analysis/ outputs match those
+of an extracted package. <name> is the tarball name without its extension,
+as in extract_tgz.py.
+
+PACKAGE_SIZE_BYTES is the sum of the sizes in the regular-file member
+headers. That is what compute_package_size_bytes() would count on the
+extracted directory.
+"""
+import os
+import posixpath
+import tarfile
+
+TARBALL_EXTS = (".tgz", ".tar.gz")
+
+
+def is_tarball(path: str) -> bool:
+    return path.lower().endswith(TARBALL_EXTS) and os.path.isfile(path)
+
+
+def tarball_package_name(path: str) -> str:
+    """'.../foo-1.0.0.tgz' -> 'foo-1.0.0' (the extract_tgz.py directory name)."""
+    name = os.path.basename(path)
+    for ext in TARBALL_EXTS:
+        if name.lower().endswith(ext):
+            return name[: -len(ext)]
+    return name
+
+
+def find_tarball(root: str, pkg_name: str) -> str | None:
+    """<root>/<pkg_name>.tgz (or .tar.gz) if it exists."""
+    for ext in TARBALL_EXTS:
+        cand = os.path.join(root, pkg_name + ext)
+        if os.path.isfile(cand):
+            return cand
+    return None
+
+
+def member_path(name: str) -> str | None:
+    """Normalised relative path of a member, or None if it escapes the package."""
+    rel = posixpath.normpath(name.lstrip("/"))
+    if rel in (".", "") or rel == ".." or rel.startswith("../"):
+        return None
+    return rel
+
+
+class TarballPackage:
+    """One streamed pass over a package tarball."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.name = tarball_package_name(path)
+        # Sum of regular-file member sizes seen so far, and (path, size)
+        # of each of those members (complete after a full pass over members())
+        self.size_bytes = 0
+        self.files: list[tuple[str, int]] = []
+
+    def members(self, wanted):
+        """
+        Yield (rel_path, data) for every regular-file member for which
+        wanted(rel_path) is true, in archive order. Each member's data is
+        read while the stream is positioned on it.
+        """
+        self.size_bytes = 0
+        self.files = []
+        with tarfile.open(self.path, "r|gz") as tar:
+            for member in tar:
+                if not member.isreg():
+                    continue
+                self.size_bytes += member.size
+                rel = member_path(member.name)
+                self.files.append((rel or member.name, member.size))
+                if rel is None or not wanted(rel):
+                    continue
+                f = tar.extractfile(member)
+                yield rel, f.read() if f is not None else b""
+
+
+def package_size_bytes(path: str) -> int:
+    """PACKAGE_SIZE_BYTES of a tarball, from its member headers only."""
+    pkg = TarballPackage(path)
+    for _ in pkg.members(lambda rel: False):
+        pass
+    return pkg.size_bytes
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+work_queue.py
+Usage:
+    python3 work_queue.py status <analysis_root>
+
+Shared work queue for sharded batch runs (batch_analysis_final.py
+--coordinator / --worker).
+
+The queue is one SQLite database next to the results, so every machine
+that mounts the batch folder can take part:
+
+    Analysis/work_queue.sqlite
+      meta  (key, value)     run settings written by the coordinator
+                             (extraction options, run id, sealed flag)
+      items (package, path, fingerprint, state, worker, lease_until,
+             attempts, error)
+
+The coordinator fills the queue with the packages to extract and seals
+it. Workers lease one package at a time. A lease lasts lease_seconds
+and a worker renews it with heartbeats while it scans. When a worker
+dies, its heartbeats stop and the package is leased again by someone
+else once the lease has expired, up to MAX_ATTEMPTS times; after that it
+is failed. Leasing, heartbeats and completion are each one transaction
+(BEGIN IMMEDIATE), so two workers never own the same package.
+
+Workers write each package to Analysis/<pkg>/ (staged and renamed, as in
+a local run). compile_scores.py then merges them like any other batch:
+the result depends only on the package directories, not on which worker
+wrote them or in which order.
+"""
+import json
+import os
+import sqlite3
+import sys
+import time
+
+QUEUE_NAME = "work_queue.sqlite"
+DEFAULT_LEASE = 120.0
+# A package whose lease expired this many times is failed
+MAX_ATTEMPTS = 3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS items (
+    package     TEXT PRIMARY KEY,
+    path        TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    state       TEXT NOT NULL,
+    worker      TEXT,
+    lease_until REAL,
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    error       TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS items_state ON items(state);
+"""
+
+
+def queue_path(analysis_root: str) -> str:
+    return os.path.join(analysis_root, QUEUE_NAME)
+
+
+class WorkQueue:
+    def __init__(self, analysis_root: str):
+        os.makedirs(analysis_root, exist_ok=True)
+        self.path = queue_path(analysis_root)
+        # Autocommit; write transactions are opened explicitly
+        self._db = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+
+    def _write(self):
+        """Context for one write transaction that holds the lock from the start."""
+        db = self._db
+
+        class _Txn:
+            def __enter__(self):
+                db.execute("BEGIN IMMEDIATE")
+                return db
+
+            def __exit__(self, exc_type, exc, tb):
+                db.execute("ROLLBACK" if exc_type else "COMMIT")
+                return False
+
+        return _Txn()
+
+    # --- coordinator ---
+
+    def open(self, settings: dict, items):
+        """
+        Replace the queue with items [(package, path, fingerprint)] and
+        the run settings, then seal it (no more items will come).
+        """
+        with self._write() as db:
+            db.execute("DELETE FROM items")
+            db.execute("DELETE FROM meta")
+            db.executemany(
+                "INSERT INTO items (package, path, fingerprint, state) "
+                "VALUES (?, ?, ?, 'queued')",
+                list(items),
+            )
+            db.execute("INSERT INTO meta VALUES ('settings', ?)", (json.dumps(settings),))
+            db.execute("INSERT INTO meta VALUES ('sealed', '1')")
+
+    def requeue_expired(self, max_attempts: int = MAX_ATTEMPTS) -> int:
+        """Return packages of dead workers to the queue (or fail them). Returns the count."""
+        now = time.time()
+        with self._write() as db:
+            expired = db.execute(
+                "SELECT package, attempts FROM items WHERE state = 'leased' AND lease_until < ?",
+                (now,),
+            ).fetchall()
+            for package, attempts in expired:
+                if attempts >= max_attempts:
+                    db.execute(
+                        "UPDATE items SET state = 'failed', worker = NULL, "
+                        "error = 'lease expired too often' WHERE package = ?",
+                        (package,),
+                    )
+                else:
+                    db.execute(
+                        "UPDATE items SET state = 'queued', worker = NULL WHERE package = ?",
+                        (package,),
+                    )
+        return len(expired)
+
+    # --- workers ---
+
+    def settings(self):
+        """The coordinator's run settings, or None before the queue was opened."""
+        row = self._db.execute("SELECT value FROM meta WHERE key = 'settings'").fetchone()
+        return json.loads(row[0]) if row else None
+
+    def lease(
+        self,
+        worker: str,
+        lease_seconds: float = DEFAULT_LEASE,
+        max_attempts: int = MAX_ATTEMPTS,
+    ):
+        """
+        Take the next queued package (or one whose lease expired).
+        Returns (package, path, fingerprint) or None.
+        """
+        now = time.time()
+        with self._write() as db:
+            row = db.execute(
+                "SELECT package, path, fingerprint FROM items "
+                "WHERE state = 'queued' "
+                "OR (state = 'leased' AND lease_until < ? AND attempts < ?) "
+                "ORDER BY package LIMIT 1",
+                (now, max_attempts),
+            ).fetchone()
+            if row is None:
+                return None
+            db.execute(
+                "UPDATE items SET state = 'leased', worker = ?, lease_until = ?, "
+                "attempts = attempts + 1 WHERE package = ?",
+                (worker, now + lease_seconds, row[0]),
+            )
+        return row
+
+    def heartbeat(self, worker: str, package: str, lease_seconds: float = DEFAULT_LEASE) -> bool:
+        """Extend a lease. False if the worker no longer holds it."""
+        with self._write() as db:
+            cur = db.execute(
+                "UPDATE items SET lease_until = ? "
+                "WHERE package = ? AND worker = ? AND state = 'leased'",
+                (time.time() + lease_seconds, package, worker),
+            )
+        return cur.rowcount == 1
+
+    def finish(self, worker: str, package: str, ok: bool, error: str = "") -> bool:
+        """Mark a leased package done or failed. False if the lease was lost."""
+        with self._write() as db:
+            cur = db.execute(
+                "UPDATE items SET state = ?, error = ?, lease_until = NULL "
+                "WHERE package = ? AND worker = ? AND state = 'leased'",
+                ("done" if ok else "failed", error, package, worker),
+            )
+        return cur.rowcount == 1
+
+    # --- both ---
+
+    def counts(self) -> dict[str, int]:
+        return dict(self._db.execute("SELECT state, COUNT(*) FROM items GROUP BY state"))
+
+    def drained(self) -> bool:
+        """True once the queue is sealed and nothing is queued or leased."""
+        sealed = self._db.execute("SELECT 1 FROM meta WHERE key = 'sealed'").fetchone()
+        if not sealed:
+            return False
+        counts = self.counts()
+        return not counts.get("queued") and not counts.get("leased")
+
+    def failures(self) -> list[tuple[str, str]]:
+        return self._db.execute(
+            "SELECT package, error FROM items WHERE state = 'failed' ORDER BY package"
+        ).fetchall()
+
+    def close(self):
+        self._db.close()
+
+
+def format_counts(counts: dict[str, int]) -> str:
+    total = sum(counts.values())
+    return (
+        f"{counts.get('done', 0)}/{total} done, {counts.get('leased', 0)} leased, "
+        f"{counts.get('queued', 0)} queued, {counts.get('failed', 0)} failed"
+    )
+
+
+def main():
+    if len(sys.argv) != 3 or sys.argv[1] != "status":
+        print("Usage: python3 work_queue.py status <analysis_root>", file=sys.stderr)
+        sys.exit(1)
+    if not os.path.isfile(queue_path(sys.argv[2])):
+        print(f"[!] No {QUEUE_NAME} in {sys.argv[2]}", file=sys.stderr)
+        sys.exit(1)
+    wq = WorkQueue(sys.argv[2])
+    print(f"[+] {format_counts(wq.counts())}")
+    for package, error in wq.failures():
+        print(f"    [!] {package}: {error}")
+    wq.close()
+
+
+if __name__ == "__main__":
+    main()
